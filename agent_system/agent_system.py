@@ -1,7 +1,34 @@
-from typing import Dict, Any, List
+from typing import (
+    Dict,
+    Any,
+    List,
+    Optional,
+    Iterable,
+    Iterator,
+    AsyncIterable,
+    Union,
+)
+from contextlib import contextmanager
 import asyncio
+import json
+import time
+from agent_system.batch import gather_bounded
 from agent_system.config import load_config, AgentConfig
+from agent_system.dag import DAGExecutor
+from agent_system.pipeline import Pipeline, PipelineStage
+from agent_system.session import RunSession, current_session
+from agent_system.budget import TenantBudgets, TokenBudget
+from agent_system.node_cache import NodeCache, NodeResultStore
+from agent_system.checkpoint import CheckpointStore, INCOMPLETE_STATUSES
+from agent_system.deadline import (
+    DeadlineExceeded,
+    deadline_scope,
+    timeout_result,
+    with_deadline,
+)
 from agent_system.llm import DeepSeekLLM
+from agent_system.tracing import span
+from agent_system.metrics import ACTIVE_RUNS, AGENT_LATENCY, role_scope
 from agent_system.message_bus import MessageBus
 from agents.supervisor import SupervisorAgent
 from agents.metadata_steward import MetadataStewardAgent
@@ -10,10 +37,23 @@ from agents.developer import DataDeveloperAgent
 
 
 class AgentSystem:
-    def __init__(self):
-        self.config = load_config()
-        self.message_bus = MessageBus()
-        self.llm = DeepSeekLLM(self.config)
+    def __init__(
+        self,
+        node_concurrency: Optional[Dict[str, int]] = None,
+        message_bus: Optional[MessageBus] = None,
+        node_store: Optional[NodeResultStore] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+        task_timeout: Optional[float] = None,
+        node_timeout: Optional[float] = None,
+        llm: Optional[DeepSeekLLM] = None,
+        run_token_budget: Optional[int] = None,
+        tenant_budgets: Optional[TenantBudgets] = None,
+    ):
+        self.config = llm.config if llm is not None else load_config()
+        self.message_bus = message_bus or MessageBus()
+        # 只关闭自己创建的LLM客户端，传入的由调用方负责关闭
+        self._owns_llm = llm is None
+        self.llm = llm or DeepSeekLLM(self.config)
 
         self.supervisor = SupervisorAgent(
             config=AgentConfig(
@@ -78,28 +118,137 @@ class AgentSystem:
                 "wait_for": ["metadata_steward", "data_calibration"],
             },
         }
+        # 每个节点同时执行的最大数量（多个任务共享同一个AgentSystem时生效）
+        self.node_concurrency: Dict[str, int] = node_concurrency or {}
+        self._executor: Optional[DAGExecutor] = None
+        self._executor_signature: Optional[str] = None
+        self.pipeline: Optional[Pipeline] = None
+        # 节点结果缓存：传入存储后启用，重跑时只执行输入发生变化的节点
+        self.node_cache: Optional[NodeCache] = (
+            NodeCache(node_store) if node_store is not None else None
+        )
+        # 工作流检查点：每个节点完成后按 run_id 落盘，崩溃后可用 resume 继续
+        self.checkpoints = checkpoints
+        # 端到端截止时间（秒）和单个节点的超时；节点和LLM请求的超时取剩余时间
+        self.task_timeout = task_timeout
+        self.node_timeout = node_timeout
+        # 每次运行和每个租户（跨运行累计）的token预算，超出后Agent不再调用LLM
+        self.run_token_budget = run_token_budget
+        self.tenant_budgets = tenant_budgets
+
+    async def __aenter__(self) -> "AgentSystem":
+        await self.llm.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """停止消息总线的消费任务；LLM客户端由本系统创建时关闭它并释放连接"""
+        await self.message_bus.aclose()
+        if self._owns_llm:
+            await self.llm.aclose()
+
+    def session(
+        self, run_id: Optional[str] = None, tenant: Optional[str] = None
+    ) -> RunSession:
+        """创建新的运行会话，会话内各Agent的对话状态相互隔离
+
+        指定 tenant 时，会话中的LLM调用计入该租户的token预算。
+        """
+        return self._apply_budgets(RunSession(run_id, tenant))
+
+    def _ensure_session(self) -> RunSession:
+        # 已在会话中则沿用，否则为本次任务创建新会话
+        session = current_session()
+        if session is None:
+            return self.session()
+        return self._apply_budgets(session)
+
+    def _apply_budgets(self, session: RunSession) -> RunSession:
+        if session.token_budget is None and self.run_token_budget is not None:
+            session.token_budget = TokenBudget(self.run_token_budget, "run")
+        if (
+            session.tenant is not None
+            and session.tenant_budget is None
+            and self.tenant_budgets is not None
+        ):
+            session.tenant_budget = self.tenant_budgets.get(session.tenant)
+        return session
 
-    async def process_task(self, task: str) -> Dict[str, Any]:
-        """Process a task through the multi-agent system"""
+    @contextmanager
+    def _track_run(self, run_id: str, mode: str) -> Iterator[None]:
+        # 运行级别的追踪区间和进行中运行数指标
+        with span("workflow.run", "workflow", run_id=run_id, mode=mode):
+            ACTIVE_RUNS.inc()
+            try:
+                yield
+            finally:
+                ACTIVE_RUNS.dec()
+
+    async def process_task(
+        self, task: str, timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Process a task through the multi-agent system
+
+        超过截止时间（timeout，默认 task_timeout）时取消进行中的请求，
+        未完成的Agent结果为 {"status": "timeout"}。
+        """
+        with self._ensure_session() as session:
+            with deadline_scope(timeout or self.task_timeout), self._track_run(
+                session.run_id, "process_task"
+            ):
+                return await self._process_task(task)
+
+    async def call_agent(self, agent, req: str) -> Dict[str, Any]:
+        """在节点超时和任务截止时间内执行Agent，超时返回 timeout 结果
+
+        各Agent的耗时记录在当前会话的 info["agent_latency"] 中。
+        """
+        start = time.monotonic()
+        role = agent.config.role
+        with deadline_scope(self.node_timeout), role_scope(role), span(
+            "agent.process_req", "agent", role=role
+        ) as agent_span:
+            try:
+                result = await with_deadline(agent.process_req(req))
+            except DeadlineExceeded as e:
+                print(f"Agent {role} timed out: {e}")
+                result = timeout_result(e)
+            finally:
+                elapsed = time.monotonic() - start
+                AGENT_LATENCY.observe(elapsed, role=role)
+                session = current_session()
+                if session is not None:
+                    session.info.setdefault("agent_latency", {})[role] = elapsed
+            agent_span.set("status", result.get("status"))
+            return result
+
+    async def _process_task(self, task: str) -> Dict[str, Any]:
         results = {}
 
         # 1. 启动Supervisor
-        supervisor_result = await self.supervisor.process_req(task)
+        supervisor_result = await self.call_agent(self.supervisor, task)
         results["supervisor"] = supervisor_result
 
         # 2. 并行执行元数据和数据口径任务
-        metadata_task = asyncio.create_task(self.metadata_steward.process_req(task))
-        calibration_task = asyncio.create_task(self.data_calibration.process_task(task))
-
         metadata_result, calibration_result = await asyncio.gather(
-            metadata_task, calibration_task
+            self.call_agent(self.metadata_steward, task),
+            self.call_agent(self.data_calibration, task),
+            return_exceptions=True,
         )
 
-        results["metadata_steward"] = metadata_result
-        results["data_calibration"] = calibration_result
+        # 单个Agent失败不影响另一个，异常转为错误结果
+        for role, result in (
+            ("metadata_steward", metadata_result),
+            ("data_calibration", calibration_result),
+        ):
+            if isinstance(result, Exception):
+                result = {"status": "error", "error": str(result)}
+            results[role] = result
 
         # 3. 最后执行数据开发任务
-        development_result = await self.data_developer.process_req(task)
+        development_result = await self.call_agent(self.data_developer, task)
         results["data_developer"] = development_result
 
         return results
@@ -114,30 +263,172 @@ class AgentSystem:
         }
         return agents.get(role)
 
-    async def execute_workflow(self, task: str) -> Dict[str, Any]:
-        """Execute agents according to workflow configuration"""
-        results = {}
-        executed = set()
+    def get_workflow_executor(self) -> DAGExecutor:
+        """获取工作流执行器，workflow 或 node_concurrency 变化时重新构建（并校验）"""
+        signature = repr((self.workflow, self.node_concurrency))
+        if self._executor is None or self._executor_signature != signature:
+            self._executor = DAGExecutor(self.workflow, self.node_concurrency)
+            self._executor_signature = signature
+        return self._executor
 
-        async def execute_agent(role: str):
-            if role in executed:
-                return
+    def build_node_input(self, task: str, upstream: Dict[str, Any]) -> str:
+        """将上游节点的结果附加到任务描述中，传给下游Agent"""
+        if not upstream:
+            return task
+        upstream_results = json.dumps(
+            upstream, ensure_ascii=False, separators=(",", ":"), default=str
+        )
+        return f"{task}\n\n上游Agent结果:\n{upstream_results}"
 
-            # 等待依赖的Agent完成
-            for dep in self.workflow[role]["wait_for"]:
-                if dep not in executed:
-                    return
+    async def execute_workflow(
+        self, task: str, timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Execute agents according to workflow configuration
 
-            # 执行Agent
-            agent = self.get_agent_by_role(role)
-            if agent:
-                results[role] = await agent.process_task(task)
-                executed.add(role)
+        就绪的节点并发执行，总耗时取决于关键路径而不是所有节点耗时之和。
+        启用节点缓存时，复用的节点记录在当前会话的 info["reused_nodes"] 中。
+        启用检查点时，每个完成的节点按会话的 run_id 保存。
+        超过截止时间时，进行中的节点被取消，未完成的节点结果为 {"status": "timeout"}。
+        """
+        with self._ensure_session() as session, deadline_scope(
+            timeout or self.task_timeout
+        ):
+            if self.checkpoints is not None:
+                self.checkpoints.start(session.run_id, task, session.tenant)
+            with self._track_run(session.run_id, "workflow"):
+                return await self._run_workflow(task, session)
 
-                # 触发下一个Agent
-                for next_role in self.workflow[role]["next"]:
-                    await execute_agent(next_role)
+    async def resume(self, run_id: str) -> Dict[str, Any]:
+        """从检查点继续执行工作流：已完成的节点直接使用保存的结果，
+        从第一个未完成（或失败）的节点开始重新执行"""
+        if self.checkpoints is None:
+            raise RuntimeError("AgentSystem has no checkpoint store configured")
+        run = self.checkpoints.get_run(run_id)
+        if run is None:
+            raise KeyError(f"No checkpoint found for run '{run_id}'")
+        completed = self.checkpoints.load_results(run_id)
+        # 沿用原运行的租户，恢复的调用同样计入该租户的预算
+        tenant = run.get("tenant")
+        with self.session(run_id, tenant) as session, deadline_scope(
+            self.task_timeout
+        ):
+            session.info["resumed_nodes"] = sorted(completed)
+            self.checkpoints.start(run_id, run["task"], tenant, resume=True)
+            with self._track_run(run_id, "resume"):
+                return await self._run_workflow(run["task"], session, completed)
 
-        # 从 Supervisor 开始执行
-        await execute_agent("supervisor")
+    async def _run_workflow(
+        self,
+        task: str,
+        session: RunSession,
+        completed: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        async def run_node(role: str, upstream: Dict[str, Any]) -> Dict[str, Any]:
+            result = await self.run_agent_node(role, task, upstream)
+            if self.checkpoints is not None:
+                self.checkpoints.save_node(session.run_id, role, result)
+            return result
+
+        results = await self.get_workflow_executor().run(run_node, completed)
+        if self.checkpoints is not None:
+            failed = any(
+                isinstance(r, dict) and r.get("status") in INCOMPLETE_STATUSES
+                for r in results.values()
+            )
+            self.checkpoints.finish(session.run_id, "failed" if failed else "completed")
         return results
+
+    async def run_agent_node(
+        self, role: str, task: str, upstream: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """执行单个工作流节点；启用节点缓存时输入未变化则直接复用结果
+
+        复用的结果同样写入Agent的对话历史并发布到消息总线。
+        """
+        agent = self.get_agent_by_role(role)
+        if agent is None:
+            return {"status": "error", "error": f"No agent for role '{role}'"}
+
+        node_input = self.build_node_input(task, upstream)
+        if self.node_cache is None:
+            return await self.call_agent(agent, node_input)
+
+        key = self.node_cache.key(
+            node=role,
+            task=task,
+            upstream=upstream,
+            system_prompt=agent.get_system_prompt(),
+            tools=agent.get_tools(),
+            model=self.llm.model,
+        )
+        cached = self.node_cache.get(key)
+        if cached is not None:
+            print(f"Reusing cached result for node: {role}")
+            session = current_session()
+            if session is not None:
+                session.info.setdefault("reused_nodes", []).append(role)
+            await agent.replay_result(node_input, cached)
+            return cached
+
+        result = await self.call_agent(agent, node_input)
+        self.node_cache.set(key, result)
+        return result
+
+    def build_pipeline(
+        self, stage_workers: Optional[Dict[str, int]] = None, queue_size: int = 16
+    ) -> Pipeline:
+        """按工作流依赖层级构建流水线：supervisor → steward/calibration → developer
+
+        stage_workers 以阶段名（同层节点名用 "+" 连接）或其中任一节点名指定worker数。
+        """
+        stage_workers = stage_workers or {}
+        executor = self.get_workflow_executor()
+        stages = []
+        for layer in executor.levels():
+            name = "+".join(layer)
+            workers = stage_workers.get(
+                name, max((stage_workers.get(node, 1) for node in layer), default=1)
+            )
+            stages.append(PipelineStage(name, self._stage_handler(layer), workers))
+        return Pipeline(stages, queue_size=queue_size)
+
+    def _stage_handler(self, layer: List[str]):
+        executor = self.get_workflow_executor()
+
+        async def run_node(role: str, state: Dict[str, Any]) -> Dict[str, Any]:
+            upstream = {dep: state[dep] for dep in executor.dependencies[role]}
+            return await self.run_agent_node(role, state["task"], upstream)
+
+        async def handler(state: Dict[str, Any]):
+            # 同一任务的各阶段共享一个会话
+            with state.setdefault("session", self.session()):
+                results = await gather_bounded(
+                    lambda role: run_node(role, state), layer, concurrency=len(layer)
+                )
+            for role, result in zip(layer, results):
+                if isinstance(result, Exception):
+                    result = {"status": "error", "error": str(result)}
+                state[role] = result
+
+        return handler
+
+    async def run_pipeline(
+        self,
+        tasks: Union[Iterable[str], AsyncIterable[str]],
+        stage_workers: Optional[Dict[str, int]] = None,
+        queue_size: int = 16,
+    ) -> List[Dict[str, Any]]:
+        """流水线方式处理多个任务，按输入顺序返回每个任务的各Agent结果
+
+        运行结束后可通过 self.pipeline.stats() 查看各阶段的队列深度和利用率。
+        """
+        self.pipeline = self.build_pipeline(stage_workers, queue_size)
+        states = await self.pipeline.run(tasks)
+        return [
+            {
+                key: value
+                for key, value in state.items()
+                if key not in ("task", "session")
+            }
+            for state in states
+        ]
@@ -1,7 +1,19 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Iterable
+from agent_system.batch import gather_bounded, ProgressCallback
 from agent_system.config import AgentConfig
 from agent_system.llm import DeepSeekLLM
 from agent_system.message_bus import MessageBus
+from agent_system.session import AgentState, RunSession, current_session
+from agent_system.history import HistoryStats, apply_history_policy, compact_result
+from agent_system.deadline import DeadlineExceeded, timeout_result
+from agent_system.metrics import AGENT_RESULTS, role_scope
+from agent_system.budget import (
+    TokenBudgetExceeded,
+    TokenReservation,
+    budget_result,
+    reserve_tokens,
+)
+from agent_system.tokens import estimate_request_tokens
 import json
 import traceback
 
@@ -14,14 +26,56 @@ class BaseAgent:
         llm: Optional[DeepSeekLLM] = None,
     ):
         self.config = config
-        self.context = {}
-        self.messages = []
+        # 不在会话中运行时使用的默认状态
+        self._default_state = AgentState()
+        # 历史窗口策略节省的token统计
+        self.history_stats = HistoryStats()
         self.message_bus = message_bus
         self.llm = llm
 
         # 订阅与当前Agent角色相关的消息
         self.message_bus.subscribe(self.config.role, self.handle_message)
 
+    def _state(self) -> AgentState:
+        session = current_session()
+        if session is None:
+            return self._default_state
+        return session.state_for(self)
+
+    @property
+    def messages(self) -> List[Dict[str, Any]]:
+        """当前会话中的对话历史"""
+        return self._state().messages
+
+    @messages.setter
+    def messages(self, value: List[Dict[str, Any]]):
+        self._state().messages = value
+
+    @property
+    def context(self) -> Dict[str, Any]:
+        """当前会话中收到的消息上下文"""
+        return self._state().context
+
+    @context.setter
+    def context(self, value: Dict[str, Any]):
+        self._state().context = value
+
+    def get_prompt_messages(self) -> List[Dict[str, Any]]:
+        """按历史策略返回本次调用要发送的消息"""
+        window, full_tokens, sent_tokens = apply_history_policy(
+            self.messages, self.config.history
+        )
+        self.history_stats.calls += 1
+        self.history_stats.full_tokens += full_tokens
+        self.history_stats.sent_tokens += sent_tokens
+        return window
+
+    def serialize_result(self, result: Dict[str, Any]) -> str:
+        """将结果序列化为写入对话历史的文本"""
+        if self.config.history.compact_results:
+            return compact_result(result)
+        return str(result)
+
     async def process_req_with_ask(self, task: str) -> Dict[str, Any]:
         """处理任务并返回结果
         默认实现使用普通的LLM生成方式，子类可以重写此方法使用工具调用功能
@@ -31,19 +85,31 @@ class BaseAgent:
 
         # 使用LLM生成响应
         if self.llm:
-            response = await self.llm.generate(
-                system_prompt=self.get_system_prompt(), messages=self.messages
-            )
-
             try:
-                # 尝试解析LLM响应为结构化数据
-                result = json.loads(response)
-            except json.JSONDecodeError:
-                # 如果无法解析为JSON，返回原始响应
-                result = {"response": response}
+                response = await self.generate()
+            except DeadlineExceeded as e:
+                result = timeout_result(e)
+                self._count_result("request", "timeout")
+            except TokenBudgetExceeded as e:
+                result = budget_result(e)
+                self._count_result("request", "budget_exceeded")
+            else:
+                if response.startswith("Error generating response:"):
+                    # 重试耗尽后的错误不能当作模型输出
+                    result = {"status": "error", "error": response}
+                    self._count_result("request", "error")
+                else:
+                    try:
+                        # 尝试解析LLM响应为结构化数据
+                        result = json.loads(response)
+                        self._count_result("content_json", "success")
+                    except json.JSONDecodeError:
+                        # 如果无法解析为JSON，返回原始响应
+                        result = {"response": response}
+                        self._count_result("content_text", "success")
 
             # 添加LLM响应到消息历史
-            self.add_message("assistant", str(result))
+            self.add_message("assistant", self.serialize_result(result))
 
             # 发布结果到消息总线
             await self.publish_result(result)
@@ -65,35 +131,28 @@ class BaseAgent:
             print(f"Tool choice: {tool_choice}")
 
             try:
-                response_data = await self.llm.tool_calling(
-                    system_prompt=self.get_system_prompt(),
-                    messages=self.messages,
-                    tools=tools,
-                    tool_choice=tool_choice,
+                response_data = await self.tool_calling(tools, tool_choice)
+                self._count_result(
+                    response_data.get("source", "request"),
+                    "error" if "error" in response_data else "success",
                 )
 
                 if "error" in response_data:
                     raise ValueError(response_data["error"])
 
-                result = {"status": "success"}
-
-                if "tool_name" in response_data and "arguments" in response_data:
-                    result.update(
-                        {
-                            "tool_name": response_data["tool_name"],
-                            "arguments": response_data["arguments"],
-                            "source": response_data.get("source", "tool_call"),
-                        }
-                    )
-
-                    # print(f"\nTool call: {response_data['tool_name']}")
-                    # print(f"Arguments: {json.dumps(response_data['arguments'], indent=2, ensure_ascii=False)}")
+                result = self._build_tool_result(response_data)
 
-                self.add_message("assistant", str(result))
+                self.add_message("assistant", self.serialize_result(result))
                 await self.publish_result(result)
 
                 return result
 
+            except DeadlineExceeded as e:
+                result = timeout_result(e)
+                self._count_result("request", "timeout")
+            except TokenBudgetExceeded as e:
+                result = budget_result(e)
+                self._count_result("request", "budget_exceeded")
             except Exception as e:
                 result = {
                     "error": f"Exception during tool calling: {str(e)}",
@@ -101,7 +160,7 @@ class BaseAgent:
                     "stack_trace": traceback.format_exc(),
                 }
 
-            self.add_message("assistant", str(result))
+            self.add_message("assistant", self.serialize_result(result))
 
             await self.publish_result(result)
 
@@ -109,13 +168,220 @@ class BaseAgent:
         else:
             raise NotImplementedError("LLM not configured for this agent")
 
+    def reserve_tokens(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> TokenReservation:
+        """按预估的最大用量（提示 + max_tokens）在当前会话的运行和租户预算中预留，
+        超出时抛出 TokenBudgetExceeded"""
+        session = current_session()
+        budgets = session.budgets() if session is not None else []
+        estimated = estimate_request_tokens(system_prompt, messages, tools) + max_tokens
+        return reserve_tokens(budgets, estimated)
+
+    def record_usage(
+        self, reservation: TokenReservation, usage: Optional[Dict[str, int]]
+    ):
+        """结算预算，并把用量累计到当前会话的 info["token_usage"][角色] 中"""
+        reservation.settle(usage)
+        session = current_session()
+        if session is None or not usage:
+            return
+        totals = session.info.setdefault("token_usage", {}).setdefault(
+            self.config.role,
+            {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        )
+        totals["calls"] += 1
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            totals[key] += usage.get(key, 0)
+
+    async def generate(self, temperature: Optional[float] = None) -> str:
+        """在token预算内调用 llm.generate，返回值的 usage 计入会话和预算"""
+        system_prompt = self.get_system_prompt()
+        messages = self.get_prompt_messages()
+        max_tokens = self.llm.max_tokens_for()
+        reservation = self.reserve_tokens(system_prompt, messages, max_tokens)
+        response = None
+        try:
+            with role_scope(self.config.role):
+                response = await self.llm.generate(
+                    system_prompt=system_prompt,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    reserve=reservation.extend,
+                )
+            return response
+        finally:
+            self.record_usage(reservation, getattr(response, "usage", None))
+
+    async def tool_calling(
+        self,
+        tools: List[Dict[str, Any]],
+        tool_choice: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """在token预算内调用 llm.tool_calling，结果的 usage 计入会话和预算"""
+        system_prompt = self.get_system_prompt()
+        messages = self.get_prompt_messages()
+        max_tokens = self.llm.max_tokens_for(tools, tool_choice)
+        reservation = self.reserve_tokens(system_prompt, messages, max_tokens, tools)
+        response_data = None
+        try:
+            with role_scope(self.config.role):
+                response_data = await self.llm.tool_calling(
+                    system_prompt=system_prompt,
+                    messages=messages,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                    max_tokens=max_tokens,
+                    reserve=reservation.extend,
+                )
+            return response_data
+        finally:
+            self.record_usage(
+                reservation, response_data.get("usage") if response_data else None
+            )
+
+    def _count_result(self, source: str, status: str):
+        # source 与 _process_tool_calling_response 中的标记一致，request 表示请求本身失败
+        AGENT_RESULTS.inc(role=self.config.role, source=source, status=status)
+
+    def _build_tool_result(self, response_data: Dict[str, Any]) -> Dict[str, Any]:
+        result = {"status": "success"}
+
+        if "tool_name" in response_data and "arguments" in response_data:
+            result.update(
+                {
+                    "tool_name": response_data["tool_name"],
+                    "arguments": response_data["arguments"],
+                    "source": response_data.get("source", "tool_call"),
+                }
+            )
+
+            # print(f"\nTool call: {response_data['tool_name']}")
+            # print(f"Arguments: {json.dumps(response_data['arguments'], indent=2, ensure_ascii=False)}")
+
+        return result
+
+    async def process_req_stream(
+        self,
+        req: str,
+        tools: List[Dict[str, Any]],
+        tool_choice: Optional[Dict[str, str]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """流式处理请求：参数中的元素一完成就产出（如plan中的每一步），
+        最后产出 {"type": "final", "result": ...}，结果与 process_req 一致
+        """
+        if not self.llm:
+            raise NotImplementedError("LLM not configured for this agent")
+
+        self.add_message("user", req)
+
+        system_prompt = self.get_system_prompt()
+        messages = self.get_prompt_messages()
+        max_tokens = self.llm.max_tokens_for(tools, tool_choice)
+        try:
+            reservation = self.reserve_tokens(
+                system_prompt, messages, max_tokens, tools
+            )
+        except TokenBudgetExceeded as e:
+            self._count_result("request", "budget_exceeded")
+            result = budget_result(e)
+            self.add_message("assistant", self.serialize_result(result))
+            await self.publish_result(result)
+            yield {"type": "final", "result": self._finish_req_result(result)}
+            return
+
+        result = None
+        usage = None
+        try:
+            async for event in self.llm.tool_calling_stream(
+                system_prompt=system_prompt,
+                messages=messages,
+                tools=tools,
+                tool_choice=tool_choice,
+                max_tokens=max_tokens,
+                role=self.config.role,
+            ):
+                if event["type"] == "final":
+                    response_data = event["result"]
+                    usage = response_data.get("usage")
+                    self._count_result(
+                        response_data.get("source", "request"),
+                        "error" if "error" in response_data else "success",
+                    )
+                    if "error" in response_data:
+                        result = {
+                            "error": f"Exception during tool calling: {response_data['error']}",
+                            "status": "error",
+                        }
+                    else:
+                        result = self._build_tool_result(response_data)
+                elif event["type"] == "error":
+                    result = {"error": event["error"], "status": "error"}
+                    self._count_result("request", "error")
+                elif event["type"] == "timeout":
+                    result = timeout_result(event["error"])
+                    self._count_result("request", "timeout")
+                else:
+                    yield event
+        finally:
+            self.record_usage(reservation, usage)
+
+        self.add_message("assistant", self.serialize_result(result))
+        await self.publish_result(result)
+
+        yield {"type": "final", "result": self._finish_req_result(result)}
+
     async def process_req(
         self, req: str, tools: list, tool_choice: Dict[str, Any]
     ) -> Dict[str, Any]:
         result = await self.process_req_with_tool_calling(
             req=req, tools=tools, tool_choice=tool_choice
         )
+        return self._finish_req_result(result)
+
+    async def process_req_many(
+        self,
+        reqs: Iterable[str],
+        concurrency: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        **kwargs,
+    ) -> List[Dict[str, Any]]:
+        """批量处理请求，按输入顺序返回结果；单个请求的异常转为错误结果
+
+        每个请求在独立的会话中执行，对话历史互不干扰。
+        """
+        if concurrency is None:
+            concurrency = self.config.llm_config.batch_concurrency
+
+        async def run(req: str) -> Dict[str, Any]:
+            with RunSession():
+                return await self.process_req(req, **kwargs)
+
+        results = await gather_bounded(
+            run,
+            reqs,
+            concurrency=concurrency,
+            on_progress=on_progress,
+        )
+        return [
+            {
+                "status": "error",
+                "error": str(r),
+                "message": f"Failed to process request: {r}",
+            }
+            if isinstance(r, Exception)
+            else r
+            for r in results
+        ]
 
+    def _finish_req_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        if result.get("status") == "timeout":
+            return result
         if result.get("status") == "error" or "error" in result:
             error_message = result.get("error", "Unknown error in function calling")
             return {
@@ -158,10 +424,37 @@ class BaseAgent:
     def get_system_prompt(self) -> str:
         raise NotImplementedError
 
+    def build_prompt(self, req: str) -> str:
+        """将请求转换为发送给LLM的提示词，默认原样使用"""
+        return req
+
+    def get_tools(self) -> Optional[List[Dict[str, Any]]]:
+        """Agent使用的工具定义，不使用工具调用的Agent返回 None"""
+        return None
+
+    def get_tool_choice(self) -> Optional[Dict[str, Any]]:
+        return None
+
     async def handle_message(self, message: Dict[str, Any]):
         print(f"Received message: {message}")
         self.context.update(message)
 
+    def restore_context(self, offset: int = 0) -> int:
+        """重启后从消息总线的持久化日志恢复上下文，返回下一个待读取的偏移量"""
+        next_offset = offset
+        for record in self.message_bus.replay(self.config.role, offset):
+            self.context.update(
+                {key: record[key] for key in ("topic", "content", "sender", "timestamp")}
+            )
+            next_offset = record["offset"] + 1
+        return next_offset
+
+    async def replay_result(self, req: str, result: Dict[str, Any]):
+        """复用缓存的结果时补上对话历史并照常发布，与实际执行一次的效果相同"""
+        self.add_message("user", self.build_prompt(req))
+        self.add_message("assistant", self.serialize_result(result))
+        await self.publish_result(result)
+
     async def publish_result(self, result: Dict[str, Any]):
         await self.message_bus.publish(
             topic=f"{self.config.role}_result", message=result, sender=self.config.role
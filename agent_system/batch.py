@@ -0,0 +1,35 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+# on_progress(已完成数, 总数, 下标, 结果或异常)
+ProgressCallback = Callable[[int, int, int, Any], None]
+
+
+async def gather_bounded(
+    fn: Callable[[Any], Awaitable[Any]],
+    items: Iterable[Any],
+    concurrency: int = 8,
+    on_progress: Optional[ProgressCallback] = None,
+) -> List[Any]:
+    """以有限并发对每个输入执行 fn，按输入顺序返回结果
+
+    单个输入的异常不会影响其他输入，异常对象会放在该输入对应的位置上。
+    """
+    items = list(items)
+    results: List[Any] = [None] * len(items)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    done = 0
+
+    async def run(index: int, item: Any):
+        nonlocal done
+        async with semaphore:
+            try:
+                results[index] = await fn(item)
+            except Exception as e:
+                results[index] = e
+        done += 1
+        if on_progress is not None:
+            on_progress(done, len(items), index, results[index])
+
+    await asyncio.gather(*(run(i, item) for i, item in enumerate(items)))
+    return results
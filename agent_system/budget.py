@@ -0,0 +1,121 @@
+from typing import Dict, Any, Iterable, List, Optional
+
+
+class TokenBudgetExceeded(Exception):
+    """预估的token用量超过剩余预算"""
+
+
+class TokenBudget:
+    """token预算：调用前按预估值预留，返回后按实际用量结算
+
+    与 RateGovernor 的 TokenBucket 相同，先按最坏情况（提示 + max_tokens）占用，
+    拿到响应中的 usage 后再修正，并发调用不会同时越过预算。
+    """
+
+    def __init__(self, limit: int, name: str = "run"):
+        self.limit = limit
+        self.name = name
+        self.used = 0
+        self.reserved = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.limit - self.used - self.reserved
+
+    def check(self, tokens: int):
+        if tokens > self.remaining:
+            raise TokenBudgetExceeded(
+                f"{self.name} token budget exceeded: request needs ~{tokens} tokens, "
+                f"{max(self.remaining, 0)} of {self.limit} left"
+            )
+
+    def settle(self, reserved: int, actual: int):
+        self.reserved -= reserved
+        self.used += actual
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "used": self.used,
+            "reserved": self.reserved,
+            "remaining": self.remaining,
+        }
+
+
+class TenantBudgets:
+    """按租户的token预算，跨运行累计
+
+    limits 中没有列出的租户使用 default，default 为 None 表示不限制。
+    """
+
+    def __init__(
+        self, limits: Optional[Dict[str, int]] = None, default: Optional[int] = None
+    ):
+        self.limits = dict(limits or {})
+        self.default = default
+        self._budgets: Dict[str, TokenBudget] = {}
+
+    def get(self, tenant: str) -> Optional[TokenBudget]:
+        budget = self._budgets.get(tenant)
+        if budget is None:
+            limit = self.limits.get(tenant, self.default)
+            if limit is None:
+                return None
+            budget = self._budgets[tenant] = TokenBudget(limit, f"tenant '{tenant}'")
+        return budget
+
+    def reset(self, tenant: Optional[str] = None):
+        """清零用量（例如按计费周期重置）"""
+        if tenant is None:
+            self._budgets.clear()
+        else:
+            self._budgets.pop(tenant, None)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {tenant: budget.to_dict() for tenant, budget in self._budgets.items()}
+
+
+class TokenReservation:
+    """一次LLM调用在各预算中的预留"""
+
+    __slots__ = ("budgets", "tokens")
+
+    def __init__(self, budgets: List[TokenBudget], tokens: int):
+        self.budgets = budgets
+        self.tokens = tokens
+
+    def extend(self, tokens: int) -> bool:
+        """在所有预算中追加预留（例如截断后用更大的 max_tokens 重试），
+        任一预算不足时不占用并返回 False"""
+        if any(budget.remaining < tokens for budget in self.budgets):
+            return False
+        for budget in self.budgets:
+            budget.reserved += tokens
+        self.tokens += tokens
+        return True
+
+    def settle(self, usage: Optional[Dict[str, int]]):
+        """按响应的 usage 结算；没有用量（请求失败）时只释放预留"""
+        actual = usage.get("total_tokens", 0) if usage else 0
+        for budget in self.budgets:
+            budget.settle(self.tokens, actual)
+
+
+def reserve_tokens(budgets: Iterable[TokenBudget], tokens: int) -> TokenReservation:
+    """在所有预算中预留 tokens，任一预算不足时抛出 TokenBudgetExceeded 且不占用"""
+    budgets = list(budgets)
+    for budget in budgets:
+        budget.check(tokens)
+    for budget in budgets:
+        budget.reserved += tokens
+    return TokenReservation(budgets, tokens)
+
+
+def budget_result(error: Exception) -> Dict[str, Any]:
+    """超出预算的Agent结果，未发送请求"""
+    return {
+        "status": "error",
+        "error": str(error),
+        "message": f"Token budget exceeded: {error}",
+    }
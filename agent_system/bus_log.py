@@ -0,0 +1,261 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Any, Iterator, List, Optional, Mapping
+
+
+def _record(offset: int, envelope: Mapping[str, Any]) -> Dict[str, Any]:
+    return {
+        "offset": offset,
+        "topic": envelope["topic"],
+        "content": envelope["content"],
+        "sender": envelope["sender"],
+        "timestamp": envelope["timestamp"],
+        "wall_time": time.time(),
+    }
+
+
+def _dumps(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class BusLog:
+    """消息总线的持久化后端接口：追加写入、按主题和偏移量重放、压缩旧数据"""
+
+    def append(self, envelope: Mapping[str, Any]) -> int:
+        raise NotImplementedError
+
+    def replay(
+        self, topic: Optional[str] = None, offset: int = 0
+    ) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def compact(self, before_offset: int):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+
+class SegmentLog(BusLog):
+    """本地磁盘上的分段追加日志（每段一个JSONL文件，文件名为起始偏移量）
+
+    fsync 按批执行：累计 fsync_every 条或距上次超过 fsync_interval 秒时落盘。
+    进程崩溃时最多丢失最后一批未落盘的记录。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_records: int = 10000,
+        fsync_every: int = 64,
+        fsync_interval: float = 1.0,
+    ):
+        self.directory = directory
+        self.segment_max_records = segment_max_records
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self.next_offset = 0
+        self._segment_records = 0
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+        segments = self._segments()
+        if segments:
+            # 从最后一段恢复下一个偏移量
+            start = segments[-1]
+            self._truncate_partial_tail(start)
+            records = list(self._read_segment(start))
+            self._segment_records = len(records)
+            self.next_offset = records[-1]["offset"] + 1 if records else start
+            self._file = open(self._segment_path(start), "a", encoding="utf-8")
+
+    def _truncate_partial_tail(self, start: int):
+        """截掉崩溃时写了一半的最后一行，保证后续追加的记录可读"""
+        path = self._segment_path(start)
+        valid = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+                valid += len(line)
+        if valid != os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+
+    def _segment_path(self, start: int) -> str:
+        return os.path.join(self.directory, f"{start:020d}.log")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[:-4])
+            for name in os.listdir(self.directory)
+            if name.endswith(".log") and name[:-4].isdigit()
+        )
+
+    def _read_segment(self, start: int) -> Iterator[Dict[str, Any]]:
+        with open(self._segment_path(start), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时写了一半的最后一行
+                    break
+
+    def _roll(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+        self._file = open(self._segment_path(self.next_offset), "a", encoding="utf-8")
+        self._segment_records = 0
+
+    def append(self, envelope: Mapping[str, Any]) -> int:
+        if self._file is None or self._segment_records >= self.segment_max_records:
+            self._roll()
+        offset = self.next_offset
+        self._file.write(_dumps(_record(offset, envelope)) + "\n")
+        self.next_offset += 1
+        self._segment_records += 1
+        self._pending += 1
+        if (
+            self._pending >= self.fsync_every
+            or time.monotonic() - self._last_sync >= self.fsync_interval
+        ):
+            self.flush()
+        return offset
+
+    def flush(self):
+        if self._file is None or not self._pending:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def replay(
+        self, topic: Optional[str] = None, offset: int = 0
+    ) -> Iterator[Dict[str, Any]]:
+        """按偏移量顺序重放 offset 及之后的记录"""
+        if self._file is not None:
+            self._file.flush()
+        segments = self._segments()
+        for i, start in enumerate(segments):
+            # 跳过整段都在 offset 之前的段
+            if i + 1 < len(segments) and segments[i + 1] <= offset:
+                continue
+            for record in self._read_segment(start):
+                if record["offset"] < offset:
+                    continue
+                if topic is None or record["topic"] == topic:
+                    yield record
+
+    def compact(self, before_offset: int):
+        """删除所有记录都在 before_offset 之前的段（当前写入段除外）"""
+        segments = self._segments()
+        for start, next_start in zip(segments, segments[1:]):
+            if next_start <= before_offset:
+                os.remove(self._segment_path(start))
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+class SQLiteLog(BusLog):
+    """SQLite（WAL模式）持久化后端，每 commit_every 条或超过 commit_interval 秒提交一次"""
+
+    def __init__(
+        self, path: str, commit_every: int = 64, commit_interval: float = 1.0
+    ):
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bus_log ("
+            "offset INTEGER PRIMARY KEY, topic TEXT NOT NULL, record TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS bus_log_topic ON bus_log(topic, offset)"
+        )
+        # 压缩可能删光记录，已分配的最大偏移量另存一份，重启后偏移量不会回退
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bus_log_meta ("
+            "key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._db.commit()
+        row = self._db.execute("SELECT MAX(offset) FROM bus_log").fetchone()
+        meta = self._db.execute(
+            "SELECT value FROM bus_log_meta WHERE key = 'next_offset'"
+        ).fetchone()
+        self.next_offset = max(
+            0 if row[0] is None else row[0] + 1, 0 if meta is None else meta[0]
+        )
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def append(self, envelope: Mapping[str, Any]) -> int:
+        offset = self.next_offset
+        self._db.execute(
+            "INSERT INTO bus_log (offset, topic, record) VALUES (?, ?, ?)",
+            (offset, envelope["topic"], _dumps(_record(offset, envelope))),
+        )
+        self.next_offset += 1
+        self._pending += 1
+        if (
+            self._pending >= self.commit_every
+            or time.monotonic() - self._last_commit >= self.commit_interval
+        ):
+            self.flush()
+        return offset
+
+    def flush(self):
+        if self._pending:
+            self._db.commit()
+            self._pending = 0
+            self._last_commit = time.monotonic()
+
+    def replay(
+        self, topic: Optional[str] = None, offset: int = 0
+    ) -> Iterator[Dict[str, Any]]:
+        if topic is None:
+            rows = self._db.execute(
+                "SELECT record FROM bus_log WHERE offset >= ? ORDER BY offset", (offset,)
+            )
+        else:
+            rows = self._db.execute(
+                "SELECT record FROM bus_log WHERE topic = ? AND offset >= ? "
+                "ORDER BY offset",
+                (topic, offset),
+            )
+        for (record,) in rows.fetchall():
+            yield json.loads(record)
+
+    def compact(self, before_offset: int):
+        self._db.execute(
+            "INSERT OR REPLACE INTO bus_log_meta (key, value) "
+            "VALUES ('next_offset', ?)",
+            (self.next_offset,),
+        )
+        self._db.execute("DELETE FROM bus_log WHERE offset < ?", (before_offset,))
+        self._db.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._db.close()
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import os
+import struct
+from typing import Dict, Any, Optional, Set, Tuple
+from .message_bus import Envelope, MessageBus
+from .topic_trie import TopicTrie, is_pattern
+
+# 帧格式：4字节大端长度（含类型字节）+ 1字节帧类型 + 负载
+# SUBSCRIBE / UNSUBSCRIBE 的负载是紧凑JSON；PUBLISH 的负载是
+# 2字节主题长度 + UTF-8主题 + 紧凑JSON消息，代理只读主题，不解析消息
+FRAME_SUBSCRIBE = 1
+FRAME_UNSUBSCRIBE = 2
+FRAME_PUBLISH = 3
+
+_HEADER = struct.Struct("!IB")
+_TOPIC_LENGTH = struct.Struct("!H")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+def _dumps(payload: Any) -> bytes:
+    return json.dumps(
+        payload, ensure_ascii=False, separators=(",", ":"), default=str
+    ).encode("utf-8")
+
+
+def encode_frame(frame_type: int, payload: Any) -> bytes:
+    body = _dumps(payload)
+    return _HEADER.pack(len(body) + 1, frame_type) + body
+
+
+def encode_publish(topic: str, payload: Any) -> bytes:
+    topic_bytes = topic.encode("utf-8")
+    body = _TOPIC_LENGTH.pack(len(topic_bytes)) + topic_bytes + _dumps(payload)
+    return _HEADER.pack(len(body) + 1, FRAME_PUBLISH) + body
+
+
+def split_publish(body: bytes) -> Tuple[str, bytes]:
+    """拆分 PUBLISH 负载，返回 (主题, JSON消息)"""
+    (length,) = _TOPIC_LENGTH.unpack_from(body)
+    end = _TOPIC_LENGTH.size + length
+    return body[_TOPIC_LENGTH.size : end].decode("utf-8"), body[end:]
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """读取一帧，返回 (帧类型, 原始负载)；连接关闭时抛出 IncompleteReadError"""
+    header = await reader.readexactly(_HEADER.size)
+    length, frame_type = _HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame too large: {length} bytes")
+    return frame_type, await reader.readexactly(length - 1)
+
+
+class _Peer:
+    """代理端的一个连接：有界发送缓冲 + 写任务（每次写入后 drain）
+
+    慢订阅者的缓冲满时丢弃新消息，代理内存不会无限增长。
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, buffer_size: int):
+        self.writer = writer
+        self.buffer: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+        self.sender = asyncio.create_task(self._send())
+
+    def send(self, frame: bytes) -> bool:
+        try:
+            self.buffer.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def _send(self):
+        try:
+            while True:
+                frame = await self.buffer.get()
+                self.writer.write(frame)
+                await self.writer.drain()
+        except ConnectionError:
+            pass
+
+    async def aclose(self):
+        self.sender.cancel()
+        await asyncio.gather(self.sender, return_exceptions=True)
+        self.writer.close()
+
+
+class BusBroker:
+    """同一主机上多进程共享主题的消息代理（Unix domain socket）
+
+    只按帧头中的主题转发 PUBLISH 帧，不解析消息内容，也不回送给发布者自己。
+    每个连接有 buffer_size 帧的发送缓冲，满了之后丢弃发给该连接的消息（计入 dropped）。
+    可在某个工作进程内启动，或单独运行：python -m agent_system.bus_transport --socket PATH
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1000):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._topics: Dict[str, Set[_Peer]] = {}
+        self._patterns = TopicTrie()
+        self._peers: Set[_Peer] = set()
+        self.forwarded = 0
+        self.dropped = 0
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def aclose(self):
+        if self._server is not None:
+            self._server.close()
+        await asyncio.gather(
+            *(peer.aclose() for peer in list(self._peers)), return_exceptions=True
+        )
+        self._peers.clear()
+        self._topics.clear()
+        if self._server is not None:
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _subscribers(self, topic: str) -> Set[_Peer]:
+        peers = set(self._topics.get(topic, ()))
+        for pattern in self._patterns.match(topic):
+            peers.update(self._topics.get(pattern, ()))
+        return peers
+
+    def _add(self, topic: str, peer: _Peer):
+        self._topics.setdefault(topic, set()).add(peer)
+        if is_pattern(topic):
+            self._patterns.add(topic)
+
+    def _discard(self, topic: str, peer: _Peer):
+        peers = self._topics.get(topic)
+        if peers is None:
+            return
+        peers.discard(peer)
+        if not peers:
+            del self._topics[topic]
+            if is_pattern(topic):
+                self._patterns.remove(topic)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        peer = _Peer(writer, self.buffer_size)
+        self._peers.add(peer)
+        subscribed: Set[str] = set()
+        try:
+            while True:
+                frame_type, body = await read_frame(reader)
+                if frame_type == FRAME_SUBSCRIBE:
+                    topic = json.loads(body)
+                    subscribed.add(topic)
+                    self._add(topic, peer)
+                elif frame_type == FRAME_UNSUBSCRIBE:
+                    topic = json.loads(body)
+                    subscribed.discard(topic)
+                    self._discard(topic, peer)
+                elif frame_type == FRAME_PUBLISH:
+                    topic, _ = split_publish(body)
+                    frame = _HEADER.pack(len(body) + 1, frame_type) + body
+                    for target in self._subscribers(topic):
+                        if target is peer:
+                            continue
+                        if target.send(frame):
+                            self.forwarded += 1
+                        else:
+                            self.dropped += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for topic in subscribed:
+                self._discard(topic, peer)
+            if peer in self._peers:
+                self._peers.discard(peer)
+                await peer.aclose()
+
+
+class RemoteMessageBus(MessageBus):
+    """通过 BusBroker 与其他进程共享主题的消息总线，保持 subscribe/publish 接口不变
+
+    本地订阅者照常收到消息；发布的消息同时转发给其他进程中订阅了该主题的总线。
+    与代理的连接断开后只做本地投递，转发不了的消息记入 remote_dropped。
+    收到的消息按接收时间重新打时间戳，保持本地历史按时间有序。
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._receiver: Optional[asyncio.Task] = None
+        self._remote_topics: Dict[str, int] = {}
+        self.received = 0
+        self.errors = 0
+        self.remote_dropped = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+        for topic in self._remote_topics:
+            self._writer.write(encode_frame(FRAME_SUBSCRIBE, topic))
+        await self._writer.drain()
+        self._receiver = asyncio.create_task(self._receive())
+
+    async def __aenter__(self) -> "RemoteMessageBus":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def subscribe(self, topic: str, callback):
+        super().subscribe(topic, callback)
+        self._remote_topics[topic] = self._remote_topics.get(topic, 0) + 1
+        if self._remote_topics[topic] == 1 and self._writer is not None:
+            self._writer.write(encode_frame(FRAME_SUBSCRIBE, topic))
+
+    def unsubscribe(self, topic: str, callback):
+        super().unsubscribe(topic, callback)
+        self._release_topic(topic, 1)
+
+    def unsubscribe_all(self, topic: str):
+        super().unsubscribe_all(topic)
+        self._release_topic(topic, self._remote_topics.get(topic, 0))
+
+    def _release_topic(self, topic: str, count: int):
+        if topic not in self._remote_topics:
+            return
+        self._remote_topics[topic] -= count
+        if self._remote_topics[topic] <= 0:
+            del self._remote_topics[topic]
+            if self._writer is not None:
+                self._writer.write(encode_frame(FRAME_UNSUBSCRIBE, topic))
+
+    async def _route(self, envelope: Envelope):
+        """本地投递并转发给其他进程；连接断开时仍然本地投递"""
+        if self._writer is not None:
+            try:
+                self._writer.write(encode_publish(envelope.topic, envelope.to_dict()))
+                await self._writer.drain()
+            except ConnectionError as e:
+                self.remote_dropped += 1
+                self._disconnected(e)
+        else:
+            self.remote_dropped += 1
+        await self._dispatch(envelope)
+
+    def _disconnected(self, error: Optional[Exception] = None):
+        if self._writer is not None:
+            print(f"Lost connection to message broker {self.path}: {error}")
+            self._writer.close()
+            self._writer = None
+
+    async def _receive(self):
+        try:
+            while True:
+                frame_type, body = await read_frame(self._reader)
+                if frame_type != FRAME_PUBLISH:
+                    continue
+                self.received += 1
+                topic, payload = split_publish(body)
+                try:
+                    data = json.loads(payload)
+                    # 发送方的时间戳来自另一个事件循环的时钟，按接收时间重新记录
+                    envelope = Envelope(
+                        topic,
+                        data["content"],
+                        data["sender"],
+                        asyncio.get_running_loop().time(),
+                    )
+                    await self._dispatch(envelope)
+                except Exception as e:
+                    # 单条消息（或订阅者）出错不能中断接收，后续消息照常投递
+                    self.errors += 1
+                    print(f"Subscriber error on remote topic '{topic}': {e}")
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            self._disconnected(e)
+
+    async def aclose(self):
+        if self._receiver is not None:
+            self._receiver.cancel()
+            await asyncio.gather(self._receiver, return_exceptions=True)
+            self._receiver = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        await super().aclose()
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Run a local message bus broker")
+    parser.add_argument("--socket", required=True, help="Unix domain socket path")
+    args = parser.parse_args()
+    broker = BusBroker(args.socket)
+    await broker.start()
+    print(f"Message broker listening on {args.socket}")
+    await broker.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+def make_cache_key(**parts: Any) -> str:
+    """根据请求参数生成稳定的缓存键（规范化JSON的SHA-256）"""
+    payload = json.dumps(
+        parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LLM响应缓存：内存LRU + 可选的SQLite磁盘存储
+
+    内存层按最近使用顺序淘汰，磁盘层按最近访问时间淘汰；两层都支持TTL过期。
+    缓存的值必须是可JSON序列化的字典。
+
+    磁盘命中不立即写库：访问时间先记在内存中，在写入、关闭或累积
+    touch_batch 条后批量写回，命中路径上只有一次读查询。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        max_disk_entries: Optional[int] = None,
+        touch_batch: int = 100,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.touch_batch = touch_batch
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # 待写回的磁盘访问时间
+        self._touched: Dict[str, float] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # WAL 模式下 NORMAL 不会损坏数据库，断电时最多丢失最近的提交
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)"
+            )
+            self._db.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找缓存，先查内存再查磁盘；磁盘命中会回填内存"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._touched[key] = now
+                        if len(self._touched) >= self.touch_batch:
+                            self._flush_touched()
+                            self._db.commit()
+                        value = json.loads(row[0])
+                        self._put_memory(key, row[1], value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._touched.pop(key, None)
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """写入缓存（内存和磁盘）"""
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                self._touched.pop(key, None)
+                # 淘汰按访问时间排序，先写回待更新的访问时间
+                self._flush_touched()
+                if self.max_disk_entries is not None:
+                    # 只保留最近访问的 max_disk_entries 条
+                    cursor = self._db.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        "SELECT key FROM responses ORDER BY accessed_at DESC "
+                        "LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,),
+                    )
+                    self.evictions += max(cursor.rowcount, 0)
+                self._db.commit()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _put_memory(self, key: str, created_at: float, value: Dict[str, Any]):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._flush_touched()
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中/未命中计数"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
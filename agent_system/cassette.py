@@ -0,0 +1,162 @@
+import json
+import os
+from typing import Dict, Any, List, Optional
+import httpx
+from .cache import make_cache_key
+
+CASSETTE_MODES = ("record", "replay", "auto")
+
+# 记录的响应体已解码，这些头不能原样回放
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+def request_fingerprint(request: httpx.Request) -> str:
+    """请求指纹：方法 + 路径 + 规范化的JSON请求体（与API主机无关）"""
+    body = request.content.decode("utf-8") if request.content else ""
+    try:
+        body = json.loads(body) if body else None
+    except ValueError:
+        pass
+    return make_cache_key(method=request.method, path=request.url.path, body=body)
+
+
+class Cassette:
+    """录制的请求/响应对，JSONL格式，每行一次交互
+
+    同一指纹可以有多条记录，按录制顺序依次回放，用完后重复最后一条。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self._positions: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self._interactions.setdefault(
+                            interaction["fingerprint"], []
+                        ).append(interaction)
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._interactions.values())
+
+    def find(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        interactions = self._interactions.get(fingerprint)
+        if not interactions:
+            return None
+        position = self._positions.get(fingerprint, 0)
+        self._positions[fingerprint] = position + 1
+        return interactions[min(position, len(interactions) - 1)]
+
+    def append(self, interaction: Dict[str, Any]):
+        self._interactions.setdefault(interaction["fingerprint"], []).append(
+            interaction
+        )
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(interaction, ensure_ascii=False) + "\n")
+
+    def clear(self):
+        self._interactions.clear()
+        self._positions.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """录制/回放LLM请求的 httpx 传输层
+
+    - record：所有请求发往真实传输层，并覆盖录制到磁带
+    - replay：只从磁带回放，没有录制的请求返回 404（不会触发重试）
+    - auto：有录制则回放，否则请求真实传输层并追加录制
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "auto",
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.mode = mode
+        self.cassette = Cassette(path)
+        if mode == "record":
+            self.cassette.clear()
+        self.transport = transport
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def _inner(self) -> httpx.AsyncBaseTransport:
+        if self.transport is None:
+            self.transport = httpx.AsyncHTTPTransport()
+        return self.transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        fingerprint = request_fingerprint(request)
+
+        if self.mode != "record":
+            interaction = self.cassette.find(fingerprint)
+            if interaction is not None:
+                self.hits += 1
+                recorded = interaction["response"]
+                return httpx.Response(
+                    recorded["status_code"],
+                    headers=recorded["headers"],
+                    content=recorded["body"].encode("utf-8"),
+                    request=request,
+                )
+            self.misses += 1
+            if self.mode == "replay":
+                message = f"No recorded response for request {fingerprint}"
+                return httpx.Response(
+                    404,
+                    json={"error": {"message": message, "type": "cassette_miss"}},
+                    request=request,
+                )
+
+        response = await self._inner().handle_async_request(request)
+        body = await response.aread()
+        await response.aclose()
+        headers = {
+            key: value
+            for key, value in response.headers.items()
+            if key.lower() not in _DROPPED_HEADERS
+        }
+        self.cassette.append(
+            {
+                "fingerprint": fingerprint,
+                "request": {
+                    "method": request.method,
+                    "path": request.url.path,
+                    "body": request.content.decode("utf-8"),
+                },
+                "response": {
+                    "status_code": response.status_code,
+                    "headers": headers,
+                    "body": body.decode("utf-8"),
+                },
+            }
+        )
+        self.recorded += 1
+        return httpx.Response(
+            response.status_code, headers=headers, content=body, request=request
+        )
+
+    async def aclose(self):
+        if self.transport is not None:
+            await self.transport.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "interactions": len(self.cassette),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+        }
@@ -0,0 +1,100 @@
+import json
+import os
+import re
+import time
+from typing import Dict, Any, List, Optional
+from .fileutil import atomic_write_json
+
+# 这些状态的节点在恢复时需要重新执行
+INCOMPLETE_STATUSES = ("error", "skipped", "timeout")
+
+# run_id 用作目录名，只允许不含路径分隔符的普通名称
+_RUN_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+
+class CheckpointStore:
+    """工作流检查点：每个运行一个目录，任务信息和每个已完成节点的结果各存一个文件
+
+        <directory>/<run_id>/run.json
+        <directory>/<run_id>/nodes/<node>.json
+
+    所有文件都通过原子替换写入，进程崩溃不会留下损坏的检查点。
+    run_id 必须是由字母、数字、"_"、"." 和 "-" 组成的普通名称。
+    """
+
+    def __init__(self, directory: str, fsync: bool = True):
+        self.directory = directory
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+    def _run_dir(self, run_id: str) -> str:
+        if not isinstance(run_id, str) or not _RUN_ID.fullmatch(run_id):
+            raise ValueError(f"Invalid run_id for checkpoint: {run_id!r}")
+        return os.path.join(self.directory, run_id)
+
+    def _write_run(self, run_id: str, info: Dict[str, Any]):
+        atomic_write_json(
+            os.path.join(self._run_dir(run_id), "run.json"), info, self.fsync
+        )
+
+    def start(
+        self,
+        run_id: str,
+        task: str,
+        tenant: Optional[str] = None,
+        resume: bool = False,
+    ):
+        """开始（resume=True 时继续）一次运行；新运行会清除同名运行留下的节点结果"""
+        nodes_dir = os.path.join(self._run_dir(run_id), "nodes")
+        os.makedirs(nodes_dir, exist_ok=True)
+        if resume:
+            info = self.get_run(run_id) or {"run_id": run_id, "created_at": time.time()}
+        else:
+            for name in os.listdir(nodes_dir):
+                os.remove(os.path.join(nodes_dir, name))
+            info = {"run_id": run_id, "created_at": time.time(), "tenant": tenant}
+        info.update({"task": task, "status": "running", "updated_at": time.time()})
+        self._write_run(run_id, info)
+
+    def save_node(self, run_id: str, node: str, result: Any) -> bool:
+        """保存已完成节点的结果；失败/跳过/超时的节点不保存，返回是否已保存"""
+        if isinstance(result, dict) and result.get("status") in INCOMPLETE_STATUSES:
+            return False
+        path = os.path.join(self._run_dir(run_id), "nodes", f"{node}.json")
+        atomic_write_json(path, result, self.fsync)
+        return True
+
+    def finish(self, run_id: str, status: str):
+        info = self.get_run(run_id) or {"run_id": run_id}
+        info.update({"status": status, "updated_at": time.time()})
+        self._write_run(run_id, info)
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            path = os.path.join(self._run_dir(run_id), "run.json")
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def load_results(self, run_id: str) -> Dict[str, Any]:
+        nodes_dir = os.path.join(self._run_dir(run_id), "nodes")
+        results = {}
+        if not os.path.isdir(nodes_dir):
+            return results
+        for name in os.listdir(nodes_dir):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(nodes_dir, name), encoding="utf-8") as f:
+                results[name[:-5]] = json.load(f)
+        return results
+
+    def list_runs(self) -> List[Dict[str, Any]]:
+        runs = []
+        for run_id in sorted(os.listdir(self.directory)):
+            if not _RUN_ID.fullmatch(run_id):
+                continue
+            info = self.get_run(run_id)
+            if info is not None:
+                runs.append(info)
+        return runs
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
@@ -10,7 +11,79 @@ class LLMConfig(BaseModel):
     model: str = "deepseek-chat"
     api_base: str = "https://api.deepseek.com/v1"
     temperature: float = 0
+    # 默认的 max_tokens，也是动态估算的下限
     max_tokens: int = 2000
+    # 工具调用按参数schema估算 max_tokens：估算值乘以 output_token_margin，
+    # 限制在 [max_tokens, max_output_tokens] 内；输出被截断时用 max_output_tokens 重试一次
+    dynamic_max_tokens: bool = True
+    output_token_margin: float = 1.25
+    max_output_tokens: int = 8192
+
+    # 响应缓存（默认关闭）
+    cache_enabled: bool = False
+    cache_path: Optional[str] = None
+    cache_max_entries: int = 1024
+    cache_max_disk_entries: Optional[int] = 100000
+    cache_ttl: Optional[float] = None
+    # 非零temperature的结果默认不缓存
+    cache_nondeterministic: bool = False
+    # 合并并发的相同请求
+    singleflight_enabled: bool = True
+
+    # 限流与并发控制
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    max_concurrency: int = 16
+    min_concurrency: int = 1
+    # 单次请求延迟超过该值（秒）视为过载，降低并发
+    latency_target: Optional[float] = None
+    max_retries: int = 3
+    retry_backoff_base: float = 0.5
+    retry_backoff_max: float = 30.0
+    # 单次请求的超时（秒）；在任务截止时间内运行时取两者中较小的剩余时间
+    request_timeout: Optional[float] = None
+
+    # 对冲请求：超过近期延迟的 hedge_percentile 分位数仍未返回时再发一次，
+    # 对冲请求数不超过总请求数的 hedge_max_ratio
+    hedge_enabled: bool = False
+    hedge_percentile: float = 0.95
+    hedge_max_ratio: float = 0.1
+    hedge_min_samples: int = 20
+    hedge_window: int = 200
+
+    # 录制/回放磁带（JSONL）；cassette_mode 为 record / replay / auto
+    cassette_path: Optional[str] = None
+    cassette_mode: str = "auto"
+
+    # 批量接口的默认并发数
+    batch_concurrency: int = 8
+
+    # HTTP连接池（进程内共享）
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http2: bool = False
+    http_connect_timeout: float = 10.0
+    http_timeout: float = 600.0
+    # 启动时预先建立的连接数，0表示不预热
+    http_prewarm_connections: int = 0
+
+
+class HistoryPolicy(BaseModel):
+    """Conversation history sent to the LLM on each call"""
+
+    # 保留最近的轮数（一轮 = 一条user消息及其后的回复），None表示不限制
+    max_turns: Optional[int] = None
+    # 历史消息的token预算，None表示不限制
+    max_tokens: Optional[int] = None
+    # 将窗口外的旧轮次压缩为一条摘要消息，而不是直接丢弃
+    summarize: bool = True
+    # 摘要中每条消息最多保留的字符数
+    summary_max_chars: int = 200
+    # 摘要的总token上限（同时受 max_tokens 剩余预算限制），超出时先丢弃最旧的消息
+    summary_max_tokens: int = 500
+    # 用紧凑JSON而不是 str(result) 记录工具调用结果
+    compact_results: bool = True
 
 
 class AgentConfig(BaseModel):
@@ -20,6 +93,7 @@ class AgentConfig(BaseModel):
     description: str
     role: str
     llm_config: LLMConfig
+    history: HistoryPolicy = HistoryPolicy()
 
 
 def load_config() -> LLMConfig:
@@ -29,4 +103,11 @@ def load_config() -> LLMConfig:
         api_key=os.getenv("DEEPSEEK_API_KEY", "sk-7d26badfc6c348cf8da0fc4f67eb6f85"),
         model=os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
         api_base=os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1"),
+        cache_enabled=os.getenv("DEEPSEEK_CACHE", "0").lower() in ("1", "true", "yes"),
+        cache_path=os.getenv("DEEPSEEK_CACHE_PATH") or None,
+        requests_per_minute=int(os.getenv("DEEPSEEK_RPM", "0")) or None,
+        tokens_per_minute=int(os.getenv("DEEPSEEK_TPM", "0")) or None,
+        http2=os.getenv("DEEPSEEK_HTTP2", "0").lower() in ("1", "true", "yes"),
+        cassette_path=os.getenv("DEEPSEEK_CASSETTE") or None,
+        cassette_mode=os.getenv("DEEPSEEK_CASSETTE_MODE", "auto"),
     )
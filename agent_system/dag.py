@@ -0,0 +1,154 @@
+import asyncio
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Set
+
+# run_node(节点名, {上游节点名: 上游结果}) -> 节点结果
+NodeRunner = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+
+class WorkflowError(ValueError):
+    """工作流配置错误（未知节点或存在环）"""
+
+
+def workflow_dependencies(workflow: Dict[str, Dict[str, Any]]) -> Dict[str, Set[str]]:
+    """汇总每个节点的依赖：wait_for 中的节点，以及在 next 中指向它的节点"""
+    deps: Dict[str, Set[str]] = {node: set() for node in workflow}
+    for node, spec in workflow.items():
+        for dep in spec.get("wait_for", []):
+            if dep not in workflow:
+                raise WorkflowError(f"Node '{node}' waits for unknown node '{dep}'")
+            deps[node].add(dep)
+        for child in spec.get("next", []):
+            if child not in workflow:
+                raise WorkflowError(f"Node '{node}' points to unknown node '{child}'")
+            deps[child].add(node)
+    return deps
+
+
+def topological_order(workflow: Dict[str, Dict[str, Any]]) -> List[str]:
+    """返回拓扑顺序，存在环时抛出 WorkflowError"""
+    deps = workflow_dependencies(workflow)
+    remaining = {node: len(d) for node, d in deps.items()}
+    children: Dict[str, List[str]] = {node: [] for node in workflow}
+    for node, d in deps.items():
+        for dep in d:
+            children[dep].append(node)
+
+    order = [node for node, count in remaining.items() if count == 0]
+    for node in order:
+        for child in children[node]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                order.append(child)
+
+    if len(order) != len(workflow):
+        cyclic = sorted(node for node, count in remaining.items() if count > 0)
+        raise WorkflowError(f"Workflow contains a cycle involving: {cyclic}")
+    return order
+
+
+class DAGExecutor:
+    """并发执行工作流DAG：依赖满足的节点立即并发启动，下游节点收到上游结果
+
+    node_concurrency 限制每个节点同时执行的数量（同一执行器被多个任务共享时生效）。
+    """
+
+    def __init__(
+        self,
+        workflow: Dict[str, Dict[str, Any]],
+        node_concurrency: Optional[Dict[str, int]] = None,
+    ):
+        self.workflow = workflow
+        self.order = topological_order(workflow)
+        self.dependencies = workflow_dependencies(workflow)
+        self.children: Dict[str, List[str]] = {node: [] for node in workflow}
+        for node in self.order:
+            for dep in self.dependencies[node]:
+                self.children[dep].append(node)
+        self.semaphores = {
+            node: asyncio.Semaphore(limit)
+            for node, limit in (node_concurrency or {}).items()
+            if node in workflow
+        }
+
+    def levels(self) -> List[List[str]]:
+        """按最长依赖路径分层：同一层的节点之间没有依赖"""
+        depth: Dict[str, int] = {}
+        for node in self.order:
+            depth[node] = max((depth[d] + 1 for d in self.dependencies[node]), default=0)
+        layers: List[List[str]] = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for node in self.order:
+            layers[depth[node]].append(node)
+        return layers
+
+    async def _run_node(
+        self, node: str, run_node: NodeRunner, upstream: Dict[str, Any]
+    ) -> Any:
+        semaphore = self.semaphores.get(node)
+        if semaphore is None:
+            return await run_node(node, upstream)
+        async with semaphore:
+            return await run_node(node, upstream)
+
+    async def run(
+        self, run_node: NodeRunner, completed: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """执行所有节点，返回 {节点名: 结果}
+
+        completed 中已有结果的节点不会再执行。节点抛出的异常转为错误结果，
+        其所有下游节点标记为 skipped。
+        """
+        results: Dict[str, Any] = dict(completed or {})
+        failed: Set[str] = set()
+        waiting = {
+            node: len(self.dependencies[node] - results.keys())
+            for node in self.order
+            if node not in results
+        }
+        ready = [node for node, count in waiting.items() if count == 0]
+        running: Dict[asyncio.Task, str] = {}
+
+        def finish(node: str):
+            for child in self.children[node]:
+                if child not in waiting:
+                    continue
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    ready.append(child)
+
+        try:
+            while ready or running:
+                while ready:
+                    node = ready.pop(0)
+                    del waiting[node]
+                    upstream_failed = [d for d in self.dependencies[node] if d in failed]
+                    if upstream_failed:
+                        failed.add(node)
+                        results[node] = {
+                            "status": "skipped",
+                            "error": f"Upstream node failed: {sorted(upstream_failed)}",
+                        }
+                        finish(node)
+                        continue
+                    upstream = {dep: results[dep] for dep in self.dependencies[node]}
+                    task = asyncio.create_task(self._run_node(node, run_node, upstream))
+                    running[task] = node
+
+                if not running:
+                    break
+                done, _ = await asyncio.wait(
+                    running.keys(), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    node = running.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        failed.add(node)
+                        results[node] = {"status": "error", "error": str(error)}
+                    else:
+                        results[node] = task.result()
+                    finish(node)
+        finally:
+            for task in running:
+                task.cancel()
+
+        return results
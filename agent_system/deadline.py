@@ -0,0 +1,125 @@
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Iterator, Optional
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """任务的截止时间已过"""
+
+
+class Deadline:
+    """截止时间（time.monotonic 时钟）"""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class SharedDeadline(Deadline):
+    """多个调用方共享的请求的截止时间：取所有等待者中最晚的截止时间
+
+    共享请求本身不设超时（with_deadline 不生效），由各等待者分别计时，
+    这里只用于计算每次HTTP尝试的超时。
+    """
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(-math.inf)
+
+    def extend(self, deadline: Optional[Deadline]):
+        """加入一个等待者；没有截止时间的等待者使共享请求不再受时间限制"""
+        expires_at = math.inf if deadline is None else deadline.expires_at
+        self.expires_at = max(self.expires_at, expires_at)
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    "agent_deadline", default=None
+)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """在当前上下文中设置截止时间；嵌套时只能缩短，不能延长外层的截止时间
+
+    截止时间通过 contextvars 传递，范围内创建的 asyncio 任务自动继承。
+    seconds 为 None 时不改变当前截止时间。
+    """
+    outer = _current_deadline.get()
+    if seconds is None:
+        yield outer
+        return
+    deadline = Deadline.after(seconds)
+    if outer is not None and outer.expires_at <= deadline.expires_at:
+        deadline = outer
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """在当前上下文中使用指定的截止时间（不与外层比较）"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def remaining_time(cap: Optional[float] = None) -> Optional[float]:
+    """当前截止时间的剩余秒数，与 cap 取较小值；都没有时返回 None"""
+    deadline = _current_deadline.get()
+    if deadline is None or deadline.expires_at == math.inf:
+        return cap
+    remaining = deadline.remaining()
+    return remaining if cap is None else min(remaining, cap)
+
+
+async def with_deadline(awaitable: Awaitable[Any]) -> Any:
+    """在当前截止时间内等待，超时则取消并抛出 DeadlineExceeded"""
+    if isinstance(_current_deadline.get(), SharedDeadline):
+        # 共享请求由各等待者分别计时，最后一个等待者离开时才取消
+        return await awaitable
+    timeout = remaining_time()
+    if timeout is None:
+        return await awaitable
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("Deadline exceeded")
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise
+        raise DeadlineExceeded(f"Deadline exceeded after {timeout:.2f}s") from None
+
+
+def timeout_result(error: Any) -> Dict[str, Any]:
+    """超时节点/请求的结果"""
+    return {
+        "status": "timeout",
+        "error": str(error),
+        "message": f"Timed out: {error}",
+    }
@@ -0,0 +1,31 @@
+import json
+import os
+import tempfile
+from typing import Any
+
+
+def atomic_write_json(path: str, data: Any, fsync: bool = True):
+    """原子写入JSON：先写同目录下的临时文件，fsync 后再替换目标文件
+
+    进程在任意时刻崩溃，目标文件要么是旧内容，要么是完整的新内容。
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    if fsync:
+        # 目录项也要落盘，替换操作才算持久化
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -0,0 +1,246 @@
+import asyncio
+import email.utils
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Optional, Callable, Awaitable, Tuple
+import openai
+from .metrics import LLM_RETRIES
+
+
+class TokenBucket:
+    """令牌桶：按每分钟速率补充，容量默认等于一分钟的配额"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        # 超过容量的请求在桶满时放行，避免永远等待
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            delay = (amount - self.tokens) / self.rate
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+    def adjust(self, amount: float):
+        """按实际用量修正（正数为补扣，负数为返还）"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveLimiter:
+    """AIMD并发控制：成功时加性增大并发上限，过载（429/5xx/高延迟）时乘性减小
+
+    每个拥塞窗口只减小一次：在上次减小之前就已发出的请求返回的过载信号被忽略，
+    否则同时失败的 N 个请求会把上限连续减半 N 次。
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial: Optional[int] = None,
+        latency_target: Optional[float] = None,
+        decrease_factor: float = 0.5,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial or max_limit)
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.last_decrease = float("-inf")
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(
+        self,
+        latency: float,
+        overloaded: bool = False,
+        started: Optional[float] = None,
+    ):
+        """释放槽位并调整上限；started 为请求开始时间（time.monotonic）"""
+        if self.latency_target is not None and latency > self.latency_target:
+            overloaded = True
+        if overloaded:
+            if started is None or started >= self.last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self.last_decrease = time.monotonic()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        await self.release_slot()
+
+    async def release_slot(self):
+        """只释放槽位，不调整上限（请求被取消时）"""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """解析 Retry-After / retry-after-ms 响应头（秒数或HTTP日期）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        if parsed is None:
+            return None
+        return max(0.0, parsed.timestamp() - time.time())
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    status = _status_code(error)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+
+class RateGovernor:
+    """LLM客户端的限流器：RPM/TPM令牌桶 + AIMD并发控制 + 带抖动的重试"""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        latency_target: Optional[float] = None,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+    ):
+        self.request_bucket = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.limiter = AdaptiveLimiter(
+            max_limit=max_concurrency,
+            min_limit=min_concurrency,
+            latency_target=latency_target,
+        )
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            # 服务端指定的等待时间，加少量抖动避免同时重试
+            return retry_after + random.uniform(0, self.backoff_base)
+        # full jitter 指数退避
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def _attempt(
+        self, fn: Callable[[], Awaitable[Any]], estimated_tokens: int
+    ) -> Tuple[Any, float]:
+        """在限流约束下执行 fn，可重试的错误按退避策略重试，最终失败则抛出
+
+        成功时返回 (结果, 开始时间)，并发槽位仍被占用，由调用方释放。
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.request_bucket is not None:
+                await self.request_bucket.acquire(1)
+            if self.token_bucket is not None and estimated_tokens:
+                await self.token_bucket.acquire(estimated_tokens)
+            await self.limiter.acquire()
+
+            self.requests += 1
+            start = time.monotonic()
+            try:
+                return await fn(), start
+            except Exception as e:
+                status = _status_code(e)
+                overloaded = status == 429 or (status is not None and status >= 500)
+                await self.limiter.release(time.monotonic() - start, overloaded, start)
+                if status == 429:
+                    self.throttled += 1
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                LLM_RETRIES.inc(status=status or "connection")
+                delay = self._backoff(attempt, e)
+                print(f"LLM request failed ({e}), retrying in {delay:.2f}s...")
+                await asyncio.sleep(delay)
+            except BaseException:
+                # 被取消的请求既不是成功也不是过载
+                await self.limiter.release_slot()
+                raise
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        estimated_tokens: int = 0,
+        usage_tokens: Optional[Callable[[Any], Optional[int]]] = None,
+    ) -> Any:
+        """在限流约束下执行请求，可重试的错误按退避策略重试，最终失败则抛出"""
+        result, start = await self._attempt(fn, estimated_tokens)
+        await self.limiter.release(time.monotonic() - start, started=start)
+        if self.token_bucket is not None and usage_tokens is not None:
+            actual = usage_tokens(result)
+            if actual is not None:
+                self.token_bucket.adjust(actual - estimated_tokens)
+        return result
+
+    @asynccontextmanager
+    async def hold(
+        self, fn: Callable[[], Awaitable[Any]], estimated_tokens: int = 0
+    ) -> AsyncIterator[Any]:
+        """与 run 相同地发起请求（如流式响应），但并发槽位一直占用到上下文退出
+
+        正常退出时按完整耗时（而不是首字节时间）调整并发上限；
+        读取过程中出错或被取消时只释放槽位。
+        """
+        result, start = await self._attempt(fn, estimated_tokens)
+        try:
+            yield result
+        except BaseException:
+            await self.limiter.release_slot()
+            raise
+        await self.limiter.release(time.monotonic() - start, started=start)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "concurrency_limit": self.limiter.limit,
+            "in_flight": self.limiter.in_flight,
+        }
@@ -0,0 +1,108 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class LatencyHistogram:
+    """最近 window 次请求的延迟样本，用于估计分位数"""
+
+    def __init__(self, window: int = 200):
+        self.samples: deque = deque(maxlen=window)
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+
+class Hedger:
+    """对冲请求：请求超过近期延迟的某个分位数仍未返回时，再发一个相同的请求，
+    先返回的结果胜出，另一个被取消
+
+    延迟按 key（模型/工具）分别统计；对冲请求数不超过总请求数的 max_ratio，
+    避免服务变慢时对冲请求放大负载。
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        max_ratio: float = 0.1,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.window = window
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def histogram(self, key: str) -> LatencyHistogram:
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram(self.window)
+        return histogram
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """发出对冲请求前的等待时间；样本不足时返回 None（不对冲）"""
+        histogram = self.histogram(key)
+        if len(histogram) < self.min_samples:
+            return None
+        return histogram.percentile(self.percentile)
+
+    def _can_hedge(self) -> bool:
+        return self.hedged + 1 <= self.max_ratio * self.requests
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.requests += 1
+        delay = self.hedge_delay(key)
+        start = time.monotonic()
+        primary = asyncio.ensure_future(fn())
+        tasks = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._can_hedge():
+                    self.hedged += 1
+                    tasks.add(asyncio.ensure_future(fn()))
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self.histogram(key).record(time.monotonic() - start)
+                    if task is not primary:
+                        self.hedge_wins += 1
+                    return task.result()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delays": {
+                key: histogram.percentile(self.percentile)
+                for key, histogram in self.histograms.items()
+            },
+        }
@@ -0,0 +1,122 @@
+import json
+from typing import Dict, Any, List, Optional, Tuple
+from .config import HistoryPolicy
+from .tokens import estimate_message_tokens, estimate_tokens
+
+# 记录到历史中时去掉的大字段
+_DROPPED_RESULT_KEYS = ("raw_response", "message", "stack_trace")
+
+
+def compact_result(result: Any) -> str:
+    """将结果序列化为紧凑JSON，去掉原始响应、堆栈等不需要发给模型的字段"""
+    if isinstance(result, dict):
+        result = {k: v for k, v in result.items() if k not in _DROPPED_RESULT_KEYS}
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def split_turns(messages: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """按轮次分组：每轮以一条user消息开始"""
+    turns: List[List[Dict[str, Any]]] = []
+    for message in messages:
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+_SUMMARY_HEADER = "以下是之前对话的摘要:"
+
+
+def summarize_turns(
+    turns: List[List[Dict[str, Any]]],
+    max_chars: int,
+    max_tokens: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    """把旧轮次压缩成一条摘要消息（每条消息截取前 max_chars 个字符）
+
+    摘要整体不超过 max_tokens：从最新的消息往前加入，放不下的更早消息被丢弃；
+    一条也放不下时返回 None。
+    """
+    budget = None
+    if max_tokens is not None:
+        budget = max_tokens - estimate_message_tokens([{"content": _SUMMARY_HEADER}])
+    lines: List[str] = []
+    for message in reversed([message for turn in turns for message in turn]):
+        content = str(message.get("content", ""))
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        line = f"[{message.get('role')}] {content}"
+        if budget is not None:
+            # 每行另加换行符，按单独估算再多计1个token
+            cost = estimate_tokens(line) + 1
+            if cost > budget:
+                break
+            budget -= cost
+        lines.append(line)
+    if not lines:
+        return None
+    lines.reverse()
+    return {
+        "role": "user",
+        "content": _SUMMARY_HEADER + "\n" + "\n".join(lines),
+        "sender": "history_summary",
+    }
+
+
+class HistoryStats:
+    """统计历史策略节省的prompt token数"""
+
+    def __init__(self):
+        self.calls = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.full_tokens - self.sent_tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "full_tokens": self.full_tokens,
+            "sent_tokens": self.sent_tokens,
+            "saved_tokens": self.saved_tokens,
+        }
+
+
+def apply_history_policy(
+    messages: List[Dict[str, Any]], policy: HistoryPolicy
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """按策略截取要发送的历史，返回 (消息列表, 原始token数, 发送token数)
+
+    最新一轮总是保留；其余轮次从新到旧加入，直到超出轮数或token预算。
+    窗口外的旧轮次摘要计入token预算，只使用保留轮次之后剩余的部分。
+    """
+    full_tokens = estimate_message_tokens(messages)
+    if policy.max_turns is None and policy.max_tokens is None:
+        return messages, full_tokens, full_tokens
+
+    turns = split_turns(messages)
+    kept: List[List[Dict[str, Any]]] = []
+    used = 0
+    for turn in reversed(turns):
+        cost = estimate_message_tokens(turn)
+        if kept:
+            if policy.max_turns is not None and len(kept) >= policy.max_turns:
+                break
+            if policy.max_tokens is not None and used + cost > policy.max_tokens:
+                break
+        kept.append(turn)
+        used += cost
+    kept.reverse()
+
+    dropped = turns[: len(turns) - len(kept)]
+    window = [message for turn in kept for message in turn]
+    if dropped and policy.summarize:
+        summary_tokens = policy.summary_max_tokens
+        if policy.max_tokens is not None:
+            summary_tokens = min(summary_tokens, policy.max_tokens - used)
+        summary = summarize_turns(dropped, policy.summary_max_chars, summary_tokens)
+        if summary is not None:
+            window = [summary] + window
+    return window, full_tokens, estimate_message_tokens(window)
@@ -0,0 +1,135 @@
+import asyncio
+import importlib.util
+from typing import Dict, Any, Callable, Optional, Tuple
+import httpx
+from .config import LLMConfig
+
+
+class _PoolEntry:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.refs = 0
+
+
+# 进程级连接池：相同连接参数的LLM客户端共享同一个 httpx.AsyncClient
+_pools: Dict[Tuple, _PoolEntry] = {}
+
+
+class LoopBoundTransport(httpx.AsyncBaseTransport):
+    """按事件循环分别维护连接池的传输层
+
+    httpx 的连接绑定在打开它的事件循环上，而客户端常在事件循环外创建、
+    之后在多个循环中使用（例如多次 asyncio.run）。每个循环在首次请求时
+    创建自己的连接池，循环关闭后其连接池被丢弃。
+    """
+
+    def __init__(self, factory: Callable[[], httpx.AsyncBaseTransport]):
+        self._factory = factory
+        self._transports: Dict[asyncio.AbstractEventLoop, httpx.AsyncBaseTransport] = {}
+
+    def _transport(self) -> httpx.AsyncBaseTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            # 已关闭的循环中的连接无法再使用，也无法在其他循环中关闭
+            for closed in [other for other in self._transports if other.is_closed()]:
+                del self._transports[closed]
+            transport = self._transports[loop] = self._factory()
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        transports, self._transports = self._transports, {}
+        for owner, transport in transports.items():
+            if owner is loop:
+                await transport.aclose()
+
+
+def _pool_key(config: LLMConfig) -> Tuple:
+    return (
+        config.http_max_connections,
+        config.http_max_keepalive_connections,
+        config.http_keepalive_expiry,
+        config.http2,
+        config.http_connect_timeout,
+        config.http_timeout,
+    )
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_http_client(
+    config: LLMConfig, transport: Optional[httpx.AsyncBaseTransport] = None
+) -> httpx.AsyncClient:
+    """创建独立（不共享）的HTTP客户端；指定 transport 时由其负责连接管理"""
+    if transport is not None:
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(
+                config.http_timeout, connect=config.http_connect_timeout
+            ),
+        )
+    http2 = config.http2
+    if http2 and not _http2_available():
+        print("HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=config.http_max_connections,
+        max_keepalive_connections=config.http_max_keepalive_connections,
+        keepalive_expiry=config.http_keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        transport=LoopBoundTransport(
+            lambda: httpx.AsyncHTTPTransport(http2=http2, limits=limits)
+        ),
+        timeout=httpx.Timeout(config.http_timeout, connect=config.http_connect_timeout),
+    )
+
+
+def acquire_http_client(config: LLMConfig) -> httpx.AsyncClient:
+    """获取共享的HTTP客户端（引用计数+1），用完需调用 release_http_client"""
+    key = _pool_key(config)
+    entry = _pools.get(key)
+    if entry is None or entry.client.is_closed:
+        entry = _pools[key] = _PoolEntry(create_http_client(config))
+    entry.refs += 1
+    return entry.client
+
+
+async def release_http_client(client: httpx.AsyncClient):
+    """释放共享的HTTP客户端，最后一个使用者释放时关闭连接池"""
+    for key, entry in list(_pools.items()):
+        if entry.client is client:
+            entry.refs -= 1
+            if entry.refs <= 0:
+                del _pools[key]
+                await client.aclose()
+            return
+    if not client.is_closed:
+        await client.aclose()
+
+
+async def prewarm_http_client(
+    client: httpx.AsyncClient, url: str, connections: int = 1
+):
+    """预先建立连接（TCP+TLS握手），忽略请求本身的结果"""
+
+    async def touch():
+        try:
+            await client.head(url)
+        except httpx.HTTPError as e:
+            print(f"HTTP pool pre-warm failed: {e}")
+
+    await asyncio.gather(*(touch() for _ in range(connections)))
+
+
+def pool_stats() -> Dict[str, Any]:
+    return {
+        "pools": len(_pools),
+        "refs": sum(entry.refs for entry in _pools.values()),
+    }
@@ -1,21 +1,451 @@
 import os
 import json
+import asyncio
+import time
 import httpx
-from typing import Dict, Any, List, Optional, Union
+from typing import (
+    Dict,
+    Any,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    Callable,
+    Awaitable,
+    AsyncIterator,
+    Iterable,
+)
 from openai import AsyncOpenAI
 from openai.types.chat import ChatCompletion
 from .config import LLMConfig
+from .cache import ResponseCache, make_cache_key
+from .streaming import IncrementalJSONParser
+from .governor import RateGovernor
+from .hedging import Hedger
+from .tokens import estimate_message_tokens, estimate_schema_tokens
+from .http_pool import (
+    acquire_http_client,
+    create_http_client,
+    release_http_client,
+    prewarm_http_client,
+)
+from .cassette import CassetteTransport
+from .batch import gather_bounded, ProgressCallback
+from .deadline import (
+    DeadlineExceeded,
+    SharedDeadline,
+    current_deadline,
+    remaining_time,
+    use_deadline,
+    with_deadline,
+)
+from .tracing import span
+from .metrics import (
+    LLM_CACHE,
+    LLM_LATENCY,
+    LLM_REQUESTS,
+    LLM_TOKENS,
+    current_role,
+    role_scope,
+)
+
+
+class _Flight:
+    __slots__ = ("future", "deadline", "waiters")
+
+    def __init__(self):
+        self.future: Optional[asyncio.Future] = None
+        self.deadline = SharedDeadline()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合并并发的相同请求：同一指纹的调用方共享一次进行中的请求结果
+
+    截止时间按调用方分别生效：共享请求使用所有等待者中最晚的截止时间，
+    单个调用方被取消（或超时）不影响其他等待者；最后一个等待者离开时取消共享请求。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            flight = self._inflight[key] = _Flight()
+        flight.deadline.extend(current_deadline())
+        if flight.future is None:
+            flight.future = asyncio.ensure_future(self._run(flight, fn))
+            flight.future.add_done_callback(lambda f: self._forget(key, f))
+        flight.waiters += 1
+        try:
+            # shield: 单个调用方被取消时不影响其他等待者
+            return await with_deadline(asyncio.shield(flight.future))
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.future.done():
+                flight.future.cancel()
+
+    @staticmethod
+    async def _run(flight: _Flight, fn: Callable[[], Awaitable[Any]]) -> Any:
+        with use_deadline(flight.deadline):
+            return await fn()
+
+    def _forget(self, key: str, future: asyncio.Future):
+        flight = self._inflight.get(key)
+        if flight is not None and flight.future is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # 标记异常已被读取，避免所有等待者都被取消时产生告警
+            future.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+
+class OutputTruncated(Exception):
+    """输出达到 max_tokens 被截断（finish_reason == "length"），结果不完整
+
+    usage 为截断前各次调用实际消耗的token用量，仍需计入预算。
+    """
+
+    def __init__(self, message: str, usage: Optional[Dict[str, int]] = None):
+        super().__init__(message)
+        self.usage = usage
+
+
+class GeneratedText(str):
+    """generate 的返回值：普通字符串，usage 为本次调用实际消耗的token用量
+
+    响应来自缓存或合并到其他调用方的请求时没有消耗token，usage 为 None。
+    """
+
+    usage: Optional[Dict[str, int]] = None
+
+
+def _usage(response: ChatCompletion) -> Optional[Dict[str, int]]:
+    if response.usage is None:
+        return None
+    return {
+        "prompt_tokens": response.usage.prompt_tokens,
+        "completion_tokens": response.usage.completion_tokens,
+        "total_tokens": response.usage.total_tokens,
+    }
+
+
+def _add_usage(
+    total: Optional[Dict[str, int]], usage: Optional[Dict[str, int]]
+) -> Optional[Dict[str, int]]:
+    if usage is None:
+        return total
+    if total is None:
+        return dict(usage)
+    return {key: total.get(key, 0) + value for key, value in usage.items()}
+
+
+def _truncated(response: ChatCompletion) -> bool:
+    return bool(response.choices) and response.choices[0].finish_reason == "length"
+
+
+def _annotate(span, response: ChatCompletion):
+    """在追踪区间上记录token用量和结束原因"""
+    if response.usage is not None:
+        span.set("prompt_tokens", response.usage.prompt_tokens)
+        span.set("completion_tokens", response.usage.completion_tokens)
+    if response.choices:
+        span.set("finish_reason", response.choices[0].finish_reason)
 
 
 class DeepSeekLLM:
-    def __init__(self, config: LLMConfig):
+    def __init__(
+        self,
+        config: LLMConfig,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
         self.config = config
         self.model = config.model
-        # 创建OpenAI客户端
+        # 创建OpenAI客户端，使用进程内共享的连接池（重试由 RateGovernor 负责）；
+        # 指定 transport（如 MockTransport）或录制磁带时使用独立的客户端
+        if config.cassette_path:
+            transport = CassetteTransport(
+                config.cassette_path, config.cassette_mode, transport
+            )
+        if transport is not None:
+            self.http_client = create_http_client(config, transport)
+        else:
+            self.http_client = acquire_http_client(config)
         self.client = AsyncOpenAI(
             api_key=config.api_key,
             base_url=config.api_base,
-            http_client=httpx.AsyncClient(),
+            http_client=self.http_client,
+            max_retries=0,
+        )
+        self.governor = RateGovernor(
+            requests_per_minute=config.requests_per_minute,
+            tokens_per_minute=config.tokens_per_minute,
+            max_concurrency=config.max_concurrency,
+            min_concurrency=config.min_concurrency,
+            latency_target=config.latency_target,
+            max_retries=config.max_retries,
+            backoff_base=config.retry_backoff_base,
+            backoff_max=config.retry_backoff_max,
+        )
+        # 响应缓存（可选）
+        self.cache: Optional[ResponseCache] = None
+        if config.cache_enabled:
+            self.cache = ResponseCache(
+                max_entries=config.cache_max_entries,
+                ttl=config.cache_ttl,
+                path=config.cache_path,
+                max_disk_entries=config.cache_max_disk_entries,
+            )
+        # 对冲请求（可选），降低长尾延迟
+        self.hedger: Optional[Hedger] = None
+        if config.hedge_enabled:
+            self.hedger = Hedger(
+                percentile=config.hedge_percentile,
+                max_ratio=config.hedge_max_ratio,
+                min_samples=config.hedge_min_samples,
+                window=config.hedge_window,
+            )
+        # 实际发送的请求消耗的token（缓存命中不计入）
+        self.usage: Dict[str, int] = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+        }
+        # 合并进行中的相同请求
+        self.singleflight: Optional[SingleFlight] = (
+            SingleFlight() if config.singleflight_enabled else None
+        )
+
+    async def __aenter__(self) -> "DeepSeekLLM":
+        if self.config.http_prewarm_connections:
+            await self.prewarm()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def prewarm(self, connections: Optional[int] = None):
+        """预先建立到API的连接，避免首个请求承担握手延迟"""
+        await prewarm_http_client(
+            self.http_client,
+            self.config.api_base,
+            connections or self.config.http_prewarm_connections or 1,
+        )
+
+    async def aclose(self):
+        """释放连接池引用并关闭缓存"""
+        if self.http_client is not None:
+            await release_http_client(self.http_client)
+            self.http_client = None
+        if self.cache is not None:
+            self.cache.close()
+
+    def _cacheable(self, params: Dict[str, Any]) -> bool:
+        if self.cache is None:
+            return False
+        return self.config.cache_nondeterministic or not params.get("temperature")
+
+    async def _create_completion(
+        self, params: Dict[str, Any]
+    ) -> Tuple[ChatCompletion, bool]:
+        """发送补全请求；启用缓存时优先返回缓存的响应，并合并并发的相同请求
+
+        返回 (响应, 是否由本次调用实际发送)，缓存命中或合并的请求不消耗token。
+        """
+        role, model = current_role(), params["model"]
+        start = time.monotonic()
+        outcome = "error"
+        try:
+            with span(
+                "llm.call",
+                "llm",
+                model=model,
+                tool=self._tool_name(params),
+                cache_hit=False,
+            ) as call:
+                response, sent = await self._complete(params, call)
+                _annotate(call, response)
+            outcome = "success"
+            return response, sent
+        except DeadlineExceeded:
+            outcome = "timeout"
+            raise
+        finally:
+            LLM_REQUESTS.inc(role=role, model=model, outcome=outcome)
+            LLM_LATENCY.observe(time.monotonic() - start, role=role, model=model)
+
+    async def _complete(
+        self, params: Dict[str, Any], call
+    ) -> Tuple[ChatCompletion, bool]:
+        cacheable = self._cacheable(params)
+        if not cacheable and self.singleflight is None:
+            return await self._send(params), True
+
+        key = self._request_key(params)
+        if cacheable:
+            cached = self.cache.get(key)
+            if cached is not None:
+                LLM_CACHE.inc(result="hit")
+                call.set("cache_hit", True)
+                return ChatCompletion.model_validate(cached), False
+            LLM_CACHE.inc(result="miss")
+
+        # 只有实际发送请求的调用方执行 fetch，合并的调用方共享其结果
+        sent = False
+
+        async def fetch() -> ChatCompletion:
+            nonlocal sent
+            sent = True
+            response = await self._send(params)
+            if cacheable:
+                self.cache.set(key, response.model_dump(mode="json"))
+            return response
+
+        if self.singleflight is None:
+            return await fetch(), True
+        response = await self.singleflight.do(key, fetch)
+        return response, sent
+
+    def _request_key(self, params: Dict[str, Any]) -> str:
+        return make_cache_key(
+            model=params["model"],
+            messages=params["messages"],
+            tools=params.get("tools"),
+            tool_choice=params.get("tool_choice"),
+            temperature=params.get("temperature"),
+            max_tokens=params.get("max_tokens"),
+        )
+
+    async def _send(self, params: Dict[str, Any]) -> ChatCompletion:
+        estimated = estimate_message_tokens(params["messages"]) + params.get(
+            "max_tokens", 0
+        )
+
+        def send() -> Awaitable[ChatCompletion]:
+            return self.governor.run(
+                lambda: self._create(params),
+                estimated_tokens=estimated,
+                usage_tokens=lambda r: r.usage.total_tokens if r.usage else None,
+            )
+
+        with span("llm.request", "llm", estimated_tokens=estimated) as request:
+            if self.hedger is None:
+                response = await with_deadline(send())
+            else:
+                response = await with_deadline(
+                    self.hedger.run(self._latency_key(params), send)
+                )
+            _annotate(request, response)
+        self._record_usage(response)
+        return response
+
+    def _record_usage(self, response: ChatCompletion):
+        self.usage["requests"] += 1
+        if response.usage is not None:
+            self.usage["prompt_tokens"] += response.usage.prompt_tokens
+            self.usage["completion_tokens"] += response.usage.completion_tokens
+            self.usage["total_tokens"] += response.usage.total_tokens
+            role, model = current_role(), response.model or self.model
+            LLM_TOKENS.inc(
+                response.usage.prompt_tokens, role=role, model=model, direction="in"
+            )
+            LLM_TOKENS.inc(
+                response.usage.completion_tokens,
+                role=role,
+                model=model,
+                direction="out",
+            )
+
+    def _latency_key(self, params: Dict[str, Any]) -> str:
+        # 延迟按模型和工具分别统计
+        return f"{params['model']}:{self._tool_name(params)}"
+
+    @staticmethod
+    def _tool_name(params: Dict[str, Any]) -> str:
+        tool_choice = params.get("tool_choice")
+        if isinstance(tool_choice, dict):
+            return tool_choice.get("function", {}).get("name", "tools")
+        return "tools" if params.get("tools") else "generate"
+
+    def _create(self, params: Dict[str, Any], **kwargs) -> Awaitable[Any]:
+        # 每次尝试（包括重试）按剩余时间设置HTTP超时
+        timeout = remaining_time(self.config.request_timeout)
+        if timeout is not None:
+            if timeout <= 0:
+                raise DeadlineExceeded("Deadline exceeded before sending request")
+            kwargs["timeout"] = timeout
+        return self.client.chat.completions.create(**params, **kwargs)
+
+    async def _create_complete(
+        self,
+        params: Dict[str, Any],
+        reserve: Optional[Callable[[int], bool]] = None,
+    ) -> Tuple[ChatCompletion, Optional[Dict[str, int]]]:
+        """发送补全请求；输出被截断时用 max_output_tokens 重试一次，
+        仍被截断则抛出 OutputTruncated
+
+        重试前调用 reserve(追加的token数) 在预算中追加预留，返回 False 时不重试。
+        返回 (响应, 实际消耗的token用量)，缓存命中或合并的请求不计入用量。
+        """
+        response, sent = await self._create_completion(params)
+        spent = _usage(response) if sent else None
+        if not _truncated(response):
+            return response, spent
+        limit = self.config.max_output_tokens
+        extra = limit - params.get("max_tokens", 0)
+        if extra > 0 and (reserve is None or reserve(extra)):
+            response, sent = await self._create_completion(
+                {**params, "max_tokens": limit}
+            )
+            if sent:
+                spent = _add_usage(spent, _usage(response))
+            if not _truncated(response):
+                return response, spent
+        elif extra > 0:
+            raise OutputTruncated(
+                f"Output truncated at max_tokens={params.get('max_tokens', 0)}, "
+                f"token budget cannot cover a retry with {extra} more tokens",
+                spent,
+            )
+        limit = max(params.get("max_tokens", 0), limit)
+        raise OutputTruncated(f"Output truncated at max_tokens={limit}", spent)
+
+    def max_tokens_for(
+        self,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """按预期输出选择 max_tokens：有工具时按（选定）工具的参数schema估算，
+        只会在配置的 max_tokens 基础上调高，否则使用配置的 max_tokens"""
+        config = self.config
+        if not tools or not config.dynamic_max_tokens:
+            return config.max_tokens
+        chosen = (tool_choice or {}).get("function", {}).get("name")
+        schemas = [
+            tool["function"].get("parameters", {})
+            for tool in tools
+            if "function" in tool
+            and (chosen is None or tool["function"].get("name") == chosen)
+        ]
+        if not schemas:
+            return config.max_tokens
+        estimate = max(estimate_schema_tokens(schema) for schema in schemas)
+        return min(
+            max(int(estimate * config.output_token_margin), config.max_tokens),
+            max(config.max_output_tokens, config.max_tokens),
         )
 
     async def generate(
@@ -23,8 +453,14 @@ class DeepSeekLLM:
         system_prompt: str,
         messages: List[Dict[str, str]],
         temperature: float = None,
+        max_tokens: Optional[int] = None,
+        reserve: Optional[Callable[[int], bool]] = None,
     ) -> str:
-        """使用DeepSeek API生成响应，遵循OpenAI规范"""
+        """使用DeepSeek API生成响应，遵循OpenAI规范
+
+        返回 GeneratedText，其 usage 属性为本次调用实际消耗的token用量；
+        reserve 用于截断重试前追加预算（见 _create_complete）。
+        """
         try:
             # 构建消息列表
             all_messages = [
@@ -36,11 +472,14 @@ class DeepSeekLLM:
             ] + messages
 
             # 调用API
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=all_messages,
-                temperature=temperature or self.config.temperature,
-                max_tokens=self.config.max_tokens,
+            response, usage = await self._create_complete(
+                {
+                    "model": self.model,
+                    "messages": all_messages,
+                    "temperature": temperature or self.config.temperature,
+                    "max_tokens": max_tokens or self.max_tokens_for(),
+                },
+                reserve,
             )
 
             # 获取响应内容
@@ -56,11 +495,17 @@ class DeepSeekLLM:
                     content = content[4:].strip()
 
             # 返回处理后的内容
-            return content
+            text = GeneratedText(content)
+            text.usage = usage
+            return text
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"DeepSeek API error: {e}")
-            return f"Error generating response: {str(e)}"
+            text = GeneratedText(f"Error generating response: {str(e)}")
+            text.usage = getattr(e, "usage", None)
+            return text
 
     async def tool_calling(
         self,
@@ -69,8 +514,14 @@ class DeepSeekLLM:
         tools: List[Dict[str, Any]],
         tool_choice: Optional[Dict[str, str]] = None,
         temperature: float = None,
+        max_tokens: Optional[int] = None,
+        reserve: Optional[Callable[[int], bool]] = None,
     ) -> Dict[str, Any]:
-        """使用DeepSeek API进行工具调用，支持从工具调用或内容中提取JSON响应"""
+        """使用DeepSeek API进行工具调用，支持从工具调用或内容中提取JSON响应
+
+        结果的 usage 字段为本次调用实际消耗的token用量（缓存命中或合并的请求为 None）；
+        max_tokens 默认按工具参数schema估算；reserve 同 generate。
+        """
         try:
             # 构建消息列表
             all_messages = [{"role": "system", "content": system_prompt}] + messages
@@ -80,7 +531,7 @@ class DeepSeekLLM:
                 "model": self.model,
                 "messages": all_messages,
                 "temperature": temperature or self.config.temperature,
-                "max_tokens": self.config.max_tokens,
+                "max_tokens": max_tokens or self.max_tokens_for(tools, tool_choice),
                 "tools": tools,
             }
 
@@ -90,20 +541,278 @@ class DeepSeekLLM:
 
             # 调用API
             print("Calling LLM with tool calling...")
-            response = await self.client.chat.completions.create(**params)
+            response, usage = await self._create_complete(params, reserve)
 
-            return await self._process_tool_calling_response(response, tools)
+            result = await self._process_tool_calling_response(response, tools)
+            result["usage"] = usage
+            return result
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             error_msg = f"DeepSeek function calling error: {e}"
             print(error_msg)
-            return {"error": error_msg}
+            return {"error": error_msg, "usage": getattr(e, "usage", None)}
+
+    async def generate_many(
+        self,
+        system_prompt: str,
+        messages_list: Iterable[List[Dict[str, str]]],
+        temperature: float = None,
+        concurrency: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> List[str]:
+        """批量生成：每组消息独立调用 generate，按输入顺序返回"""
+        results = await gather_bounded(
+            lambda messages: self.generate(system_prompt, messages, temperature),
+            messages_list,
+            concurrency=concurrency or self.config.batch_concurrency,
+            on_progress=on_progress,
+        )
+        return [
+            f"Error generating response: {str(r)}" if isinstance(r, Exception) else r
+            for r in results
+        ]
+
+    async def tool_calling_many(
+        self,
+        system_prompt: str,
+        messages_list: Iterable[List[Dict[str, str]]],
+        tools: List[Dict[str, Any]],
+        tool_choice: Optional[Dict[str, str]] = None,
+        temperature: float = None,
+        concurrency: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """批量工具调用：每组消息独立调用 tool_calling，按输入顺序返回"""
+        results = await gather_bounded(
+            lambda messages: self.tool_calling(
+                system_prompt, messages, tools, tool_choice, temperature
+            ),
+            messages_list,
+            concurrency=concurrency or self.config.batch_concurrency,
+            on_progress=on_progress,
+        )
+        return [
+            {"error": f"DeepSeek function calling error: {r}"}
+            if isinstance(r, Exception)
+            else r
+            for r in results
+        ]
+
+    async def tool_calling_stream(
+        self,
+        system_prompt: str,
+        messages: List[Dict[str, str]],
+        tools: List[Dict[str, Any]],
+        tool_choice: Optional[Dict[str, str]] = None,
+        temperature: float = None,
+        max_tokens: Optional[int] = None,
+        role: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """流式工具调用：边接收参数边解析
+
+        依次产出 IncrementalJSONParser 的 item/field 事件，最后产出
+        {"type": "final", "result": <与 tool_calling 相同结构的结果>}；
+        出错时产出 {"type": "error", "error": ...}；超过截止时间时产出
+        {"type": "timeout", "error": ...}。
+
+        请求在后台任务中执行，读取整个流的过程都受当前截止时间约束；
+        迭代方提前退出或被取消时，请求随之取消并关闭流。
+        role 用于指标标签，默认取当前上下文中的角色。
+        """
+        params = {
+            "model": self.model,
+            "messages": [{"role": "system", "content": system_prompt}] + messages,
+            "temperature": temperature or self.config.temperature,
+            "max_tokens": max_tokens or self.max_tokens_for(tools, tool_choice),
+            "tools": tools,
+        }
+        if tool_choice:
+            params["tool_choice"] = tool_choice
+
+        events: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(
+            self._stream_tool_calling(
+                params, tools, events.put_nowait, role or current_role()
+            )
+        )
+        try:
+            while True:
+                event = await events.get()
+                yield event
+                if event["type"] in ("final", "error", "timeout"):
+                    return
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    async def _stream_tool_calling(
+        self,
+        params: Dict[str, Any],
+        tools: List[Dict[str, Any]],
+        emit: Callable[[Dict[str, Any]], None],
+        role: str,
+    ):
+        """执行流式请求，最后总是发出 final / error / timeout 事件之一"""
+        model = params["model"]
+        start = time.monotonic()
+        outcome = "error"
+        with role_scope(role):
+            try:
+                with span(
+                    "llm.call",
+                    "llm",
+                    model=model,
+                    tool=self._tool_name(params),
+                    cache_hit=False,
+                    stream=True,
+                ) as call:
+                    response, sent = await with_deadline(
+                        self._read_tool_stream(params, emit, call)
+                    )
+                    _annotate(call, response)
+                outcome = "success"
+                result = await self._process_tool_calling_response(response, tools)
+                if not sent:
+                    result["usage"] = None
+                emit({"type": "final", "result": result})
+            except DeadlineExceeded as e:
+                outcome = "timeout"
+                emit({"type": "timeout", "error": str(e)})
+            except Exception as e:
+                error_msg = f"DeepSeek streaming function calling error: {e}"
+                print(error_msg)
+                emit({"type": "error", "error": error_msg})
+            finally:
+                LLM_REQUESTS.inc(role=role, model=model, outcome=outcome)
+                LLM_LATENCY.observe(time.monotonic() - start, role=role, model=model)
+
+    async def _read_tool_stream(
+        self,
+        params: Dict[str, Any],
+        emit: Callable[[Dict[str, Any]], None],
+        call,
+    ) -> Tuple[ChatCompletion, bool]:
+        """读取流式响应，边读边发出增量解析事件，返回 (拼接后的完整响应, 是否实际发送)"""
+        parser: Optional[IncrementalJSONParser] = IncrementalJSONParser()
+
+        def feed(text: str) -> List[Dict[str, Any]]:
+            nonlocal parser
+            if parser is None or not text:
+                return []
+            try:
+                return parser.feed(text)
+            except json.JSONDecodeError:
+                # 参数不是合法JSON，放弃增量解析，交给最终结果处理
+                parser = None
+                return []
+
+        cacheable = self._cacheable(params)
+        key = self._request_key(params) if cacheable else None
+        cached = self.cache.get(key) if cacheable else None
+        if cacheable:
+            LLM_CACHE.inc(result="hit" if cached is not None else "miss")
+        if cached is not None:
+            call.set("cache_hit", True)
+            response = ChatCompletion.model_validate(cached)
+            message = response.choices[0].message
+            if message.tool_calls:
+                for event in feed(message.tool_calls[0].function.arguments):
+                    emit(event)
+            return response, False
+
+        print("Calling LLM with streaming tool calling...")
+        estimated = estimate_message_tokens(params["messages"]) + params["max_tokens"]
+        with span("llm.request", "llm", estimated_tokens=estimated, stream=True):
+            # 流读完或关闭之前一直占用并发槽位
+            async with self.governor.hold(
+                lambda: self._create(
+                    params,
+                    stream=True,
+                    # 最后一个数据块返回token用量
+                    stream_options={"include_usage": True},
+                ),
+                estimated_tokens=estimated,
+            ) as stream:
+                try:
+                    completion: Dict[str, Any] = {}
+                    content = ""
+                    tool_calls: Dict[int, Dict[str, Any]] = {}
+                    finish_reason = None
+                    async for chunk in stream:
+                        if not completion:
+                            completion = {
+                                "id": chunk.id,
+                                "created": chunk.created,
+                                "model": chunk.model,
+                            }
+                        if chunk.usage is not None:
+                            completion["usage"] = chunk.usage.model_dump()
+                        if not chunk.choices:
+                            continue
+                        choice = chunk.choices[0]
+                        finish_reason = choice.finish_reason or finish_reason
+                        delta = choice.delta
+                        if delta.content:
+                            content += delta.content
+                        for tool_delta in delta.tool_calls or []:
+                            entry = tool_calls.setdefault(
+                                tool_delta.index,
+                                {
+                                    "id": tool_delta.id or "",
+                                    "type": "function",
+                                    "function": {"name": "", "arguments": ""},
+                                },
+                            )
+                            if tool_delta.id:
+                                entry["id"] = tool_delta.id
+                            function = tool_delta.function
+                            if function and function.name:
+                                entry["function"]["name"] += function.name
+                            if function and function.arguments:
+                                entry["function"]["arguments"] += function.arguments
+                                # 只增量解析第一个工具调用
+                                if tool_delta.index == min(tool_calls):
+                                    for event in feed(function.arguments):
+                                        emit(event)
+                finally:
+                    await stream.close()
+
+        response = ChatCompletion.model_validate(
+            {
+                **completion,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": finish_reason or "stop",
+                        "message": {
+                            "role": "assistant",
+                            "content": content or None,
+                            "tool_calls": [
+                                tool_calls[i] for i in sorted(tool_calls)
+                            ]
+                            or None,
+                        },
+                    }
+                ],
+            }
+        )
+        self._record_usage(response)
+        if cacheable:
+            self.cache.set(key, response.model_dump(mode="json"))
+        return response, True
 
     async def _process_tool_calling_response(
         self, response: ChatCompletion, tools: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """处理工具调用响应，从工具调用或内容中提取JSON"""
-        result = {"raw_response": response}
+        result = {"raw_response": response, "usage": _usage(response)}
+        if _truncated(response):
+            # 截断的参数可能恰好是合法JSON，但内容不完整，不能当作结果
+            result["error"] = "Output truncated at max_tokens (finish_reason=length)"
+            return result
 
         # 获取响应消息
         message = response.choices[0].message
@@ -1,43 +1,396 @@
-from typing import Dict, Any, List, Callable
+from typing import Dict, Any, List, Callable, Optional, Iterator
 import asyncio
+import bisect
+import contextvars
+import time
+import weakref
 from collections import defaultdict
+from collections.abc import Mapping
+from .bus_log import BusLog
+from .topic_trie import TopicTrie, is_pattern
+from .tracing import span
+from .metrics import REGISTRY, BUS_DROPPED, BUS_PUBLISHED
 
+DELIVERY_MODES = ("sync", "queued")
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class Envelope(Mapping):
+    """消息信封：使用 __slots__ 的只读映射，兼容原来的字典访问方式"""
+
+    __slots__ = ("topic", "content", "sender", "timestamp")
+    _fields = __slots__
+
+    def __init__(
+        self, topic: str, content: Any, sender: Optional[str], timestamp: float
+    ):
+        self.topic = topic
+        self.content = content
+        self.sender = sender
+        self.timestamp = timestamp
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self._fields}
+
+
+class _Ring:
+    """列表 + 头指针的队列：popleft 均摊 O(1)，按下标访问和切片都是 O(1)/O(k)
+
+    出队只移动头指针，已出队部分超过一半时才整体前移。
+    """
+
+    __slots__ = ("items", "head")
 
-class MessageBus:
     def __init__(self):
+        self.items: List[Envelope] = []
+        self.head = 0
+
+    def append(self, envelope: Envelope):
+        self.items.append(envelope)
+
+    def popleft(self) -> Envelope:
+        envelope = self.items[self.head]
+        self.items[self.head] = None
+        self.head += 1
+        if self.head * 2 >= len(self.items):
+            del self.items[: self.head]
+            self.head = 0
+        return envelope
+
+    def between(self, start: Optional[float], end: Optional[float]) -> List[Envelope]:
+        """时间范围 [start, end) 内的消息"""
+        key = lambda envelope: envelope.timestamp
+        lo = (
+            self.head
+            if start is None
+            else bisect.bisect_left(self.items, start, lo=self.head, key=key)
+        )
+        hi = (
+            len(self.items)
+            if end is None
+            else bisect.bisect_left(self.items, end, lo=lo, key=key)
+        )
+        return self.items[lo:hi]
+
+    def clear(self):
+        self.items.clear()
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.items) - self.head
+
+
+class MessageHistory:
+    """有界消息历史：全局环形缓冲 + 按主题索引
+
+    超出容量时淘汰最旧的消息，同时从其主题索引中移除（O(1)）。
+    按时间范围查询使用二分查找（timestamp 为事件循环的单调时钟），
+    返回 k 条消息的开销为 O(log n + k)。
+    """
+
+    def __init__(self, capacity: Optional[int] = 10000):
+        self.capacity = capacity
+        self._messages = _Ring()
+        self._by_topic: Dict[str, _Ring] = {}
+        self.evicted = 0
+
+    def append(self, envelope: Envelope):
+        if self.capacity is not None and len(self._messages) >= self.capacity:
+            oldest = self._messages.popleft()
+            topic_messages = self._by_topic[oldest.topic]
+            topic_messages.popleft()
+            if not topic_messages:
+                del self._by_topic[oldest.topic]
+            self.evicted += 1
+        self._messages.append(envelope)
+        self._by_topic.setdefault(envelope.topic, _Ring()).append(envelope)
+
+    def query(
+        self,
+        topic: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> List[Envelope]:
+        """按主题和时间范围 [start, end) 查询"""
+        messages = self._messages if topic is None else self._by_topic.get(topic)
+        if messages is None:
+            return []
+        return messages.between(start, end)
+
+    def topics(self) -> List[str]:
+        return list(self._by_topic)
+
+    def clear(self):
+        self._messages.clear()
+        self._by_topic.clear()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+class _Subscription:
+    """queued 模式下的订阅：独立的有界队列和消费任务"""
+
+    def __init__(self, topic: str, callback: Callable, queue_size: int):
+        self.topic = topic
+        self.callback = callback
+        self.queue_size = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.consumer: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_delay = 0.0
+
+    def ensure_consumer(self):
+        if self.consumer is None or self.consumer.done():
+            if self.queue is None:
+                self.queue = asyncio.Queue(maxsize=self.queue_size)
+            self.consumer = asyncio.create_task(self._consume())
+
+    async def _consume(self):
+        while True:
+            enqueued_at, context, message = await self.queue.get()
+            try:
+                # 在发布者的上下文中执行回调，保留会话等上下文变量
+                await asyncio.create_task(
+                    self._deliver(message, time.monotonic() - enqueued_at),
+                    context=context,
+                )
+                self.delivered += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Subscriber error on topic '{self.topic}': {e}")
+            finally:
+                self.last_delay = time.monotonic() - enqueued_at
+                self.queue.task_done()
+
+    async def _deliver(self, message: "Envelope", queue_delay: float):
+        with span("bus.deliver", "bus", topic=message.topic, queue_delay=queue_delay):
+            await self.callback(message)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "topic": self.topic,
+            "subscriber": getattr(self.callback, "__qualname__", repr(self.callback)),
+            "lag": self.queue.qsize() if self.queue is not None else 0,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_delivery_delay": self.last_delay,
+        }
+
+
+# 存活的消息总线，用于导出各主题的队列积压
+_buses: "weakref.WeakSet[MessageBus]" = weakref.WeakSet()
+
+
+def _queue_depths() -> Dict[tuple, float]:
+    depths: Dict[tuple, float] = defaultdict(float)
+    for bus in list(_buses):
+        for topic, subscriptions in bus._subscriptions.items():
+            for subscription in subscriptions:
+                if subscription.queue is not None:
+                    depths[(topic,)] += subscription.queue.qsize()
+    return depths
+
+
+BUS_QUEUE_DEPTH = REGISTRY.gauge(
+    "agent_bus_queue_depth",
+    "Messages waiting in queued subscriber queues",
+    ["topic"],
+    collect=_queue_depths,
+)
+
+
+class MessageBus:
+    """消息总线
+
+    delivery="sync"（默认）：publish 等待所有订阅者处理完成。
+    delivery="queued"：每个订阅者有独立的有界队列和消费任务，publish 入队后立即返回；
+    队列满时按 overflow 策略处理（block 等待 / drop_oldest 丢弃最旧 / drop_newest 丢弃新消息）。
+    """
+
+    def __init__(
+        self,
+        delivery: str = "sync",
+        queue_size: int = 100,
+        overflow: str = "block",
+        history_capacity: Optional[int] = 10000,
+        log: Optional[BusLog] = None,
+    ):
+        if delivery not in DELIVERY_MODES:
+            raise ValueError(f"Unknown delivery mode: {delivery}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.delivery = delivery
+        self.queue_size = queue_size
+        self.overflow = overflow
         self.subscribers: Dict[str, List[Callable]] = defaultdict(list)
-        self.message_history: List[Dict[str, Any]] = []
+        self._subscriptions: Dict[str, List[_Subscription]] = defaultdict(list)
+        # 通配订阅（如 "*_result"、"agent.#"）的匹配树
+        self._patterns = TopicTrie()
+        self.history = MessageHistory(history_capacity)
+        # 可选的持久化后端，进程重启后可重放消息
+        self.log = log
+        _buses.add(self)
 
     def subscribe(self, topic: str, callback: Callable):
+        """订阅主题；主题可以是带 * / # 通配符的模式"""
         self.subscribers[topic].append(callback)
+        if is_pattern(topic):
+            self._patterns.add(topic)
+        if self.delivery == "queued":
+            self._subscriptions[topic].append(
+                _Subscription(topic, callback, self.queue_size)
+            )
 
     def unsubscribe(self, topic: str, callback: Callable):
         if topic in self.subscribers:
             self.subscribers[topic].remove(callback)
+            if not self.subscribers[topic] and is_pattern(topic):
+                self._patterns.remove(topic)
+        for subscription in list(self._subscriptions.get(topic, [])):
+            if subscription.callback == callback:
+                self._stop(subscription)
+                self._subscriptions[topic].remove(subscription)
+                break
 
     def unsubscribe_all(self, topic: str):
         if topic in self.subscribers:
             self.subscribers[topic] = []
+        if is_pattern(topic):
+            self._patterns.remove(topic)
+        for subscription in self._subscriptions.pop(topic, []):
+            self._stop(subscription)
+
+    def _stop(self, subscription: _Subscription):
+        if subscription.consumer is not None:
+            subscription.consumer.cancel()
 
     async def publish(self, topic: str, message: Dict[str, Any], sender: str = None):
         """发布消息到特定主题"""
-        message_with_metadata = {
-            "topic": topic,
-            "content": message,
-            "sender": sender,
-            "timestamp": asyncio.get_event_loop().time(),
-        }
-        self.message_history.append(message_with_metadata)
+        message_with_metadata = Envelope(
+            topic, message, sender, asyncio.get_running_loop().time()
+        )
+        BUS_PUBLISHED.inc(topic=topic)
+        with span("bus.publish", "bus", topic=topic, sender=sender):
+            await self._route(message_with_metadata)
+
+    async def _route(self, envelope: Envelope):
+        """发布路径上的投递；跨进程的消息总线在此转发"""
+        await self._dispatch(envelope)
+
+    async def _dispatch(self, envelope: Envelope):
+        """记录历史并投递给本地订阅者"""
+        self.history.append(envelope)
+        if self.log is not None:
+            self.log.append(envelope)
+
+        if self.delivery == "queued":
+            await self._enqueue(envelope.topic, envelope)
+            return
 
         tasks = []
-        for callback in self.subscribers[topic]:
-            tasks.append(asyncio.create_task(callback(message_with_metadata)))
+        for callback in self._callbacks(envelope.topic):
+            tasks.append(asyncio.create_task(callback(envelope)))
 
         if tasks:
             await asyncio.gather(*tasks)
 
-    def get_message_history(self, topic: str = None) -> List[Dict[str, Any]]:
-        """获取消息历史"""
-        if topic:
-            return [msg for msg in self.message_history if msg["topic"] == topic]
-        return self.message_history
+    def _callbacks(self, topic: str) -> List[Callable]:
+        callbacks = list(self.subscribers.get(topic, ()))
+        for pattern in self._patterns.match(topic):
+            if pattern != topic:
+                callbacks.extend(self.subscribers[pattern])
+        return callbacks
+
+    def _matching_subscriptions(self, topic: str) -> List[_Subscription]:
+        subscriptions = list(self._subscriptions.get(topic, ()))
+        for pattern in self._patterns.match(topic):
+            if pattern != topic:
+                subscriptions.extend(self._subscriptions.get(pattern, ()))
+        return subscriptions
+
+    async def _enqueue(self, topic: str, message: Envelope):
+        context = contextvars.copy_context()
+        for subscription in self._matching_subscriptions(topic):
+            subscription.ensure_consumer()
+            item = (time.monotonic(), context, message)
+            queue = subscription.queue
+            if not queue.full():
+                queue.put_nowait(item)
+            elif self.overflow == "block":
+                # 背压：等待慢订阅者腾出空间
+                await queue.put(item)
+            elif self.overflow == "drop_oldest":
+                queue.get_nowait()
+                queue.task_done()
+                queue.put_nowait(item)
+                subscription.dropped += 1
+                BUS_DROPPED.inc(topic=subscription.topic)
+            else:
+                subscription.dropped += 1
+                BUS_DROPPED.inc(topic=subscription.topic)
+
+    async def drain(self):
+        """等待所有订阅者队列中的消息处理完成"""
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in subscriptions:
+                if subscription.queue is not None:
+                    await subscription.queue.join()
+
+    async def aclose(self):
+        """停止所有消费任务（未处理的消息会被丢弃）"""
+        consumers = []
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                if subscription.consumer is not None:
+                    subscription.consumer.cancel()
+                    consumers.append(subscription.consumer)
+                subscription.consumer = None
+                subscription.queue = None
+        await asyncio.gather(*consumers, return_exceptions=True)
+        if self.log is not None:
+            self.log.flush()
+
+    def replay(self, topic: str = None, offset: int = 0) -> Iterator[Dict[str, Any]]:
+        """从持久化日志中按偏移量重放消息"""
+        if self.log is None:
+            raise RuntimeError("MessageBus has no persistent log configured")
+        return self.log.replay(topic, offset)
+
+    def get_subscriber_stats(self) -> List[Dict[str, Any]]:
+        """各订阅者的积压、投递、丢弃和错误统计（仅 queued 模式）"""
+        return [
+            subscription.stats()
+            for subscriptions in self._subscriptions.values()
+            for subscription in subscriptions
+        ]
+
+    @property
+    def message_history(self) -> List[Envelope]:
+        return self.history.query()
+
+    def get_message_history(
+        self,
+        topic: str = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> List[Envelope]:
+        """获取消息历史，可按主题和时间范围 [start, end) 过滤"""
+        return self.history.query(topic, start, end)
@@ -0,0 +1,314 @@
+import asyncio
+import math
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, "
+                f"got {sorted(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, Tuple[str, ...], float]]:
+        """(后缀, 标签值, 额外标签名, 值)"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra_names, value in self.samples():
+            labels = _format_labels(self.labelnames + extra_names, values)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """只增不减的计数器；导出名称带 _total 后缀（HELP/TYPE 与样本同名）"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        if not name.endswith("_total"):
+            name += "_total"
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield "", key, (), value
+
+
+class Gauge(_Metric):
+    """可增可减的当前值；指定 collect 时在导出时调用它获取 {标签值: 值}"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        collect: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        if self.collect is not None:
+            return self.collect().get(self._key(labels), 0.0)
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        values = self.collect() if self.collect is not None else self._values
+        for key, value in values.items():
+            yield "", key, (), value
+
+
+class Histogram(_Metric):
+    """按桶统计的分布（导出时为累计计数）"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 标签值 -> [各桶计数..., 总和]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [0] * len(self.buckets) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        state[-1] += value
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[:-1]) if state else 0
+
+    def samples(self):
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield "_bucket", key + (_format_value(bound),), ("le",), cumulative
+            yield "_sum", key, (), state[-1]
+            yield "_count", key, (), cumulative
+
+
+class MetricsRegistry:
+    """指标注册表，按名称获取或创建指标，render() 输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        collect: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames, collect)
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 进程级默认注册表
+REGISTRY = MetricsRegistry()
+
+# 当前调用LLM的Agent角色（LLM客户端由多个Agent共享，通过上下文区分）
+_current_role: ContextVar[str] = ContextVar("agent_role", default="unknown")
+
+
+def current_role() -> str:
+    return _current_role.get()
+
+
+@contextmanager
+def role_scope(role: str) -> Iterator[None]:
+    token = _current_role.set(role)
+    try:
+        yield
+    finally:
+        _current_role.reset(token)
+
+
+LLM_REQUESTS = REGISTRY.counter(
+    "agent_llm_requests",
+    "LLM calls by agent role and outcome",
+    ["role", "model", "outcome"],
+)
+LLM_LATENCY = REGISTRY.histogram(
+    "agent_llm_request_duration_seconds",
+    "LLM call latency including cache lookups and retries",
+    ["role", "model"],
+)
+LLM_TOKENS = REGISTRY.counter(
+    "agent_llm_tokens", "Tokens sent and received", ["role", "model", "direction"]
+)
+LLM_CACHE = REGISTRY.counter(
+    "agent_llm_cache", "Response cache lookups by result (hit/miss)", ["result"]
+)
+LLM_RETRIES = REGISTRY.counter(
+    "agent_llm_retries", "LLM request retries by HTTP status", ["status"]
+)
+AGENT_RESULTS = REGISTRY.counter(
+    "agent_results",
+    "Agent LLM step results by response source and status",
+    ["role", "source", "status"],
+)
+AGENT_LATENCY = REGISTRY.histogram(
+    "agent_process_duration_seconds", "Agent process_req latency", ["role"]
+)
+BUS_PUBLISHED = REGISTRY.counter(
+    "agent_bus_published", "Messages published to the message bus", ["topic"]
+)
+BUS_DROPPED = REGISTRY.counter(
+    "agent_bus_dropped", "Messages dropped by queued subscribers", ["topic"]
+)
+ACTIVE_RUNS = REGISTRY.gauge("agent_active_runs", "Workflow runs in progress")
+
+
+class MetricsServer:
+    """本地HTTP端点，GET /metrics 返回文本格式的指标
+
+        server = MetricsServer(port=9100)
+        await server.start()
+    """
+
+    def __init__(
+        self,
+        registry: Optional[MetricsRegistry] = None,
+        host: str = "127.0.0.1",
+        port: int = 9100,
+    ):
+        self.registry = registry or REGISTRY
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def aclose(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split(" ")
+            if len(parts) >= 2 and parts[1].split("?")[0] in ("/metrics", "/"):
+                status = "200 OK"
+                body = self.registry.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                (
+                    f"HTTP/1.1 {status}\r\n"
+                    "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
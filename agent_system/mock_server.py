@@ -0,0 +1,373 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import httpx
+from .tokens import estimate_message_tokens, estimate_tokens
+
+# 返回一次请求的模拟延迟（秒）
+LatencyModel = Callable[[random.Random], float]
+
+
+def parse_latency(spec: str) -> LatencyModel:
+    """解析延迟分布：
+
+    - "0.5"：固定 0.5 秒
+    - "uniform:0.2,1.0"：均匀分布
+    - "lognormal:1.5,0.6"：对数正态分布，中位数 1.5 秒，sigma 0.6（长尾）
+    """
+    kind, _, args = spec.partition(":")
+    if not args:
+        value = float(kind)
+        return lambda rng: value
+    params = [float(x) for x in args.split(",")]
+    if kind == "uniform":
+        low, high = params
+        return lambda rng: rng.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = params
+        return lambda rng: rng.lognormvariate(0, sigma) * median
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def example_from_schema(
+    schema: Dict[str, Any], root: Optional[Dict[str, Any]] = None
+) -> Any:
+    """按JSON Schema生成一个最小的合法示例，用作模拟的工具调用参数"""
+    root = root or schema
+    if "$ref" in schema:
+        target = root
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            target = target[part]
+        return example_from_schema(target, root)
+    if "enum" in schema:
+        return schema["enum"][0]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return example_from_schema(schema[key][0], root)
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = kind[0]
+    if kind == "object":
+        return {
+            name: example_from_schema(prop, root)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [example_from_schema(schema.get("items", {}), root)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return True
+    if kind == "null":
+        return None
+    return "mock"
+
+
+class MockLLMBackend:
+    """OpenAI兼容的模拟补全后端：按配置的延迟分布和错误率返回响应
+
+    指定 tool_choice 时返回符合工具参数schema的工具调用，否则返回JSON内容。
+    """
+
+    def __init__(
+        self,
+        latency: LatencyModel = lambda rng: 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: Optional[int] = None,
+        content: Optional[Dict[str, Any]] = None,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.content = content or {"reasoning": "mock response"}
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    async def handle(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, str], bytes]:
+        """处理一次补全请求，返回 (状态码, 响应头, 响应体)"""
+        self.requests += 1
+        await asyncio.sleep(self.latency(self.rng))
+
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            self.errors += 1
+            return self._error(500, "server_error", "Mock server error")
+        if roll < self.error_rate + self.rate_limit_rate:
+            self.errors += 1
+            status, headers, payload = self._error(429, "rate_limit", "Mock rate limit")
+            headers["retry-after"] = "0.1"
+            return status, headers, payload
+
+        if body.get("stream"):
+            return (
+                200,
+                {"content-type": "text/event-stream"},
+                self._stream(body, self._message(body)).encode("utf-8"),
+            )
+        completion = self.completion(body)
+        return (
+            200,
+            {"content-type": "application/json"},
+            json.dumps(completion, ensure_ascii=False).encode("utf-8"),
+        )
+
+    def _error(self, status: int, kind: str, message: str):
+        payload = json.dumps({"error": {"message": message, "type": kind}})
+        return status, {"content-type": "application/json"}, payload.encode("utf-8")
+
+    def _message(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        tool_choice = body.get("tool_choice")
+        if isinstance(tool_choice, dict):
+            name = tool_choice["function"]["name"]
+            tool = next(
+                (t for t in body.get("tools", []) if t["function"]["name"] == name),
+                None,
+            )
+            parameters = (tool or {}).get("function", {}).get("parameters", {})
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{uuid.uuid4().hex[:8]}",
+                        "type": "function",
+                        "function": {
+                            "name": name,
+                            "arguments": json.dumps(
+                                example_from_schema(parameters), ensure_ascii=False
+                            ),
+                        },
+                    }
+                ],
+            }
+        return {
+            "role": "assistant",
+            "content": json.dumps(self.content, ensure_ascii=False),
+        }
+
+    def _usage(self, body: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, int]:
+        prompt = estimate_message_tokens(body.get("messages", []))
+        output = message["content"] or message["tool_calls"][0]["function"]["arguments"]
+        completion = estimate_tokens(output)
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "total_tokens": prompt + completion,
+        }
+
+    def completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """直接生成补全响应（不模拟延迟和错误）"""
+        message = self._message(body)
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": finish_reason,
+                    "message": message,
+                }
+            ],
+            "usage": self._usage(body, message),
+        }
+
+    def _stream(self, body: Dict[str, Any], message: Dict[str, Any]) -> str:
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+        }
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+            payload = {**base, "choices": [choice]}
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        events = [chunk({"role": "assistant"})]
+        if message.get("tool_calls"):
+            call = message["tool_calls"][0]
+            name, arguments = call["function"]["name"], call["function"]["arguments"]
+            events.append(
+                chunk(
+                    {
+                        "tool_calls": [
+                            {
+                                "index": 0,
+                                "id": call["id"],
+                                "type": "function",
+                                "function": {"name": name, "arguments": ""},
+                            }
+                        ]
+                    }
+                )
+            )
+            for i in range(0, len(arguments), 16):
+                events.append(
+                    chunk(
+                        {
+                            "tool_calls": [
+                                {
+                                    "index": 0,
+                                    "function": {"arguments": arguments[i : i + 16]},
+                                }
+                            ]
+                        }
+                    )
+                )
+            events.append(chunk({}, "tool_calls"))
+        else:
+            content = message["content"]
+            for i in range(0, len(content), 16):
+                events.append(chunk({"content": content[i : i + 16]}))
+            events.append(chunk({}, "stop"))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            payload = {**base, "choices": [], "usage": self._usage(body, message)}
+            events.append(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n")
+        events.append("data: [DONE]\n\n")
+        return "".join(events)
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "errors": self.errors}
+
+
+class MockTransport(httpx.AsyncBaseTransport):
+    """进程内的模拟传输层：不经过网络直接由 MockLLMBackend 处理请求"""
+
+    def __init__(self, backend: Optional[MockLLMBackend] = None):
+        self.backend = backend or MockLLMBackend()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/chat/completions"):
+            return httpx.Response(200, json={}, request=request)
+        body = json.loads(await request.aread() or b"{}")
+        status, headers, content = await self.backend.handle(body)
+        return httpx.Response(status, headers=headers, content=content, request=request)
+
+
+class MockLLMServer:
+    """本地HTTP模拟服务器（HTTP/1.1，支持keep-alive），用法：
+
+        python -m agent_system.mock_server --port 8000 --latency lognormal:1.5,0.6
+        DEEPSEEK_API_BASE=http://127.0.0.1:8000/v1 python main.py
+    """
+
+    def __init__(
+        self,
+        backend: Optional[MockLLMBackend] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.backend = backend or MockLLMBackend()
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: set = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def aclose(self):
+        if self._server is not None:
+            self._server.close()
+            # 关闭客户端保持的 keep-alive 连接，否则 wait_closed 会一直等待
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        self._connections.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                payload = await reader.readexactly(length) if length else b""
+
+                if method == "POST" and path.rstrip("/").endswith("/chat/completions"):
+                    status, response_headers, body = await self.backend.handle(
+                        json.loads(payload or b"{}")
+                    )
+                else:
+                    status, response_headers, body = 200, {}, b"{}"
+                if method == "HEAD":
+                    body = b""
+
+                writer.write(self._response(status, response_headers, body))
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    def _response(self, status: int, headers: Dict[str, str], body: bytes) -> bytes:
+        reason = {200: "OK", 429: "Too Many Requests", 500: "Internal Server Error"}
+        lines: List[str] = [f"HTTP/1.1 {status} {reason.get(status, 'Error')}"]
+        for name, value in {**headers, "content-length": str(len(body))}.items():
+            lines.append(f"{name}: {value}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def _main():
+    parser = argparse.ArgumentParser(
+        description="Run a local OpenAI-compatible mock LLM server"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--latency",
+        default="0",
+        help="latency distribution, e.g. 0.5, uniform:0.2,1.0, lognormal:1.5,0.6",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    backend = MockLLMBackend(
+        latency=parse_latency(args.latency),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    server = MockLLMServer(backend, args.host, args.port)
+    await server.start()
+    print(f"Mock LLM server listening on {server.base_url}")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,97 @@
+import json
+import os
+from typing import Dict, Any, Optional
+from .cache import make_cache_key
+from .fileutil import atomic_write_json
+
+# 这些状态的结果不缓存，重跑时需要重新执行
+_UNCACHEABLE_STATUSES = ("error", "skipped", "timeout")
+
+
+class NodeResultStore:
+    """工作流节点结果的存储接口"""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+
+class MemoryNodeStore(NodeResultStore):
+    def __init__(self):
+        self._results: Dict[str, Any] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._results.get(key)
+
+    def set(self, key: str, value: Any):
+        self._results[key] = value
+
+
+class FileNodeStore(NodeResultStore):
+    """每个节点结果一个JSON文件，写入时先写临时文件再原子替换"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def set(self, key: str, value: Any):
+        atomic_write_json(self._path(key), value, fsync=False)
+
+
+class NodeCache:
+    """按输入哈希缓存工作流节点的输出
+
+    键由节点名、任务文本、上游结果、系统提示词、工具定义和模型共同决定，
+    只要其中任一项变化节点就会重新执行。
+    """
+
+    def __init__(self, store: Optional[NodeResultStore] = None):
+        self.store = store or MemoryNodeStore()
+        self.hits = 0
+        self.misses = 0
+
+    def key(
+        self,
+        node: str,
+        task: str,
+        upstream: Dict[str, Any],
+        system_prompt: str,
+        tools: Any,
+        model: str,
+    ) -> str:
+        return make_cache_key(
+            node=node,
+            task=task,
+            upstream=upstream,
+            system_prompt=system_prompt,
+            tools=tools,
+            model=model,
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.store.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        if isinstance(value, dict) and value.get("status") in _UNCACHEABLE_STATUSES:
+            return
+        self.store.set(key, value)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,158 @@
+import asyncio
+import time
+from typing import (
+    Dict,
+    Any,
+    List,
+    Optional,
+    Callable,
+    Awaitable,
+    Iterable,
+    AsyncIterable,
+    Union,
+)
+
+# 阶段处理函数：读取并更新单个任务的状态字典
+StageHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_DONE = object()
+
+
+class PipelineStage:
+    """流水线中的一个阶段：独立的worker池 + 有界输入队列"""
+
+    def __init__(self, name: str, handler: StageHandler, workers: int = 1):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue: Optional[asyncio.Queue] = None
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0
+        self.busy_time = 0.0
+        self.max_queue_depth = 0
+
+    async def put(self, item: Any):
+        await self.queue.put(item)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def stats(self, elapsed: float) -> Dict[str, Any]:
+        capacity = self.workers * elapsed
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "busy_workers": self.busy,
+            "processed": self.processed,
+            "errors": self.errors,
+            "utilization": self.busy_time / capacity if capacity > 0 else 0.0,
+        }
+
+
+class Pipeline:
+    """多任务流水线：各阶段通过有界队列连接，不同任务可同时处于不同阶段
+
+    例如 supervisor 在规划第 N+1 个任务时，第 N 个任务可以在开发阶段执行。
+    """
+
+    def __init__(self, stages: List[PipelineStage], queue_size: int = 16):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        self._started: Optional[float] = None
+
+    async def _feed(self, tasks: Union[Iterable[Any], AsyncIterable[Any]]) -> int:
+        first = self.stages[0]
+        count = 0
+        try:
+            if hasattr(tasks, "__aiter__"):
+                async for task in tasks:
+                    await first.put((count, {"task": task}))
+                    count += 1
+            else:
+                for task in tasks:
+                    await first.put((count, {"task": task}))
+                    count += 1
+        finally:
+            for _ in range(first.workers):
+                await first.put(_DONE)
+        return count
+
+    async def _work(self, index: int, outputs: asyncio.Queue, remaining: List[int]):
+        stage = self.stages[index]
+        downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = await stage.queue.get()
+            if item is _DONE:
+                break
+            position, state = item
+            if "error" not in state:
+                stage.busy += 1
+                start = time.monotonic()
+                try:
+                    await stage.handler(state)
+                    stage.processed += 1
+                except Exception as e:
+                    stage.errors += 1
+                    state["error"] = {"stage": stage.name, "error": str(e)}
+                finally:
+                    stage.busy -= 1
+                    stage.busy_time += time.monotonic() - start
+            if downstream is not None:
+                await downstream.put((position, state))
+            else:
+                await outputs.put((position, state))
+
+        # 本阶段最后一个worker退出时通知下游
+        remaining[index] -= 1
+        if remaining[index] == 0:
+            if downstream is not None:
+                for _ in range(downstream.workers):
+                    await downstream.put(_DONE)
+            else:
+                await outputs.put(_DONE)
+
+    async def run(
+        self,
+        tasks: Union[Iterable[Any], AsyncIterable[Any]],
+        on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """处理任务流，按输入顺序返回每个任务的最终状态
+
+        某个阶段抛出异常时，状态中记录 "error"，该任务跳过后续阶段。
+        """
+        self._started = time.monotonic()
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(maxsize=self.queue_size)
+        outputs: asyncio.Queue = asyncio.Queue()
+        remaining = [stage.workers for stage in self.stages]
+
+        workers = [
+            asyncio.create_task(self._work(i, outputs, remaining))
+            for i, stage in enumerate(self.stages)
+            for _ in range(stage.workers)
+        ]
+        feeder = asyncio.create_task(self._feed(tasks))
+
+        results: Dict[int, Dict[str, Any]] = {}
+        try:
+            while True:
+                item = await outputs.get()
+                if item is _DONE:
+                    break
+                position, state = item
+                results[position] = state
+                if on_result is not None:
+                    on_result(position, state)
+            await feeder
+        finally:
+            for task in workers + [feeder]:
+                task.cancel()
+
+        return [results[i] for i in sorted(results)]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各阶段的队列深度、利用率等统计，用于调整各阶段的worker数"""
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return {stage.name: stage.stats(elapsed) for stage in self.stages}
@@ -0,0 +1,75 @@
+import uuid
+from contextvars import ContextVar, Token
+from typing import Dict, Any, List, Optional
+from .budget import TokenBudget
+
+
+class AgentState:
+    """单个Agent在一次运行中的对话历史和上下文"""
+
+    __slots__ = ("messages", "context")
+
+    def __init__(self):
+        self.messages: List[Dict[str, Any]] = []
+        self.context: Dict[str, Any] = {}
+
+
+class RunSession:
+    """一次任务运行的会话：隔离各Agent的对话状态，Agent实例和LLM客户端可共享
+
+    通过 contextvars 传递，会话内创建的 asyncio 任务（包括消息总线的回调）
+    自动继承同一会话。用法：
+
+        with RunSession() as session:
+            await system.process_task(task)
+
+    tenant 和 token_budget 用于token预算：BaseAgent 在每次LLM调用前检查
+    token_budget（本次运行）和 tenant_budget（由 AgentSystem 按租户设置）。
+    """
+
+    def __init__(
+        self,
+        run_id: Optional[str] = None,
+        tenant: Optional[str] = None,
+        token_budget: Optional[int] = None,
+    ):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.tenant = tenant
+        self.token_budget: Optional[TokenBudget] = (
+            TokenBudget(token_budget, "run") if token_budget is not None else None
+        )
+        self.tenant_budget: Optional[TokenBudget] = None
+        self._states: Dict[int, AgentState] = {}
+        # 运行级别的记录，例如复用了缓存结果的节点
+        self.info: Dict[str, Any] = {}
+        self._tokens: List[Token] = []
+
+    def budgets(self) -> List[TokenBudget]:
+        return [
+            budget
+            for budget in (self.token_budget, self.tenant_budget)
+            if budget is not None
+        ]
+
+    def state_for(self, agent: Any) -> AgentState:
+        state = self._states.get(id(agent))
+        if state is None:
+            state = self._states[id(agent)] = AgentState()
+        return state
+
+    def __enter__(self) -> "RunSession":
+        self._tokens.append(_current_session.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_session.reset(self._tokens.pop())
+
+
+_current_session: ContextVar[Optional[RunSession]] = ContextVar(
+    "agent_run_session", default=None
+)
+
+
+def current_session() -> Optional[RunSession]:
+    """返回当前上下文中的会话，没有则返回 None"""
+    return _current_session.get()
@@ -0,0 +1,131 @@
+import json
+from typing import Dict, Any, List, Optional
+
+
+class IncrementalJSONParser:
+    """增量解析流式到达的工具调用参数（顶层为JSON对象）
+
+    每次 feed 一段文本，返回新完成的事件：
+    - {"type": "item", "key": <数组字段名>, "index": i, "value": <元素>}
+      顶层数组字段中的每个元素一闭合就会产出，例如 plan[] 中的每一步
+    - {"type": "field", "key": <字段名>, "value": <值>}
+      顶层字段的值完整到达时产出
+    每个事件都带有 "arguments"：当前已解析部分的快照（数组只含已完成的元素）。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.partial: Dict[str, Any] = {}
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._string_start = 0
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._element_start: Optional[int] = None
+        self._element_done = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.buffer += chunk
+        events: List[Dict[str, Any]] = []
+        text = self.buffer
+
+        while self._pos < len(text):
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._expect_key and len(self._stack) == 1:
+                        self._key = json.loads(text[self._string_start : i + 1])
+                continue
+
+            depth = len(self._stack)
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._stack.append(ch)
+                if depth == 0:
+                    self._expect_key = ch == "{"
+            elif ch in "}]":
+                if depth == 3 and self._in_top_array():
+                    # 数组中的对象/数组元素闭合
+                    self._stack.pop()
+                    self._emit_element(text, i + 1, events)
+                    self._element_done = True
+                    continue
+                if depth == 2 and ch == "]" and self._in_top_array():
+                    self._emit_element(text, i, events)
+                if depth == 1:
+                    self._emit_field(text, i, events)
+                self._stack.pop()
+            elif ch == ":" and depth == 1:
+                self._expect_key = False
+                self._value_start = i + 1
+                if self._is_array_value(text, i + 1):
+                    self.partial.setdefault(self._key, [])
+            elif ch == ",":
+                if depth == 1:
+                    self._emit_field(text, i, events)
+                    self._expect_key = True
+                elif depth == 2 and self._in_top_array():
+                    self._emit_element(text, i, events)
+
+            # 记录顶层数组新元素的起始位置
+            if len(self._stack) == 2 and self._in_top_array():
+                if ch == "[" and depth == 1 or ch == ",":
+                    self._element_start = i + 1
+                    self._element_done = False
+
+        return events
+
+    def _in_top_array(self) -> bool:
+        return len(self._stack) >= 2 and self._stack[0] == "{" and self._stack[1] == "["
+
+    def _is_array_value(self, text: str, start: int) -> bool:
+        return text[start:].lstrip().startswith("[")
+
+    def _emit_element(self, text: str, end: int, events: List[Dict[str, Any]]):
+        if self._element_done or self._element_start is None:
+            return
+        raw = text[self._element_start : end].strip()
+        self._element_done = True
+        if not raw:
+            return
+        items = self.partial.setdefault(self._key, [])
+        items.append(json.loads(raw))
+        events.append(
+            {
+                "type": "item",
+                "key": self._key,
+                "index": len(items) - 1,
+                "value": items[-1],
+                "arguments": dict(self.partial),
+            }
+        )
+
+    def _emit_field(self, text: str, end: int, events: List[Dict[str, Any]]):
+        if self._key is None or self._value_start is None:
+            return
+        raw = text[self._value_start : end].strip()
+        self._value_start = None
+        if not raw:
+            return
+        self.partial[self._key] = json.loads(raw)
+        events.append(
+            {
+                "type": "field",
+                "key": self._key,
+                "value": self.partial[self._key],
+                "arguments": dict(self.partial),
+            }
+        )
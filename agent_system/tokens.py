@@ -0,0 +1,97 @@
+import json
+from typing import Dict, Any, List, Optional
+
+
+def _is_cjk(ch: str) -> bool:
+    code = ord(ch)
+    return (
+        0x4E00 <= code <= 0x9FFF
+        or 0x3400 <= code <= 0x4DBF
+        or 0x3000 <= code <= 0x303F
+        or 0xFF00 <= code <= 0xFFEF
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的token数：中文约0.6个token/字，其他字符约3.5字符/token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if _is_cjk(ch))
+    other = len(text) - cjk
+    return int(cjk * 0.6 + other / 3.5) + 1
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """估算消息列表的token数（每条消息额外计入少量格式开销）"""
+    total = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        total += estimate_tokens(content) + 4
+    return total
+
+
+def estimate_request_tokens(
+    system_prompt: str,
+    messages: List[Dict[str, Any]],
+    tools: Optional[List[Dict[str, Any]]] = None,
+) -> int:
+    """估算一次请求的提示token数（系统提示、消息和工具定义）"""
+    total = estimate_message_tokens([{"content": system_prompt}] + messages)
+    if tools:
+        total += estimate_tokens(json.dumps(tools, ensure_ascii=False))
+    return total
+
+
+def estimate_schema_tokens(
+    schema: Dict[str, Any],
+    root: Optional[Dict[str, Any]] = None,
+    array_items: int = 8,
+    string_tokens: int = 40,
+) -> int:
+    """估算符合 JSON Schema 的输出的token数，用于选择 max_tokens
+
+    数组按 maxItems（默认 array_items）个元素计，没有 maxLength 的字符串按
+    string_tokens 计，additionalProperties 按4个键计。
+    """
+    root = root if root is not None else schema
+
+    def size(node: Any, depth: int = 0) -> int:
+        if not isinstance(node, dict) or depth > 20:
+            return string_tokens
+        if "$ref" in node:
+            target: Any = root
+            for part in node["$ref"].lstrip("#/").split("/"):
+                target = target.get(part, {}) if isinstance(target, dict) else {}
+            return size(target, depth + 1)
+        if "enum" in node:
+            values = [json.dumps(v, ensure_ascii=False) for v in node["enum"]]
+            return max((estimate_tokens(v) for v in values), default=1)
+        for key in ("anyOf", "oneOf"):
+            if key in node:
+                return max((size(option, depth + 1) for option in node[key]), default=1)
+        kind = node.get("type")
+        if isinstance(kind, list):
+            kind = next((k for k in kind if k != "null"), "null")
+        if kind == "object" or "properties" in node:
+            total = 2
+            for name, prop in node.get("properties", {}).items():
+                total += estimate_tokens(name) + 2 + size(prop, depth + 1)
+            extra = node.get("additionalProperties")
+            if isinstance(extra, dict):
+                total += 4 * (3 + size(extra, depth + 1))
+            return total
+        if kind == "array":
+            count = node.get("maxItems", array_items)
+            return 2 + count * (1 + size(node.get("items", {}), depth + 1))
+        if kind == "string":
+            if "maxLength" in node:
+                # 按中文估算上限
+                return int(node["maxLength"] * 0.6) + 2
+            return string_tokens
+        if kind in ("integer", "number"):
+            return 3
+        return 1
+
+    return size(schema)
@@ -0,0 +1,122 @@
+import fnmatch
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Pattern, Tuple
+
+SEPARATOR = "."
+SINGLE = "*"
+MULTI = "#"
+
+
+def is_pattern(topic: str) -> bool:
+    """主题中包含通配符（* 或 #）时视为订阅模式"""
+    return "*" in topic or any(segment == MULTI for segment in topic.split(SEPARATOR))
+
+
+class _Node:
+    __slots__ = ("children", "single", "multi", "globs", "patterns")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.single: Optional["_Node"] = None
+        self.multi: Optional["_Node"] = None
+        self.globs: List[Tuple[str, Pattern, "_Node"]] = []
+        self.patterns: List[str] = []
+
+
+class TopicTrie:
+    """按层级匹配主题的前缀树，主题以 "." 分层
+
+    - "*" 匹配恰好一层，例如 "agent.*.result"
+    - "#" 匹配零层或多层，例如 "agent.#"
+    - 层内通配，例如 "*_result" 匹配 "supervisor_result"
+
+    匹配结果按主题缓存，订阅变化时清空缓存，因此发布时的开销基本不随订阅数增长。
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        self._root = _Node()
+        self._cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._cache_size = cache_size
+
+    def add(self, pattern: str):
+        node = self._root
+        for segment in pattern.split(SEPARATOR):
+            if segment == SINGLE:
+                if node.single is None:
+                    node.single = _Node()
+                node = node.single
+            elif segment == MULTI:
+                if node.multi is None:
+                    node.multi = _Node()
+                node = node.multi
+            elif "*" in segment:
+                for glob, _, child in node.globs:
+                    if glob == segment:
+                        node = child
+                        break
+                else:
+                    child = _Node()
+                    regex = re.compile(fnmatch.translate(segment))
+                    node.globs.append((segment, regex, child))
+                    node = child
+            else:
+                node = node.children.setdefault(segment, _Node())
+        if pattern not in node.patterns:
+            node.patterns.append(pattern)
+        self._cache.clear()
+
+    def remove(self, pattern: str):
+        # 只移除模式本身，空节点保留（订阅模式的数量通常有限）
+        node = self._root
+        for segment in pattern.split(SEPARATOR):
+            if segment == SINGLE:
+                node = node.single
+            elif segment == MULTI:
+                node = node.multi
+            elif "*" in segment:
+                node = next((c for g, _, c in node.globs if g == segment), None)
+            else:
+                node = node.children.get(segment)
+            if node is None:
+                return
+        if pattern in node.patterns:
+            node.patterns.remove(pattern)
+        self._cache.clear()
+
+    def match(self, topic: str) -> List[str]:
+        """返回与主题匹配的所有订阅模式"""
+        cached = self._cache.get(topic)
+        if cached is not None:
+            self._cache.move_to_end(topic)
+            return cached
+
+        matched: Dict[int, _Node] = {}
+        self._match(self._root, topic.split(SEPARATOR), 0, matched)
+        patterns = [p for node in matched.values() for p in node.patterns]
+
+        self._cache[topic] = patterns
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return patterns
+
+    def _match(
+        self, node: _Node, segments: List[str], i: int, matched: Dict[int, _Node]
+    ):
+        if node.multi is not None:
+            # "#" 可以吞掉剩余的任意层数（包括零层）
+            for j in range(i, len(segments) + 1):
+                self._match(node.multi, segments, j, matched)
+        if i == len(segments):
+            if node.patterns:
+                matched[id(node)] = node
+            return
+        segment = segments[i]
+        child = node.children.get(segment)
+        if child is not None:
+            self._match(child, segments, i + 1, matched)
+        if node.single is not None:
+            self._match(node.single, segments, i + 1, matched)
+        for _, regex, child in node.globs:
+            if regex.match(segment):
+                self._match(child, segments, i + 1, matched)
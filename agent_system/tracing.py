@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+import weakref
+from collections import deque
+from contextvars import ContextVar, Token
+from typing import Dict, Any, List, Optional
+
+
+class Span:
+    """一个计时区间；作为上下文管理器使用，期间创建的子区间以它为父区间"""
+
+    __slots__ = (
+        "tracer",
+        "name",
+        "category",
+        "attrs",
+        "span_id",
+        "parent_id",
+        "lane",
+        "start",
+        "end",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        category: str,
+        attrs: Dict[str, Any],
+        parent: Optional["Span"],
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.span_id = next(tracer._ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.lane = tracer._lane()
+        self.start = 0
+        self.end: Optional[int] = None
+        self._token: Optional[Token] = None
+
+    def set(self, key: str, value: Any):
+        self.attrs[key] = value
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+
+    @property
+    def duration(self) -> float:
+        """耗时（秒）"""
+        return ((self.end or time.perf_counter_ns()) - self.start) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "category": self.category,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": (self.start - self.tracer.origin) / 1e9,
+            "duration": self.duration,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空区间"""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """收集运行期间的嵌套区间，导出为 Chrome trace（chrome://tracing / Perfetto）
+
+    通过 contextvars 传递，与 RunSession 相同，范围内创建的 asyncio 任务自动继承
+    追踪器和父区间：
+
+        with Tracer() as tracer:
+            await system.process_task(task)
+        tracer.export_chrome_trace("trace.json")
+
+    只保留最近 max_spans 个已完成的区间。
+    """
+
+    def __init__(self, max_spans: Optional[int] = 100000):
+        self.spans: deque = deque(maxlen=max_spans)
+        self.origin = time.perf_counter_ns()
+        self._ids = itertools.count(1)
+        # 每个 asyncio 任务一条泳道，同一泳道内的区间严格嵌套；
+        # 弱引用任务对象，任务结束后条目自动释放，泳道号不复用
+        self._lanes: "weakref.WeakKeyDictionary[asyncio.Task, int]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lane_ids = itertools.count(2)
+        self._tokens: List[Token] = []
+
+    def _lane(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            # 任务之外（同步代码）的区间共用 1 号泳道
+            return 1
+        lane = self._lanes.get(task)
+        if lane is None:
+            lane = self._lanes[task] = next(self._lane_ids)
+        return lane
+
+    def _finish(self, span: Span):
+        self.spans.append(span)
+
+    def span(self, name: str, category: str = "", **attrs) -> Span:
+        return Span(self, name, category, attrs, _current_span.get())
+
+    def __enter__(self) -> "Tracer":
+        self._tokens.append(_current_tracer.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_tracer.reset(self._tokens.pop())
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        events = []
+        for span in self.spans:
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": (span.start - self.origin) / 1000,
+                    "dur": (span.end - span.start) / 1000,
+                    "pid": os.getpid(),
+                    "tid": span.lane,
+                    "args": {
+                        "span_id": span.span_id,
+                        "parent_id": span.parent_id,
+                        **span.attrs,
+                    },
+                }
+            )
+        events.sort(key=lambda event: event["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False, default=str)
+
+    def clear(self):
+        self.spans.clear()
+        self._lanes.clear()
+        self._lane_ids = itertools.count(2)
+
+
+_current_tracer: ContextVar[Optional[Tracer]] = ContextVar(
+    "agent_tracer", default=None
+)
+_current_span: ContextVar[Optional[Span]] = ContextVar("agent_span", default=None)
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _current_tracer.get()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def span(name: str, category: str = "", **attrs):
+    """在当前追踪器中创建区间；未启用追踪时返回空区间，开销可以忽略"""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.span(name, category, **attrs)
@@ -91,10 +91,11 @@ class CalibratorAgent(BaseAgent):
     def get_system_prompt(self) -> str:
         return self.system_prompt
 
-    async def process_req(self, req: str) -> Dict[str, Any]:
-        prompt = f"Given the task: {req}\nPlease analyze this task and create a detailed execution plan with steps and assignments."
+    def build_prompt(self, req: str) -> str:
+        return f"Given the task: {req}\nPlease analyze this task and create a detailed execution plan with steps and assignments."
 
-        tools = [
+    def get_tools(self) -> List[Dict[str, Any]]:
+        return [
             {
                 "type": "function",
                 "function": {
@@ -133,11 +134,15 @@ class CalibratorAgent(BaseAgent):
             }
         ]
 
-        tool_choice = {
+    def get_tool_choice(self) -> Dict[str, Any]:
+        return {
             "type": "function",
             "function": {"name": "create_calibrator_execution_plan"},
         }
 
+    async def process_req(self, req: str) -> Dict[str, Any]:
         return await super().process_req(
-            req=prompt, tools=tools, tool_choice=tool_choice
+            req=self.build_prompt(req),
+            tools=self.get_tools(),
+            tool_choice=self.get_tool_choice(),
         )
@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from agent_system.base_agent import BaseAgent
 from agent_system.config import AgentConfig
 
@@ -149,10 +149,9 @@ class DataDeveloperAgent(BaseAgent):
 
         return self.system_prompt + tools_desc
 
-    async def process_req(self, task: str) -> Dict[str, Any]:
-        """Process a data engineering task using LLM for planning and function calling"""
-        # Define tools for development planning
-        tools = [
+    def get_tools(self) -> List[Dict[str, Any]]:
+        """Define tools for development planning"""
+        return [
             {
                 "type": "function",
                 "function": {
@@ -236,13 +235,18 @@ class DataDeveloperAgent(BaseAgent):
             }
         ]
 
-        tool_choice = {
+    def get_tool_choice(self) -> Dict[str, Any]:
+        return {
             "type": "function",
             "function": {"name": "create_development_plan"},
         }
 
+    async def process_req(self, task: str) -> Dict[str, Any]:
+        """Process a data engineering task using LLM for planning and function calling"""
         # Process task with tools
-        return await super().process_req(req=task, tools=tools, tool_choice=tool_choice)
+        return await super().process_req(
+            req=task, tools=self.get_tools(), tool_choice=self.get_tool_choice()
+        )
 
     async def publish(self, topic: str, message: str):
         """Publish messages to message bus"""
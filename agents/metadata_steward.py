@@ -1,6 +1,7 @@
 from typing import Dict, Any
 import json
 from agent_system.base_agent import BaseAgent
+from agent_system.budget import TokenBudgetExceeded, budget_result
 from agent_system.config import AgentConfig
 
 
@@ -50,10 +51,9 @@ Focus on maintaining high-quality metadata while supporting data governance init
     def get_system_prompt(self) -> str:
         return self.system_prompt
 
-    async def process_req(self, task: str) -> Dict[str, Any]:
-        """Process a metadata management task using LLM for thinking and mock tools for execution"""
-        # 构建提示词，让LLM思考如何处理元数据任务
-        prompt = f"""Given the task: {task}
+    def build_prompt(self, task: str) -> str:
+        """构建提示词，让LLM思考如何处理元数据任务"""
+        return f"""Given the task: {task}
         Please analyze this task from a metadata management perspective and create:
         1. A metadata query plan (which tables and fields to examine)
         2. A metadata audit plan (what to verify and validate)
@@ -75,13 +75,23 @@ Focus on maintaining high-quality metadata while supporting data governance init
         }}
         """
 
+    async def replay_result(self, task: str, result: Dict[str, Any]):
+        # 元数据管理结果不发布到消息总线，只补上对话历史
+        self.add_message("user", self.build_prompt(task))
+        self.add_message("assistant", self.serialize_result(result))
+
+    async def process_req(self, task: str) -> Dict[str, Any]:
+        """Process a metadata management task using LLM for thinking and mock tools for execution"""
+        prompt = self.build_prompt(task)
+
         # 调用LLM进行思考
         self.add_message("user", prompt)
-        llm_response = await self.llm.generate(
-            system_prompt=self.get_system_prompt(),
-            messages=self.messages,
-            temperature=0.7,
-        )
+        try:
+            llm_response = await self.generate(temperature=0.7)
+        except TokenBudgetExceeded as e:
+            result = budget_result(e)
+            self.add_message("assistant", self.serialize_result(result))
+            return result
 
         try:
             # 解析LLM响应
@@ -100,7 +110,7 @@ Focus on maintaining high-quality metadata while supporting data governance init
             }
 
             # 记录响应
-            self.add_message("assistant", str(final_result))
+            self.add_message("assistant", self.serialize_result(final_result))
             return final_result
 
         except json.JSONDecodeError:
@@ -111,5 +121,5 @@ Focus on maintaining high-quality metadata while supporting data governance init
                 "status": "completed",
                 "error": "Failed to parse LLM response",
             }
-            self.add_message("assistant", str(fallback_response))
+            self.add_message("assistant", self.serialize_result(fallback_response))
             return fallback_response
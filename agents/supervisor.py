@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, AsyncIterator
 from agent_system.base_agent import BaseAgent
 from agent_system.config import AgentConfig
 
@@ -96,13 +96,13 @@ class SupervisorAgent(BaseAgent):
         """获取SupervisorAgent的系统提示词"""
         return self.system_prompt
 
-    async def process_req(self, req: str) -> Dict[str, Any]:
-        """Process a project management task using LLM for thinking and function calling"""
-        # 构建提示词，让LLM思考如何处理任务
-        prompt = f"Given the task: {req}\nPlease analyze this task and create a detailed execution plan with steps and execute step by step."
+    def build_prompt(self, req: str) -> str:
+        """构建提示词，让LLM思考如何处理任务"""
+        return f"Given the task: {req}\nPlease analyze this task and create a detailed execution plan with steps and execute step by step."
 
-        # 定义工具调用结构
-        tools = [
+    def get_tools(self) -> List[Dict[str, Any]]:
+        """定义工具调用结构"""
+        return [
             {
                 "type": "function",
                 "function": {
@@ -139,15 +139,29 @@ class SupervisorAgent(BaseAgent):
             }
         ]
 
-        tool_choice = {
+    def get_tool_choice(self) -> Dict[str, Any]:
+        return {
             "type": "function",
             "function": {"name": "create_supervisor_execution_plan"},
         }
 
+    async def process_req(self, req: str) -> Dict[str, Any]:
+        """Process a project management task using LLM for thinking and function calling"""
         return await super().process_req(
-            req=prompt, tools=tools, tool_choice=tool_choice
+            req=self.build_prompt(req),
+            tools=self.get_tools(),
+            tool_choice=self.get_tool_choice(),
         )
 
+    async def stream_plan(self, req: str) -> AsyncIterator[Dict[str, Any]]:
+        """流式生成执行计划，plan中的每一步一完成就产出，便于提前分派"""
+        async for event in self.process_req_stream(
+            req=self.build_prompt(req),
+            tools=self.get_tools(),
+            tool_choice=self.get_tool_choice(),
+        ):
+            yield event
+
     async def publish(self, topic: str, message: str):
         messagebus = self.message_bus
         if messagebus:
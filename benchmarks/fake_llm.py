@@ -0,0 +1,27 @@
+import asyncio
+from typing import Dict, Any
+from openai.types.chat import ChatCompletion
+from agent_system.config import LLMConfig
+from agent_system.llm import DeepSeekLLM
+from agent_system.mock_server import MockLLMBackend
+
+
+class ZeroLatencyLLM(DeepSeekLLM):
+    """不发送网络请求的LLM：直接返回模拟响应，用于测量编排开销
+
+    缓存、合并、限流之上的处理流程与真实客户端一致，只替换最底层的发送。
+    """
+
+    def __init__(self, config: LLMConfig = None, latency: float = 0.0):
+        super().__init__(config or LLMConfig(api_key="benchmark"))
+        self.latency = latency
+        self.backend = MockLLMBackend()
+        self.sent = 0
+
+    async def _send(self, params: Dict[str, Any]) -> ChatCompletion:
+        self.sent += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        response = ChatCompletion.model_validate(self.backend.completion(params))
+        self._record_usage(response)
+        return response
@@ -0,0 +1,290 @@
+"""负载生成器：从JSONL文件读取需求，按目标速率或并发度驱动 AgentSystem，
+报告各Agent和端到端的延迟分位数、吞吐量、错误率和token消耗
+
+    # 本地进程内模拟（长尾延迟 + 2% 错误率）
+    python -m benchmarks.loadgen reqs.jsonl --mock --latency lognormal:1.5,0.6 \\
+        --error-rate 0.02 --concurrency 16 --requests 500
+
+    # 本地模拟服务器或真实接口（使用 DEEPSEEK_* 环境变量）
+    python -m benchmarks.loadgen reqs.jsonl --api-base http://127.0.0.1:8000/v1 \\
+        --rate 5 --duration 60
+
+JSONL 每行是字符串，或包含 requirement / task 字段的对象。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+from agent_system import AgentSystem
+from agent_system.config import load_config
+from agent_system.llm import DeepSeekLLM
+from agent_system.mock_server import MockLLMBackend, MockTransport, parse_latency
+from agent_system.session import RunSession
+from benchmarks.stats import summarize
+
+TARGETS = ("process_task", "workflow", "supervisor_planning", "calibrator_planning")
+_FAILED_STATUSES = ("error", "timeout", "skipped")
+
+# 执行一个需求，返回 {agent: 结果}
+TargetFn = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+def read_requirements(path: str) -> List[str]:
+    requirements = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, dict):
+                item = item.get("requirement") or item.get("task") or item.get("req")
+            requirements.append(str(item))
+    if not requirements:
+        raise ValueError(f"No requirements found in {path}")
+    return requirements
+
+
+def make_target(system: AgentSystem, target: str) -> TargetFn:
+    if target == "process_task":
+        return system.process_task
+    if target == "workflow":
+        return system.execute_workflow
+
+    async def supervisor_planning(req: str) -> Dict[str, Any]:
+        return {"supervisor": await system.call_agent(system.supervisor, req)}
+
+    async def calibrator_planning(req: str) -> Dict[str, Any]:
+        supervisor_result = await system.call_agent(system.supervisor, req)
+        results = {"supervisor": supervisor_result}
+        if supervisor_result.get("status") in _FAILED_STATUSES:
+            return results
+        msg = system.supervisor.prepare_calibrator_msg(supervisor_result)
+        results["data_calibration"] = await system.call_agent(
+            system.data_calibration, json.dumps(msg, ensure_ascii=False, indent=2)
+        )
+        return results
+
+    if target == "supervisor_planning":
+        return supervisor_planning
+    if target == "calibrator_planning":
+        return calibrator_planning
+    raise ValueError(f"Unknown target: {target}")
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.agent_latencies: Dict[str, List[float]] = defaultdict(list)
+        self.agent_errors: Dict[str, int] = defaultdict(int)
+        self.completed = 0
+        self.errors = 0
+
+    def record(
+        self,
+        latency: float,
+        results: Optional[Dict[str, Any]],
+        agent_latency: Dict[str, float],
+    ):
+        self.completed += 1
+        self.latencies.append(latency)
+        for role, seconds in agent_latency.items():
+            self.agent_latencies[role].append(seconds)
+        failed = results is None
+        for role, result in (results or {}).items():
+            if isinstance(result, dict) and result.get("status") in _FAILED_STATUSES:
+                self.agent_errors[role] += 1
+                failed = True
+        if failed:
+            self.errors += 1
+
+    def report(self, elapsed: float, usage: Dict[str, int]) -> Dict[str, Any]:
+        ms = lambda samples: summarize([s * 1000 for s in samples])
+        return {
+            "requests": self.completed,
+            "elapsed_s": elapsed,
+            "throughput_rps": self.completed / elapsed if elapsed > 0 else 0.0,
+            "error_rate": self.errors / self.completed if self.completed else 0.0,
+            "latency_ms": ms(self.latencies),
+            "agents": {
+                role: {
+                    "latency_ms": ms(samples),
+                    "error_rate": self.agent_errors[role] / len(samples),
+                }
+                for role, samples in sorted(self.agent_latencies.items())
+            },
+            "tokens": dict(usage),
+            "tokens_per_request": (
+                usage.get("total_tokens", 0) / self.completed if self.completed else 0.0
+            ),
+        }
+
+
+async def run_load(
+    target: TargetFn,
+    requirements: List[str],
+    requests: Optional[int] = None,
+    duration: Optional[float] = None,
+    concurrency: Optional[int] = None,
+    rate: Optional[float] = None,
+) -> LoadStats:
+    """按并发度（闭环）或到达速率（开环）执行需求，循环使用输入直到达到
+    requests 数量或 duration 秒"""
+    if (concurrency is None) == (rate is None):
+        raise ValueError("Specify exactly one of concurrency or rate")
+    if requests is None and duration is None:
+        requests = len(requirements)
+    stats = LoadStats()
+    start = time.monotonic()
+    issued = 0
+
+    def next_requirement() -> Optional[str]:
+        nonlocal issued
+        if requests is not None and issued >= requests:
+            return None
+        if duration is not None and time.monotonic() - start >= duration:
+            return None
+        req = requirements[issued % len(requirements)]
+        issued += 1
+        return req
+
+    async def one(req: str):
+        t0 = time.monotonic()
+        with RunSession() as session:
+            try:
+                results = await target(req)
+            except Exception as e:
+                print(f"Request failed: {e}")
+                results = None
+        stats.record(
+            time.monotonic() - t0, results, session.info.get("agent_latency", {})
+        )
+
+    if concurrency is not None:
+
+        async def worker():
+            while (req := next_requirement()) is not None:
+                await one(req)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    else:
+        tasks = set()
+        interval = 1.0 / rate
+        while (req := next_requirement()) is not None:
+            task = asyncio.create_task(one(req))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            # 按固定到达间隔发送，不等待前一个请求完成
+            await asyncio.sleep(start + issued * interval - time.monotonic())
+        await asyncio.gather(*tasks)
+    return stats
+
+
+def build_llm(args: argparse.Namespace) -> DeepSeekLLM:
+    config = load_config()
+    if args.api_base:
+        config.api_base = args.api_base
+    if args.max_concurrency:
+        config.max_concurrency = args.max_concurrency
+    transport = None
+    if args.mock:
+        transport = MockTransport(
+            MockLLMBackend(
+                latency=parse_latency(args.latency),
+                error_rate=args.error_rate,
+                rate_limit_rate=args.rate_limit_rate,
+                seed=args.seed,
+            )
+        )
+    return DeepSeekLLM(config, transport=transport)
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    def row(name: str, latency: Dict[str, float], error_rate: float) -> str:
+        return (
+            f"{name:<20} {latency.get('p50', 0):>10.1f} {latency.get('p95', 0):>10.1f} "
+            f"{latency.get('p99', 0):>10.1f} {error_rate:>9.2%}"
+        )
+
+    lines = [
+        f"requests: {report['requests']}  elapsed: {report['elapsed_s']:.1f}s  "
+        f"throughput: {report['throughput_rps']:.2f} req/s",
+        f"tokens: {report['tokens'].get('total_tokens', 0)} "
+        f"({report['tokens_per_request']:.0f}/request)",
+        f"{'':<20} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>9}",
+        row("end-to-end", report["latency_ms"], report["error_rate"]),
+    ]
+    for role, agent in report["agents"].items():
+        lines.append(row(role, agent["latency_ms"], agent["error_rate"]))
+    return "\n".join(lines)
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    requirements = read_requirements(args.requirements)
+    llm = build_llm(args)
+    system = AgentSystem(
+        llm=llm,
+        task_timeout=args.task_timeout,
+        node_timeout=args.node_timeout,
+    )
+    try:
+        async with system:
+            with contextlib.ExitStack() as stack:
+                if not args.verbose:
+                    devnull = stack.enter_context(open(os.devnull, "w"))
+                    stack.enter_context(contextlib.redirect_stdout(devnull))
+                start = time.monotonic()
+                stats = await run_load(
+                    make_target(system, args.target),
+                    requirements,
+                    requests=args.requests,
+                    duration=args.duration,
+                    concurrency=args.concurrency,
+                    rate=args.rate,
+                )
+                elapsed = time.monotonic() - start
+            return stats.report(elapsed, llm.usage)
+    finally:
+        # AgentSystem 不关闭传入的LLM
+        await llm.aclose()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Drive load through the agent system")
+    parser.add_argument("requirements", help="JSONL file of requirements")
+    parser.add_argument("--target", choices=TARGETS, default="process_task")
+    drive = parser.add_mutually_exclusive_group()
+    drive.add_argument("--concurrency", type=int, help="closed-loop in-flight requests")
+    drive.add_argument("--rate", type=float, help="open-loop arrivals per second")
+    parser.add_argument("--requests", type=int, help="total requests to send")
+    parser.add_argument("--duration", type=float, help="stop issuing after N seconds")
+    parser.add_argument("--task-timeout", type=float)
+    parser.add_argument("--node-timeout", type=float)
+    parser.add_argument("--max-concurrency", type=int, help="LLM concurrency cap")
+    parser.add_argument("--api-base", help="override DEEPSEEK_API_BASE")
+    parser.add_argument("--mock", action="store_true", help="use an in-process mock")
+    parser.add_argument("--latency", default="0", help="mock latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep debug output")
+    args = parser.parse_args(argv)
+    if args.concurrency is None and args.rate is None:
+        args.concurrency = 1
+
+    report = asyncio.run(_run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""编排开销基准测试：用零延迟的假LLM替换 DeepSeekLLM，测量模型调用之外的耗时
+
+    python -m benchmarks.orchestration --output bench.json
+    python -m benchmarks.orchestration --baseline bench.json --tolerance 0.2
+
+测量项：
+- task_overhead_ms / workflow_overhead_ms：单个任务的编排耗时（process_task / execute_workflow）
+- publish_per_sec.<N>：MessageBus.publish 吞吐量随订阅者数量的变化
+- memory_per_10k_tasks_kb：每1万个任务的内存增长
+- tasks_per_sec.<C>：不同并发度下的端到端吞吐量
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import AsyncIterator, Dict, Any, List, Optional
+from agent_system import AgentSystem
+from agent_system.batch import gather_bounded
+from agent_system.message_bus import MessageBus
+from benchmarks.fake_llm import ZeroLatencyLLM
+from benchmarks.stats import summarize
+
+TASK = "支撑省内集团客户部对外大数据服务合作项目，需要用户行业网关短信收发时间明细数据"
+
+# 越大越好的指标（其余指标越小越好）
+HIGHER_IS_BETTER = ("publish_per_sec", "tasks_per_sec")
+
+
+@contextlib.asynccontextmanager
+async def make_system(latency: float = 0.0) -> AsyncIterator[AgentSystem]:
+    # 传入的LLM不归 AgentSystem 所有，需要在这里关闭以释放连接池
+    llm = ZeroLatencyLLM(latency=latency)
+    system = AgentSystem(llm=llm)
+    try:
+        yield system
+    finally:
+        await system.aclose()
+        await llm.aclose()
+
+
+async def bench_task_overhead(tasks: int) -> Dict[str, Any]:
+    results = {}
+    async with make_system() as system:
+        for name, run in (
+            ("task_overhead_ms", system.process_task),
+            ("workflow_overhead_ms", system.execute_workflow),
+        ):
+            await run(TASK)  # 预热
+            samples = []
+            for i in range(tasks):
+                start = time.perf_counter()
+                await run(f"{TASK} #{i}")
+                samples.append((time.perf_counter() - start) * 1000)
+            results[name] = summarize(samples)
+    return results
+
+
+async def bench_publish(messages: int, subscriber_counts: List[int]) -> Dict[str, Any]:
+    async def noop(message):
+        pass
+
+    results = {}
+    for delivery in ("sync", "queued"):
+        for count in subscriber_counts:
+            bus = MessageBus(delivery=delivery, queue_size=messages)
+            for _ in range(count):
+                bus.subscribe("bench_result", noop)
+            payload = {"status": "in_progress", "plan": [{"step": 1}]}
+            start = time.perf_counter()
+            for _ in range(messages):
+                await bus.publish("bench_result", payload, sender="bench")
+            await bus.drain()
+            elapsed = time.perf_counter() - start
+            await bus.aclose()
+            results[f"{delivery}.{count}"] = messages / elapsed
+    return {"publish_per_sec": results}
+
+
+async def bench_memory(tasks: int) -> Dict[str, Any]:
+    async with make_system() as system:
+        await system.process_task(TASK)
+        gc.collect()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        for i in range(tasks):
+            await system.process_task(f"{TASK} #{i}")
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "memory_per_10k_tasks_kb": (after - before) / 1024 * 10000 / tasks,
+        "memory_peak_kb": peak / 1024,
+    }
+
+
+async def bench_throughput(
+    tasks: int, concurrency_levels: List[int], latency: float
+) -> Dict[str, Any]:
+    results = {}
+    for concurrency in concurrency_levels:
+        async with make_system(latency) as system:
+            start = time.perf_counter()
+            await gather_bounded(
+                system.process_task,
+                [f"{TASK} #{i}" for i in range(tasks)],
+                concurrency=concurrency,
+            )
+            results[str(concurrency)] = tasks / (time.perf_counter() - start)
+    return {"tasks_per_sec": results}
+
+
+async def run_benchmarks(
+    tasks: int = 200,
+    messages: int = 10000,
+    memory_tasks: int = 10000,
+    subscriber_counts: Optional[List[int]] = None,
+    concurrency_levels: Optional[List[int]] = None,
+    latency: float = 0.0,
+    quiet: bool = True,
+) -> Dict[str, Any]:
+    """执行全部基准测试；quiet 时丢弃各模块的调试输出（输出本身的开销仍计入）"""
+    results: Dict[str, Any] = {}
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            stack.enter_context(
+                contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w")))
+            )
+        results.update(await bench_task_overhead(tasks))
+        results.update(
+            await bench_publish(messages, subscriber_counts or [0, 1, 10, 100])
+        )
+        results.update(await bench_memory(memory_tasks))
+        results.update(
+            await bench_throughput(tasks, concurrency_levels or [1, 4, 16, 64], latency)
+        )
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "tasks": tasks,
+            "messages": messages,
+            "memory_tasks": memory_tasks,
+            "llm_latency": latency,
+        },
+        "results": results,
+    }
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """将嵌套结果展开为 {"task_overhead_ms.p50": ...} 形式"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def check_regressions(
+    current: Dict[str, Any],
+    baseline: Optional[Dict[str, Any]] = None,
+    tolerance: float = 0.2,
+    thresholds: Optional[Dict[str, Dict[str, float]]] = None,
+) -> List[str]:
+    """与基线比较（超过 tolerance 比例的退化）并检查绝对阈值，返回退化描述列表
+
+    thresholds 形如
+    {"task_overhead_ms.p50": {"max": 5.0}, "tasks_per_sec.16": {"min": 100}}
+    """
+    metrics = flatten(current["results"])
+    regressions = []
+    if baseline is not None:
+        for name, base in flatten(baseline["results"]).items():
+            value = metrics.get(name)
+            if value is None or not base:
+                continue
+            if name.startswith(HIGHER_IS_BETTER):
+                if value < base * (1 - tolerance):
+                    regressions.append(f"{name}: {value:.3f} < baseline {base:.3f}")
+            elif value > base * (1 + tolerance):
+                regressions.append(f"{name}: {value:.3f} > baseline {base:.3f}")
+    for name, limits in (thresholds or {}).items():
+        value = metrics.get(name)
+        if value is None:
+            continue
+        if "max" in limits and value > limits["max"]:
+            regressions.append(f"{name}: {value:.3f} > max {limits['max']}")
+        if "min" in limits and value < limits["min"]:
+            regressions.append(f"{name}: {value:.3f} < min {limits['min']}")
+    return regressions
+
+
+def _load(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not path:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(x) for x in value.split(",")]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark agent orchestration overhead"
+    )
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--memory-tasks", type=int, default=10000)
+    parser.add_argument("--subscribers", type=_int_list, default=[0, 1, 10, 100])
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16, 64])
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.0,
+        help="simulated LLM latency for the throughput benchmark",
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--thresholds", help="JSON file of absolute min/max limits")
+    parser.add_argument("--verbose", action="store_true", help="keep debug output")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(
+        run_benchmarks(
+            tasks=args.tasks,
+            messages=args.messages,
+            memory_tasks=args.memory_tasks,
+            subscriber_counts=args.subscribers,
+            concurrency_levels=args.concurrency,
+            latency=args.llm_latency,
+            quiet=not args.verbose,
+        )
+    )
+    regressions = check_regressions(
+        report, _load(args.baseline), args.tolerance, _load(args.thresholds)
+    )
+    report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
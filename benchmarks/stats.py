@@ -0,0 +1,20 @@
+import statistics
+from typing import Dict, List
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """样本的均值和 p50/p95/p99；没有样本时返回空字典"""
+    if not samples:
+        return {}
+    return {
+        "count": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": percentile(samples, 0.50),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+    }
@@ -59,6 +59,8 @@ async def calibrator_planning():
         print("Full traceback:")
         traceback.print_exc()
         return msg_for_calbrator
+    finally:
+        await llm.aclose()
 
 
 if __name__ == "__main__":
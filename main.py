@@ -7,12 +7,14 @@ async def run_task(system: AgentSystem, task: str):
     print(f"Processing task: {task}")
 
     print("\nExecuting standard workflow:")
-    result = await system.process_task(task)
-    print_results(system, result)
+    with system.session():
+        result = await system.process_task(task)
+        print_results(system, result)
 
     print("\nExecuting custom workflow:")
-    workflow_result = await system.execute_workflow(task)
-    print_results(system, workflow_result)
+    with system.session():
+        workflow_result = await system.execute_workflow(task)
+        print_results(system, workflow_result)
 
 
 def print_results(system: AgentSystem, results: dict):
@@ -43,13 +45,12 @@ async def main():
     print("Starting Agent System test...")
 
     # 初始化Agent系统
-    system = AgentSystem()
+    async with AgentSystem() as system:
+        # 测试任务
+        test_task = "分析销售数据，生成每月销售报表"
 
-    # 测试任务
-    test_task = "分析销售数据，生成每月销售报表"
-
-    # 执行任务
-    await run_task(system, test_task)
+        # 执行任务
+        await run_task(system, test_task)
 
 
 if __name__ == "__main__":
@@ -30,6 +30,8 @@ async def supervisor_planning():
         print("Full traceback:")
         traceback.print_exc()
         return result
+    finally:
+        await llm.aclose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+"""测试共用的假对象和构造函数"""
+
+import asyncio
+import json
+import os
+import tempfile
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from agent_system import AgentSystem
+from agent_system.config import AgentConfig, LLMConfig
+from agent_system.llm import DeepSeekLLM
+from agent_system.message_bus import MessageBus
+from agent_system.mock_server import MockTransport
+from agents.supervisor import SupervisorAgent
+
+MESSAGES = [{"role": "user", "content": "生成月度销售报表"}]
+
+PLAN = {
+    "requirments": "月度销售报表",
+    "plan": [
+        {"step": 1, "task": "确认口径, 含 \"}\" 字符", "assigned_to": "calibrator"},
+        {"step": 2, "task": "开发报表", "assigned_to": "developer"},
+    ],
+    "assignments": {"calibrator": ["确认口径"]},
+    "reasoning": "先口径后开发",
+}
+
+
+def make_completion(content: str) -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "cmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "deepseek-chat",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+        }
+    )
+
+
+class FakeCompletions:
+    """按请求返回固定格式的补全：有 tool_choice 时返回工具调用，否则返回 content"""
+
+    def __init__(self, content: str = json.dumps({"reasoning": "ok"})):
+        self.content = content
+        self.calls = 0
+
+    async def create(self, **params):
+        self.calls += 1
+        message = {"role": "assistant", "content": self.content}
+        if params.get("tool_choice"):
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": "call_0",
+                        "type": "function",
+                        "function": {
+                            "name": params["tool_choice"]["function"]["name"],
+                            "arguments": json.dumps({"plan": [], "reasoning": "ok"}),
+                        },
+                    }
+                ],
+            }
+        return ChatCompletion.model_validate(
+            {
+                "id": "cmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": params["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+            }
+        )
+
+
+def make_system(**kwargs) -> AgentSystem:
+    system = AgentSystem(**kwargs)
+    system.llm.client.chat.completions = FakeCompletions()
+    return system
+
+
+def mock_llm(**kwargs) -> DeepSeekLLM:
+    return DeepSeekLLM(
+        LLMConfig(api_key="test", api_base="http://mock.local/v1", **kwargs),
+        transport=MockTransport(),
+    )
+
+
+class FakeStream:
+    """模拟 openai.AsyncStream：可异步迭代，读完后需要 close"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __aiter__(self):
+        return self.chunks.__aiter__()
+
+    async def close(self):
+        self.closed = True
+
+
+class StreamingCompletions:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.streams = []
+
+    async def create(self, stream=False, **params):
+        arguments = json.dumps(PLAN, ensure_ascii=False)
+        name = params["tool_choice"]["function"]["name"]
+
+        async def chunks():
+            for i in range(0, len(arguments), 8):
+                await asyncio.sleep(self.delay)
+                yield ChatCompletionChunk.model_validate(
+                    {
+                        "id": "chunk",
+                        "object": "chat.completion.chunk",
+                        "created": 0,
+                        "model": "deepseek-chat",
+                        "choices": [
+                            {
+                                "index": 0,
+                                "finish_reason": None,
+                                "delta": {
+                                    "tool_calls": [
+                                        {
+                                            "index": 0,
+                                            "id": "call_0" if i == 0 else None,
+                                            "function": {
+                                                "name": name if i == 0 else None,
+                                                "arguments": arguments[i : i + 8],
+                                            },
+                                        }
+                                    ]
+                                },
+                            }
+                        ],
+                    }
+                )
+            if params.get("stream_options", {}).get("include_usage"):
+                yield ChatCompletionChunk.model_validate(
+                    {
+                        "id": "chunk",
+                        "object": "chat.completion.chunk",
+                        "created": 0,
+                        "model": "deepseek-chat",
+                        "choices": [],
+                        "usage": {
+                            "prompt_tokens": 100,
+                            "completion_tokens": 50,
+                            "total_tokens": 150,
+                        },
+                    }
+                )
+
+        assert stream
+        self.streams.append(FakeStream(chunks()))
+        return self.streams[-1]
+
+
+def make_supervisor(completions: StreamingCompletions) -> SupervisorAgent:
+    llm = DeepSeekLLM(LLMConfig(api_key="test"))
+    llm.client.chat.completions = completions
+    return SupervisorAgent(
+        config=AgentConfig(
+            name="supervisor",
+            role="supervisor",
+            description="Project management",
+            llm_config=llm.config,
+        ),
+        message_bus=MessageBus(),
+        llm=llm,
+    )
+
+
+def socket_path() -> str:
+    return os.path.join(tempfile.mkdtemp(), "bus.sock")
@@ -0,0 +1,79 @@
+import asyncio
+from agent_system import AgentSystem
+from agent_system.config import LLMConfig
+from agent_system.llm import DeepSeekLLM
+from agent_system.node_cache import MemoryNodeStore
+from tests.helpers import make_system
+
+
+def test_execute_workflow_runs_every_node():
+    system = make_system()
+    results = asyncio.run(system.execute_workflow("生成月度销售报表"))
+    assert set(results) == set(system.workflow)
+    assert results["data_developer"]["status"] == "in_progress"
+    assert results["metadata_steward"]["status"] == "completed"
+
+
+def test_unchanged_nodes_are_reused_on_rerun():
+    system = make_system(node_store=MemoryNodeStore())
+    fake = system.llm.client.chat.completions
+
+    async def run(task):
+        with system.session() as session:
+            results = await system.execute_workflow(task)
+        return results, session.info.get("reused_nodes", [])
+
+    first, reused = asyncio.run(run("生成月度销售报表"))
+    calls = fake.calls
+    assert reused == []
+
+    second, reused = asyncio.run(run("生成月度销售报表"))
+    assert second == first
+    assert sorted(reused) == sorted(system.workflow)
+    assert fake.calls == calls
+
+    _, reused = asyncio.run(run("生成季度销售报表"))
+    assert reused == []
+
+
+def test_reused_nodes_are_published_and_recorded():
+    system = make_system(node_store=MemoryNodeStore())
+
+    async def run():
+        with system.session():
+            await system.execute_workflow("生成月度销售报表")
+            messages = {
+                role: [(m["role"], m["sender"]) for m in agent.messages]
+                for role, agent in agents()
+            }
+        published = {
+            topic: len(system.message_bus.get_message_history(topic))
+            for topic in system.message_bus.history.topics()
+        }
+        return messages, published
+
+    def agents():
+        return [(role, system.get_agent_by_role(role)) for role in system.workflow]
+
+    first_messages, first_published = asyncio.run(run())
+    system.message_bus.history.clear()
+    second_messages, second_published = asyncio.run(run())
+    # 复用的节点与实际执行时一样写入对话历史并发布结果
+    assert second_messages == first_messages
+    assert second_published == first_published
+    assert second_published["supervisor_result"] == 1
+
+
+def test_aclose_leaves_injected_llm_open():
+    llm = DeepSeekLLM(LLMConfig(api_key="test"))
+    shared = AgentSystem(llm=llm)
+    owned = AgentSystem()
+
+    async def run():
+        await shared.aclose()
+        assert llm.http_client is not None
+        await owned.aclose()
+        assert owned.llm.http_client is None
+        await llm.aclose()
+
+    asyncio.run(run())
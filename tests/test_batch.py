@@ -0,0 +1,112 @@
+import asyncio
+import json
+from agent_system.batch import gather_bounded
+from tests.helpers import FakeCompletions, make_system
+
+
+def test_results_in_input_order_with_bounded_concurrency():
+    running = 0
+    peak = 0
+    progress = []
+
+    async def work(n):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001 * (5 - n))
+        running -= 1
+        if n == 2:
+            raise ValueError("boom")
+        return n * 10
+
+    results = asyncio.run(
+        gather_bounded(
+            work,
+            range(5),
+            concurrency=2,
+            on_progress=lambda done, total, i, r: progress.append((done, total)),
+        )
+    )
+    assert results[:2] == [0, 10] and results[3:] == [30, 40]
+    assert isinstance(results[2], ValueError)
+    assert peak == 2
+    assert progress[-1] == (5, 5)
+
+
+class BatchCompletions(FakeCompletions):
+    """把最后一条消息原样放进结果并记录最大并发；消息含 "fail" 时请求失败"""
+
+    def __init__(self):
+        super().__init__()
+        self.running = 0
+        self.peak = 0
+
+    async def create(self, **params):
+        text = params["messages"][-1]["content"]
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            # 越靠前的请求完成得越晚，检验结果按输入顺序返回
+            await asyncio.sleep(0.001 * (10 - len(text) % 10))
+            if "fail" in text:
+                raise RuntimeError("boom")
+            response = await super().create(**params)
+        finally:
+            self.running -= 1
+        message = response.choices[0].message
+        if message.tool_calls:
+            arguments = json.dumps({"plan": [], "reasoning": text})
+            message.tool_calls[0].function.arguments = arguments
+        else:
+            message.content = text
+        return response
+
+
+def batch_system():
+    system = make_system()
+    completions = system.llm.client.chat.completions = BatchCompletions()
+    return system, completions
+
+
+REQS = ["r", "rr", "fail", "rrrr", "rrrrr", "rrrrrr"]
+
+
+def test_generate_many():
+    system, completions = batch_system()
+    messages_list = [[{"role": "user", "content": req}] for req in REQS]
+    results = asyncio.run(
+        system.llm.generate_many("system", messages_list, concurrency=2)
+    )
+    assert results[:2] + results[3:] == ["r", "rr", "rrrr", "rrrrr", "rrrrrr"]
+    assert "boom" in results[2]
+    assert completions.peak == 2
+
+
+def test_tool_calling_many():
+    system, completions = batch_system()
+    tools = system.supervisor.get_tools()
+    name = tools[0]["function"]["name"]
+    tool_choice = {"type": "function", "function": {"name": name}}
+    messages_list = [[{"role": "user", "content": req}] for req in REQS]
+    results = asyncio.run(
+        system.llm.tool_calling_many(
+            "system", messages_list, tools, tool_choice, concurrency=3
+        )
+    )
+    reasoning = [r["arguments"]["reasoning"] for r in results if "error" not in r]
+    assert reasoning == ["r", "rr", "rrrr", "rrrrr", "rrrrrr"]
+    assert "boom" in results[2]["error"]
+    assert completions.peak == 3
+
+
+def test_process_req_many():
+    system, completions = batch_system()
+    results = asyncio.run(system.supervisor.process_req_many(REQS, concurrency=2))
+    statuses = [r["status"] for r in results]
+    assert statuses == ["in_progress"] * 2 + ["error"] + ["in_progress"] * 3
+    for req, result in zip(REQS, results):
+        if result["status"] != "error":
+            assert f"Given the task: {req}\n" in result["arguments"]["reasoning"]
+    assert completions.peak == 2
+    # 每个请求在独立会话中执行，不共享对话历史
+    assert not system.supervisor.messages
@@ -0,0 +1,35 @@
+import asyncio
+from benchmarks.orchestration import check_regressions, flatten, run_benchmarks
+
+
+def test_benchmarks_produce_every_metric():
+    report = asyncio.run(
+        run_benchmarks(
+            tasks=3,
+            messages=50,
+            memory_tasks=3,
+            subscriber_counts=[0, 2],
+            concurrency_levels=[1, 2],
+        )
+    )
+    metrics = flatten(report["results"])
+    for name in (
+        "task_overhead_ms.p95",
+        "workflow_overhead_ms.p50",
+        "publish_per_sec.sync.2",
+        "publish_per_sec.queued.0",
+        "memory_per_10k_tasks_kb",
+        "tasks_per_sec.2",
+    ):
+        assert name in metrics
+
+
+def test_regressions_respect_metric_direction():
+    baseline = {"results": {"task_overhead_ms": {"p50": 1.0}, "tasks_per_sec": {"1": 100}}}
+    current = {"results": {"task_overhead_ms": {"p50": 1.5}, "tasks_per_sec": {"1": 150}}}
+    assert check_regressions(current, baseline, tolerance=0.2) == [
+        "task_overhead_ms.p50: 1.500 > baseline 1.000"
+    ]
+    assert check_regressions(
+        current, thresholds={"tasks_per_sec.1": {"min": 200}}
+    ) == ["tasks_per_sec.1: 150.000 < min 200"]
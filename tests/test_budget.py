@@ -0,0 +1,234 @@
+import asyncio
+from typing import List
+from openai.types.chat import ChatCompletion
+from agent_system import AgentSystem
+from agent_system.budget import TenantBudgets, TokenBudget, reserve_tokens
+from agent_system.tokens import estimate_schema_tokens
+from tests.helpers import MESSAGES, mock_llm
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "small",
+            "parameters": {"type": "object", "properties": {"ok": {"type": "boolean"}}},
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "plan",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "steps": {
+                        "type": "array",
+                        "maxItems": 50,
+                        "items": {"type": "string", "maxLength": 200},
+                    }
+                },
+            },
+        },
+    },
+]
+
+
+def test_schema_estimate_grows_with_output_size():
+    small = estimate_schema_tokens(TOOLS[0]["function"]["parameters"])
+    large = estimate_schema_tokens(TOOLS[1]["function"]["parameters"])
+    assert small < 10
+    assert large > 50 * 120
+
+
+def test_max_tokens_follow_the_chosen_tool():
+    llm = mock_llm(max_output_tokens=4096)
+    assert llm.max_tokens_for() == llm.config.max_tokens
+    small = {"type": "function", "function": {"name": "small"}}
+    # 估算只会调高，不低于配置的 max_tokens
+    assert llm.max_tokens_for(TOOLS, small) == llm.config.max_tokens
+    assert llm.max_tokens_for(TOOLS) == 4096
+    llm.config.dynamic_max_tokens = False
+    assert llm.max_tokens_for(TOOLS, small) == llm.config.max_tokens
+
+
+def test_results_carry_usage():
+    llm = mock_llm()
+
+    async def run():
+        text = await llm.generate("system", MESSAGES)
+        data = await llm.tool_calling("system", MESSAGES, TOOLS[:1])
+        return text, data
+
+    text, data = asyncio.run(run())
+    assert text.usage["total_tokens"] > 0
+    assert data["usage"]["total_tokens"] > 0
+    assert data["usage"]["prompt_tokens"] + data["usage"]["completion_tokens"] == (
+        data["usage"]["total_tokens"]
+    )
+
+
+def test_reservations_are_all_or_nothing():
+    run, tenant = TokenBudget(100), TokenBudget(50, "tenant")
+    reservation = reserve_tokens([run, tenant], 40)
+    assert run.remaining == 60 and tenant.remaining == 10
+    try:
+        reserve_tokens([run, tenant], 20)
+        assert False, "expected TokenBudgetExceeded"
+    except Exception as e:
+        assert "tenant token budget exceeded" in str(e)
+    assert run.remaining == 60
+    reservation.settle({"total_tokens": 25})
+    assert (run.used, run.reserved, tenant.remaining) == (25, 0, 25)
+
+
+def test_run_usage_and_budget():
+    system = AgentSystem(llm=mock_llm())
+
+    async def run(budget=None):
+        with system.session() as session:
+            session.token_budget = budget
+            results = await system.process_task("生成月度销售报表")
+        return results, session
+
+    results, session = asyncio.run(run())
+    usage = session.info["token_usage"]
+    assert set(usage) == set(system.workflow)
+    assert all(u["calls"] == 1 and u["total_tokens"] > 0 for u in usage.values())
+
+    requests = system.llm.usage["requests"]
+    results, session = asyncio.run(run(TokenBudget(100)))
+    assert results["supervisor"]["status"] == "error"
+    assert "token budget exceeded" in results["supervisor"]["error"]
+    assert system.llm.usage["requests"] == requests
+    assert "token_usage" not in session.info
+
+
+def test_tenant_budget_spans_runs():
+    # 一次运行约用3400个token，但开发节点需要预留约5000个
+    budgets = TenantBudgets(default=9000)
+    system = AgentSystem(llm=mock_llm(), tenant_budgets=budgets)
+
+    async def run(tenant):
+        with system.session(tenant=tenant):
+            return await system.process_task("生成月度销售报表")
+
+    first = asyncio.run(run("acme"))
+    assert first["supervisor"]["status"] == "in_progress"
+    spent = budgets.get("acme").used
+    assert spent > 0
+
+    second = asyncio.run(run("acme"))
+    assert any(r.get("status") == "error" for r in second.values())
+    assert budgets.get("acme").used <= 9000
+    assert asyncio.run(run("other"))["supervisor"]["status"] == "in_progress"
+
+
+class TruncatingCompletions:
+    """max_tokens 小于 needed 时返回截断的工具调用参数"""
+
+    def __init__(self, needed: int):
+        self.needed = needed
+        self.max_tokens: List[int] = []
+
+    async def create(self, **params):
+        self.max_tokens.append(params["max_tokens"])
+        truncated = params["max_tokens"] < self.needed
+        arguments = '{"ok": true}'
+        return ChatCompletion.model_validate(
+            {
+                "id": "cmpl-test",
+                "object": "chat.completion",
+                "created": 0,
+                "model": params["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "length" if truncated else "tool_calls",
+                        "message": {
+                            "role": "assistant",
+                            "content": None,
+                            "tool_calls": [
+                                {
+                                    "id": "call_0",
+                                    "type": "function",
+                                    "function": {
+                                        "name": "small",
+                                        "arguments": arguments,
+                                    },
+                                }
+                            ],
+                        },
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 10,
+                    "completion_tokens": 5,
+                    "total_tokens": 15,
+                },
+            }
+        )
+
+
+def test_truncated_output_is_retried_then_rejected():
+    llm = mock_llm(max_output_tokens=4096)
+    fake = llm.client.chat.completions = TruncatingCompletions(needed=3000)
+    data = asyncio.run(llm.tool_calling("system", MESSAGES, TOOLS[:1]))
+    assert fake.max_tokens == [2000, 4096]
+    assert data["arguments"] == {"ok": True}
+    assert data["usage"]["total_tokens"] == 30
+
+    fake = llm.client.chat.completions = TruncatingCompletions(needed=10000)
+    data = asyncio.run(llm.tool_calling("system", MESSAGES, TOOLS[:1]))
+    assert "truncated" in data["error"]
+    assert "arguments" not in data
+
+
+def test_truncation_retry_reserves_extra_tokens():
+    llm = mock_llm(max_output_tokens=4096)
+    fake = llm.client.chat.completions = TruncatingCompletions(needed=3000)
+
+    def call(budget: TokenBudget):
+        reservation = reserve_tokens([budget], 2100)
+        data = asyncio.run(
+            llm.tool_calling(
+                "system", MESSAGES, TOOLS[:1], reserve=reservation.extend
+            )
+        )
+        reserved = budget.reserved
+        reservation.settle(data["usage"])
+        return data, reserved
+
+    # 预算不够重试：不发送重试请求，第一次调用的用量照常结算
+    tight = TokenBudget(3000)
+    data, reserved = call(tight)
+    assert fake.max_tokens == [2000]
+    assert "token budget" in data["error"]
+    assert reserved == 2100
+    assert (tight.used, tight.reserved) == (15, 0)
+
+    fake.max_tokens.clear()
+    roomy = TokenBudget(10000)
+    data, reserved = call(roomy)
+    assert fake.max_tokens == [2000, 4096]
+    assert reserved == 2100 + 4096 - 2000
+    assert (roomy.used, roomy.reserved) == (30, 0)
+
+
+def test_cached_and_coalesced_responses_are_not_billed():
+    llm = mock_llm(cache_enabled=True, cache_nondeterministic=True)
+
+    async def run():
+        first, coalesced = await asyncio.gather(
+            llm.tool_calling("system", MESSAGES, TOOLS[:1]),
+            llm.tool_calling("system", MESSAGES, TOOLS[:1]),
+        )
+        cached = await llm.tool_calling("system", MESSAGES, TOOLS[:1])
+        return first, coalesced, cached
+
+    first, coalesced, cached = asyncio.run(run())
+    assert llm.usage["requests"] == 1
+    assert first["usage"]["total_tokens"] > 0
+    # 只有实际发送请求的调用方计入用量
+    assert coalesced["usage"] is None
+    assert cached["usage"] is None
+    assert coalesced["arguments"] == cached["arguments"] == first["arguments"]
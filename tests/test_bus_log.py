@@ -0,0 +1,73 @@
+import asyncio
+from agent_system.bus_log import SegmentLog, SQLiteLog
+from agent_system.message_bus import MessageBus
+
+
+def publish_all(bus, messages):
+    async def main():
+        for topic, content in messages:
+            await bus.publish(topic, content, sender="test")
+
+    asyncio.run(main())
+
+
+def test_segment_log_replays_after_restart_and_compacts(tmp_path):
+    log = SegmentLog(str(tmp_path), segment_max_records=2, fsync_every=1)
+    publish_all(
+        MessageBus(log=log),
+        [("a", 0), ("b", 1), ("a", 2), ("a", 3), ("b", 4)],
+    )
+    log.close()
+
+    reopened = SegmentLog(str(tmp_path), segment_max_records=2)
+    assert reopened.next_offset == 5
+    assert [r["content"] for r in reopened.replay("a")] == [0, 2, 3]
+    assert [r["offset"] for r in reopened.replay(offset=3)] == [3, 4]
+
+    reopened.compact(before_offset=4)
+    assert [r["offset"] for r in reopened.replay()] == [4]
+    reopened.close()
+
+
+def test_sqlite_log_replay(tmp_path):
+    path = str(tmp_path / "bus.db")
+    log = SQLiteLog(path)
+    publish_all(MessageBus(log=log), [("a", {"x": 1}), ("b", 2), ("a", 3)])
+    log.close()
+
+    reopened = SQLiteLog(path)
+    assert [r["content"] for r in reopened.replay("a")] == [{"x": 1}, 3]
+    assert [r["offset"] for r in reopened.replay(offset=1)] == [1, 2]
+    reopened.compact(before_offset=2)
+    assert [r["offset"] for r in reopened.replay()] == [2]
+    reopened.close()
+
+
+def test_sqlite_log_offsets_survive_full_compaction(tmp_path):
+    path = str(tmp_path / "bus.db")
+    log = SQLiteLog(path)
+    publish_all(MessageBus(log=log), [("a", 1), ("a", 2)])
+    log.compact(before_offset=log.next_offset)
+    log.close()
+
+    reopened = SQLiteLog(path)
+    assert list(reopened.replay()) == []
+    # 表已清空，偏移量仍从压缩前的位置继续
+    assert reopened.next_offset == 2
+    publish_all(MessageBus(log=reopened), [("a", 3)])
+    assert [r["offset"] for r in reopened.replay()] == [2]
+    reopened.close()
+
+
+def test_segment_log_recovers_from_torn_write(tmp_path):
+    log = SegmentLog(str(tmp_path), fsync_every=1)
+    publish_all(MessageBus(log=log), [("a", 0)])
+    log.close()
+    segment = next(tmp_path.iterdir())
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write('{"offset": 1, "topic"')
+
+    reopened = SegmentLog(str(tmp_path), fsync_every=1)
+    publish_all(MessageBus(log=reopened), [("a", 1)])
+    assert [r["content"] for r in reopened.replay("a")] == [0, 1]
+    reopened.close()
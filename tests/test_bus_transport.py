@@ -0,0 +1,192 @@
+import asyncio
+import multiprocessing
+import os
+from agent_system.bus_transport import (
+    FRAME_SUBSCRIBE,
+    BusBroker,
+    RemoteMessageBus,
+    encode_frame,
+    encode_publish,
+)
+from tests.helpers import socket_path
+
+
+def test_remote_buses_share_topics():
+    path = socket_path()
+
+    async def main():
+        broker = BusBroker(path)
+        await broker.start()
+        received = []
+
+        async def handler(message):
+            received.append((message["sender"], message["content"]))
+
+        async with RemoteMessageBus(path) as worker_a, RemoteMessageBus(
+            path
+        ) as worker_b:
+            worker_b.subscribe("supervisor_result", handler)
+            await asyncio.sleep(0.05)
+            await worker_a.publish("supervisor_result", {"plan": [1]}, sender="a")
+            await worker_a.publish("other", {"ignored": True}, sender="a")
+            await asyncio.sleep(0.05)
+            history = worker_b.get_message_history("supervisor_result")
+        await broker.aclose()
+        return received, history, broker.forwarded
+
+    received, history, forwarded = asyncio.run(main())
+    assert received == [("a", {"plan": [1]})]
+    assert len(history) == 1
+    assert forwarded == 1
+
+
+def _publisher(path):
+    async def main():
+        async with RemoteMessageBus(path) as bus:
+            await bus.publish("topic", {"pid": os.getpid()}, sender="child")
+
+    asyncio.run(main())
+
+
+def test_delivery_across_processes():
+    path = socket_path()
+
+    async def main():
+        broker = BusBroker(path)
+        await broker.start()
+        got = asyncio.Event()
+        messages = []
+
+        async def handler(message):
+            messages.append(message["content"])
+            got.set()
+
+        async with RemoteMessageBus(path) as bus:
+            bus.subscribe("topic", handler)
+            await asyncio.sleep(0.05)
+            process = multiprocessing.get_context("spawn").Process(
+                target=_publisher, args=(path,)
+            )
+            process.start()
+            await asyncio.wait_for(got.wait(), timeout=20)
+            process.join()
+        await broker.aclose()
+        return messages, process.pid
+
+    messages, pid = asyncio.run(main())
+    assert messages == [{"pid": pid}]
+
+
+def test_subscriber_error_does_not_stop_receiver():
+    path = socket_path()
+
+    async def main():
+        broker = BusBroker(path)
+        await broker.start()
+        received = []
+
+        async def failing(message):
+            raise RuntimeError("boom")
+
+        async def handler(message):
+            received.append(message["content"])
+
+        async with RemoteMessageBus(path) as worker_a, RemoteMessageBus(
+            path
+        ) as worker_b:
+            worker_b.subscribe("bad", failing)
+            worker_b.subscribe("good", handler)
+            await asyncio.sleep(0.05)
+            await worker_a.publish("bad", {"n": 1}, sender="a")
+            await worker_a.publish("good", {"n": 2}, sender="a")
+            await asyncio.sleep(0.05)
+            errors = worker_b.errors
+        await broker.aclose()
+        return received, errors
+
+    received, errors = asyncio.run(main())
+    assert received == [{"n": 2}]
+    assert errors == 1
+
+
+def test_broker_drops_for_slow_subscriber():
+    path = socket_path()
+
+    async def main():
+        broker = BusBroker(path, buffer_size=2)
+        await broker.start()
+        # 订阅后从不读取的连接
+        _, slow = await asyncio.open_unix_connection(path)
+        slow.write(encode_frame(FRAME_SUBSCRIBE, "topic"))
+        await slow.drain()
+        await asyncio.sleep(0.05)
+        async with RemoteMessageBus(path) as bus:
+            for i in range(50):
+                await bus.publish("topic", {"data": "x" * 256 * 1024}, sender="a")
+            await asyncio.sleep(0.1)
+        slow.close()
+        await broker.aclose()
+        return broker
+
+    broker = asyncio.run(main())
+    assert broker.dropped > 0
+    assert broker.forwarded + broker.dropped == 50
+
+
+class _BrokenWriter:
+    async def drain(self):
+        raise ConnectionResetError("broker gone")
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_publish_delivers_locally_when_broker_is_gone():
+    bus = RemoteMessageBus(socket_path())
+    received = []
+
+    async def handler(message):
+        received.append(message["content"])
+
+    async def main():
+        bus.subscribe("topic", handler)
+        bus._writer = _BrokenWriter()
+        await bus.publish("topic", 1, sender="a")
+        await bus.publish("topic", 2, sender="a")
+        await bus.aclose()
+
+    asyncio.run(main())
+    assert received == [1, 2]
+    assert not bus.connected
+    assert bus.remote_dropped == 2
+
+
+def test_remote_messages_are_stamped_on_receipt():
+    path = socket_path()
+
+    async def main():
+        broker = BusBroker(path)
+        await broker.start()
+        async with RemoteMessageBus(path) as bus:
+            bus.subscribe("topic", lambda message: asyncio.sleep(0))
+            await asyncio.sleep(0.05)
+            await bus.publish("topic", "local", sender="b")
+            # 另一个进程的时钟可能远小于本地时钟
+            _, writer = await asyncio.open_unix_connection(path)
+            envelope = {"content": "remote", "sender": "a", "timestamp": 0.0}
+            writer.write(encode_publish("topic", envelope))
+            await writer.drain()
+            await asyncio.sleep(0.05)
+            writer.close()
+            history = bus.get_message_history("topic")
+            after_local = bus.get_message_history("topic", start=history[0].timestamp)
+        await broker.aclose()
+        return history, after_local
+
+    history, after_local = asyncio.run(main())
+    assert [m["content"] for m in history] == ["local", "remote"]
+    assert history[0]["timestamp"] <= history[1]["timestamp"]
+    assert [m["content"] for m in after_local] == ["local", "remote"]
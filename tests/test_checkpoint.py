@@ -0,0 +1,90 @@
+import asyncio
+import os
+import pytest
+from agent_system import AgentSystem
+from agent_system.budget import TenantBudgets
+from agent_system.checkpoint import CheckpointStore
+from tests.helpers import make_system, mock_llm
+
+
+def test_store_skips_incomplete_results(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.start("run-1", "task")
+    assert store.save_node("run-1", "supervisor", {"status": "completed"})
+    assert not store.save_node("run-1", "developer", {"status": "error"})
+    assert store.load_results("run-1") == {"supervisor": {"status": "completed"}}
+    assert store.get_run("run-1")["status"] == "running"
+    assert not [n for n in os.listdir(tmp_path / "run-1" / "nodes") if n.endswith(".tmp")]
+
+
+def test_resume_continues_from_first_incomplete_node(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    system = make_system(checkpoints=store)
+    fake = system.llm.client.chat.completions
+    process_req = system.data_developer.process_req
+
+    async def crash(req):
+        raise RuntimeError("worker died")
+
+    system.data_developer.process_req = crash
+
+    async def run():
+        with system.session("run-1"):
+            return await system.execute_workflow("生成月度销售报表")
+
+    first = asyncio.run(run())
+    assert first["data_developer"]["status"] == "error"
+    assert store.get_run("run-1")["status"] == "failed"
+    assert set(store.load_results("run-1")) == set(system.workflow) - {"data_developer"}
+
+    system.data_developer.process_req = process_req
+    calls = fake.calls
+    resumed = asyncio.run(system.resume("run-1"))
+    assert resumed["data_developer"]["status"] == "in_progress"
+    assert resumed["supervisor"] == first["supervisor"]
+    assert fake.calls == calls + 1
+    assert store.get_run("run-1")["status"] == "completed"
+
+
+def test_run_id_must_be_plain_name(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints"))
+    for run_id in ("../escape", "a/b", "", ".."):
+        with pytest.raises(ValueError):
+            store.start(run_id, "task")
+    assert not os.path.exists(tmp_path / "escape")
+
+
+def test_new_run_clears_stale_nodes(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.start("run-1", "old task")
+    store.save_node("run-1", "supervisor", {"status": "completed"})
+    store.start("run-1", "new task")
+    assert store.load_results("run-1") == {}
+    store.save_node("run-1", "supervisor", {"status": "completed"})
+    store.start("run-1", "new task", resume=True)
+    assert set(store.load_results("run-1")) == {"supervisor"}
+
+
+def test_resume_charges_original_tenant(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    budgets = TenantBudgets(default=10**6)
+    system = AgentSystem(llm=mock_llm(), checkpoints=store, tenant_budgets=budgets)
+    process_req = system.data_developer.process_req
+
+    async def crash(req):
+        raise RuntimeError("worker died")
+
+    system.data_developer.process_req = crash
+
+    async def run():
+        with system.session("run-1", tenant="acme"):
+            return await system.execute_workflow("生成月度销售报表")
+
+    asyncio.run(run())
+    assert store.get_run("run-1")["tenant"] == "acme"
+    spent = budgets.get("acme").used
+
+    system.data_developer.process_req = process_req
+    resumed = asyncio.run(system.resume("run-1"))
+    assert resumed["data_developer"]["status"] == "in_progress"
+    assert budgets.get("acme").used > spent
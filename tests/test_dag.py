@@ -0,0 +1,79 @@
+import asyncio
+import time
+import pytest
+from agent_system.dag import DAGExecutor, WorkflowError, topological_order
+
+WORKFLOW = {
+    "supervisor": {"next": ["metadata_steward", "data_calibration"], "wait_for": []},
+    "metadata_steward": {"next": ["data_developer"], "wait_for": ["supervisor"]},
+    "data_calibration": {"next": ["data_developer"], "wait_for": ["supervisor"]},
+    "data_developer": {
+        "next": [],
+        "wait_for": ["metadata_steward", "data_calibration"],
+    },
+}
+
+
+def test_cycle_and_unknown_nodes_are_rejected():
+    with pytest.raises(WorkflowError, match="cycle"):
+        topological_order({"a": {"next": ["b"]}, "b": {"next": ["a"]}})
+    with pytest.raises(WorkflowError, match="unknown"):
+        topological_order({"a": {"wait_for": ["missing"]}})
+    assert topological_order(WORKFLOW)[0] == "supervisor"
+    assert topological_order(WORKFLOW)[-1] == "data_developer"
+
+
+def test_ready_nodes_run_concurrently_with_upstream_results():
+    seen = {}
+
+    async def run_node(node, upstream):
+        seen[node] = sorted(upstream)
+        await asyncio.sleep(0.05)
+        return node.upper()
+
+    start = time.monotonic()
+    results = asyncio.run(DAGExecutor(WORKFLOW).run(run_node))
+    elapsed = time.monotonic() - start
+
+    assert results["data_developer"] == "DATA_DEVELOPER"
+    assert seen["data_developer"] == ["data_calibration", "metadata_steward"]
+    assert seen["supervisor"] == []
+    # 关键路径为3个节点
+    assert elapsed < 0.18
+
+
+def test_failed_node_skips_downstream_and_completed_nodes_are_reused():
+    calls = []
+
+    async def run_node(node, upstream):
+        calls.append(node)
+        if node == "data_calibration":
+            raise RuntimeError("boom")
+        return node
+
+    results = asyncio.run(
+        DAGExecutor(WORKFLOW).run(run_node, completed={"supervisor": "cached"})
+    )
+    assert "supervisor" not in calls
+    assert results["data_calibration"]["status"] == "error"
+    assert results["data_developer"]["status"] == "skipped"
+    assert results["metadata_steward"] == "metadata_steward"
+
+
+def test_node_concurrency_limit():
+    executor = DAGExecutor({"only": {"next": [], "wait_for": []}}, {"only": 1})
+    running = 0
+    peak = 0
+
+    async def run_node(node, upstream):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def run():
+        await asyncio.gather(*(executor.run(run_node) for _ in range(3)))
+
+    asyncio.run(run())
+    assert peak == 1
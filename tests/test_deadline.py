@@ -0,0 +1,80 @@
+import asyncio
+import time
+from agent_system.deadline import (
+    DeadlineExceeded,
+    deadline_scope,
+    remaining_time,
+    with_deadline,
+)
+from tests.helpers import FakeCompletions, make_system
+
+
+class HangingCompletions(FakeCompletions):
+    """第一个请求正常返回，之后的请求一直挂起"""
+
+    def __init__(self):
+        super().__init__()
+        self.timeouts = []
+        self.cancelled = 0
+
+    async def create(self, **params):
+        self.timeouts.append(params.pop("timeout", None))
+        if self.calls >= 1:
+            self.calls += 1
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return await super().create(**params)
+
+
+def test_nested_scope_cannot_extend_deadline():
+    assert remaining_time() is None
+    with deadline_scope(1.0):
+        with deadline_scope(10.0):
+            assert remaining_time() <= 1.0
+        with deadline_scope(0.1):
+            assert remaining_time() <= 0.1
+        assert remaining_time(cap=0.5) <= 0.5
+
+
+def test_with_deadline_cancels_awaitable():
+    async def run():
+        with deadline_scope(0.05):
+            await with_deadline(asyncio.sleep(60))
+
+    start = time.monotonic()
+    try:
+        asyncio.run(run())
+    except DeadlineExceeded:
+        pass
+    else:
+        raise AssertionError("expected DeadlineExceeded")
+    assert time.monotonic() - start < 1
+
+
+def test_process_task_returns_partial_results_on_deadline():
+    system = make_system(task_timeout=0.3)
+    fake = system.llm.client.chat.completions = HangingCompletions()
+
+    start = time.monotonic()
+    results = asyncio.run(system.process_task("生成月度销售报表"))
+    assert time.monotonic() - start < 2
+
+    assert results["supervisor"]["status"] == "in_progress"
+    for role in ("metadata_steward", "data_calibration", "data_developer"):
+        assert results[role]["status"] == "timeout"
+    # 挂起的请求被取消，每次请求都带有按剩余时间计算的超时
+    assert fake.cancelled == 2
+    assert all(t is not None and t <= 0.3 for t in fake.timeouts)
+
+
+def test_workflow_node_timeout():
+    system = make_system(node_timeout=0.1)
+    system.llm.client.chat.completions = HangingCompletions()
+
+    results = asyncio.run(system.execute_workflow("生成月度销售报表"))
+    assert results["supervisor"]["status"] == "in_progress"
+    assert results["metadata_steward"]["status"] == "timeout"
+    assert results["data_calibration"]["status"] == "timeout"
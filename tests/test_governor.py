@@ -0,0 +1,116 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from agent_system.governor import AdaptiveLimiter, RateGovernor, TokenBucket
+
+
+def rate_limit_error(retry_after: str) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.deepseek.com/v1/chat/completions")
+    response = httpx.Response(
+        429, headers={"retry-after": retry_after}, request=request
+    )
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_retries_rate_limited_requests():
+    governor = RateGovernor(max_retries=2, backoff_base=0.001)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise rate_limit_error("0")
+        return "ok"
+
+    assert asyncio.run(governor.run(flaky)) == "ok"
+    stats = governor.stats()
+    assert stats["retries"] == 2
+    assert stats["throttled"] == 2
+    assert stats["concurrency_limit"] < 16
+
+
+def test_gives_up_after_max_retries_and_on_client_errors():
+    governor = RateGovernor(max_retries=1, backoff_base=0.001)
+
+    async def always_limited():
+        raise rate_limit_error("0")
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(governor.run(always_limited))
+
+    calls = []
+
+    async def bad_request():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(governor.run(bad_request))
+    assert len(calls) == 1
+
+
+def test_limiter_caps_concurrency():
+    limiter = AdaptiveLimiter(max_limit=2)
+    peak = 0
+
+    async def worker():
+        nonlocal peak
+        await limiter.acquire()
+        peak = max(peak, limiter.in_flight)
+        await asyncio.sleep(0.005)
+        await limiter.release(0.005)
+
+    async def run():
+        await asyncio.gather(*(worker() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_token_bucket_waits_when_empty():
+    bucket = TokenBucket(rate_per_minute=6000, capacity=1)
+
+    async def run():
+        await bucket.acquire()
+        await bucket.acquire()
+
+    asyncio.run(run())
+    assert bucket.waited > 0
+
+
+def test_concurrent_overloads_decrease_limit_once():
+    governor = RateGovernor(max_concurrency=16, max_retries=0)
+    started = asyncio.Event()
+    waiting = 0
+
+    async def limited():
+        nonlocal waiting
+        waiting += 1
+        if waiting == 8:
+            started.set()
+        await started.wait()
+        raise rate_limit_error("0")
+
+    async def run():
+        await asyncio.gather(
+            *(governor.run(limited) for _ in range(8)), return_exceptions=True
+        )
+
+    asyncio.run(run())
+    assert governor.limiter.limit == 8
+
+
+def test_cancelled_request_does_not_change_limit():
+    governor = RateGovernor(max_concurrency=16)
+    governor.limiter.limit = 4.0
+
+    async def run():
+        task = asyncio.create_task(governor.run(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert governor.limiter.limit == 4.0
+    assert governor.limiter.in_flight == 0
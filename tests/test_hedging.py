@@ -0,0 +1,92 @@
+import asyncio
+from agent_system.config import LLMConfig
+from agent_system.hedging import Hedger, LatencyHistogram
+from agent_system.llm import DeepSeekLLM
+from tests.helpers import make_completion
+
+
+def test_histogram_percentile():
+    histogram = LatencyHistogram(window=100)
+    for i in range(1, 101):
+        histogram.record(i / 100)
+    assert histogram.percentile(0.5) == 0.5
+    assert histogram.percentile(0.95) == 0.95
+
+
+def test_slow_request_is_hedged_and_loser_cancelled():
+    hedger = Hedger(percentile=0.9, max_ratio=1.0, min_samples=5)
+    delays = iter([0.001] * 5 + [5.0, 0.001])
+    cancelled = []
+
+    async def call():
+        delay = next(delays)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    async def run():
+        for _ in range(5):
+            await hedger.run("m:generate", call)
+        return await asyncio.wait_for(hedger.run("m:generate", call), 1)
+
+    assert asyncio.run(run()) == 0.001
+    assert cancelled == [5.0]
+    assert hedger.stats()["hedged"] == 1
+    assert hedger.stats()["hedge_wins"] == 1
+
+
+def test_hedges_are_capped_by_ratio():
+    hedger = Hedger(percentile=0.5, max_ratio=0.1, min_samples=1)
+    hedger.histogram("k").record(0.0)
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.002)
+        return "ok"
+
+    async def run():
+        await asyncio.gather(*(hedger.run("k", call) for _ in range(20)))
+
+    asyncio.run(run())
+    assert hedger.hedged == 2
+    assert calls == 22
+
+
+def test_llm_hedges_per_tool():
+    llm = DeepSeekLLM(
+        LLMConfig(
+            api_key="test",
+            hedge_enabled=True,
+            hedge_max_ratio=1.0,
+            hedge_min_samples=1,
+            singleflight_enabled=False,
+        )
+    )
+
+    class SlowOnce:
+        calls = 0
+
+        async def create(self, **params):
+            self.calls += 1
+            if self.calls == 2:
+                await asyncio.sleep(5)
+            else:
+                await asyncio.sleep(0.01)
+            return make_completion('{"ok": true}')
+
+    llm.client.chat.completions = SlowOnce()
+
+    async def run():
+        await llm.generate("sys", [{"role": "user", "content": "a"}])
+        return await asyncio.wait_for(
+            llm.generate("sys", [{"role": "user", "content": "b"}]), 1
+        )
+
+    assert asyncio.run(run()) == '{"ok": true}'
+    assert set(llm.hedger.histograms) == {f"{llm.model}:generate"}
+    assert llm.hedger.hedge_wins == 1
@@ -0,0 +1,64 @@
+from agent_system.config import HistoryPolicy
+from agent_system.history import apply_history_policy, compact_result
+from agent_system.tokens import estimate_message_tokens
+
+
+def conversation(turns: int):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"question {i} " + "x" * 200})
+        messages.append({"role": "assistant", "content": f"answer {i}"})
+    messages.append({"role": "user", "content": "latest"})
+    return messages
+
+
+def test_no_policy_sends_full_history():
+    messages = conversation(3)
+    window, full, sent = apply_history_policy(messages, HistoryPolicy())
+    assert window is messages
+    assert full == sent
+
+
+def test_turn_window_with_summary():
+    messages = conversation(5)
+    window, full, sent = apply_history_policy(
+        messages, HistoryPolicy(max_turns=2, summary_max_chars=20)
+    )
+    assert window[0]["sender"] == "history_summary"
+    assert "question 0" in window[0]["content"]
+    assert [m["content"] for m in window[1:]][-1] == "latest"
+    assert window[1]["content"].startswith("question 4")
+    assert sent < full
+
+
+def test_token_budget_always_keeps_latest_turn():
+    messages = conversation(5)
+    window, _, _ = apply_history_policy(
+        messages, HistoryPolicy(max_tokens=1, summarize=False)
+    )
+    assert window == [{"role": "user", "content": "latest"}]
+
+
+def test_summary_counts_against_token_budget():
+    messages = []
+    for i in range(500):
+        messages.append({"role": "user", "content": f"q{i} " + "x" * 300})
+        messages.append({"role": "assistant", "content": f"a{i} " + "y" * 300})
+    window, full, sent = apply_history_policy(messages, HistoryPolicy(max_tokens=1000))
+    assert window[0]["sender"] == "history_summary"
+    assert sent <= 1000 < full
+    # 放不下时丢弃最旧的摘要行，保留最近的
+    assert "q0 " not in window[0]["content"]
+
+    window, _, sent = apply_history_policy(
+        messages, HistoryPolicy(max_turns=2, summary_max_tokens=300)
+    )
+    summary_tokens = sent - estimate_message_tokens(window[1:])
+    assert summary_tokens <= 300
+
+
+def test_compact_result_drops_debug_fields():
+    text = compact_result(
+        {"status": "error", "error": "失败", "stack_trace": "Traceback..."}
+    )
+    assert text == '{"status":"error","error":"失败"}'
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from agent_system.config import LLMConfig
+from agent_system.llm import DeepSeekLLM
+
+
+def test_clients_share_pool_until_last_close():
+    config = LLMConfig(api_key="test", http_max_connections=7)
+    first = DeepSeekLLM(config)
+    second = DeepSeekLLM(config)
+    other = DeepSeekLLM(LLMConfig(api_key="test", http_max_connections=3))
+    shared = first.http_client
+    assert second.http_client is shared
+    assert other.http_client is not shared
+
+    async def run():
+        await first.aclose()
+        assert not shared.is_closed
+        async with second:
+            pass
+        await other.aclose()
+
+    asyncio.run(run())
+    assert shared.is_closed
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_shared_client_works_across_event_loops():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    # 在事件循环外创建，两个客户端共享同一个连接池
+    config = LLMConfig(api_key="test", http_max_connections=5)
+    first, second = DeepSeekLLM(config), DeepSeekLLM(config)
+    assert first.http_client is second.http_client
+
+    async def fetch(llm):
+        # 保持连接的连接池在上一个循环关闭后不能复用
+        return (await llm.http_client.get(url)).status_code
+
+    try:
+        assert asyncio.run(fetch(first)) == 200
+        assert asyncio.run(fetch(second)) == 200
+    finally:
+        server.shutdown()
+
+    async def close():
+        await first.aclose()
+        await second.aclose()
+
+    shared = first.http_client
+    asyncio.run(close())
+    assert shared.is_closed
@@ -0,0 +1,35 @@
+import asyncio
+import json
+from benchmarks.loadgen import read_requirements, run_load
+from agent_system.session import current_session
+
+
+def test_read_requirements_accepts_strings_and_objects(tmp_path):
+    path = tmp_path / "reqs.jsonl"
+    path.write_text('{"requirement": "a"}\n\n"b"\n{"task": "c"}\n', encoding="utf-8")
+    assert read_requirements(str(path)) == ["a", "b", "c"]
+
+
+async def fake_target(req: str):
+    await asyncio.sleep(0.01)
+    current_session().info["agent_latency"] = {"supervisor": 0.01}
+    status = "error" if req == "bad" else "in_progress"
+    return {"supervisor": {"status": status}}
+
+
+def test_closed_loop_cycles_requirements():
+    stats = asyncio.run(
+        run_load(fake_target, ["ok", "bad"], requests=10, concurrency=3)
+    )
+    report = stats.report(1.0, {"total_tokens": 100})
+    assert report["requests"] == 10
+    assert report["error_rate"] == 0.5
+    assert report["agents"]["supervisor"]["error_rate"] == 0.5
+    assert report["latency_ms"]["p50"] >= 10
+    assert report["tokens_per_request"] == 10
+    json.dumps(report)
+
+
+def test_open_loop_follows_rate():
+    stats = asyncio.run(run_load(fake_target, ["ok"], duration=0.25, rate=40))
+    assert 8 <= stats.completed <= 12
@@ -0,0 +1,115 @@
+import asyncio
+from agent_system.message_bus import Envelope, MessageBus, MessageHistory
+from agent_system.session import RunSession, current_session
+
+
+def test_queued_publish_does_not_wait_for_slow_subscriber():
+    bus = MessageBus(delivery="queued")
+    received = []
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def slow(message):
+            await gate.wait()
+            received.append(message["content"])
+
+        bus.subscribe("topic", slow)
+        await asyncio.wait_for(bus.publish("topic", {"n": 1}), timeout=0.1)
+        assert received == []
+        assert bus.get_subscriber_stats()[0]["lag"] == 1
+        gate.set()
+        await bus.drain()
+        await bus.aclose()
+
+    asyncio.run(main())
+    assert received == [{"n": 1}]
+
+
+def test_overflow_policies():
+    async def run(overflow):
+        bus = MessageBus(delivery="queued", queue_size=2, overflow=overflow)
+        received = []
+        gate = asyncio.Event()
+
+        async def slow(message):
+            await gate.wait()
+            received.append(message["content"])
+
+        bus.subscribe("topic", slow)
+        await bus.publish("topic", 0)
+        await asyncio.sleep(0)  # 第一条消息进入处理中
+        for n in range(1, 5):
+            await bus.publish("topic", n)
+        gate.set()
+        await bus.drain()
+        stats = bus.get_subscriber_stats()[0]
+        await bus.aclose()
+        return received, stats["dropped"]
+
+    assert asyncio.run(run("drop_oldest")) == ([0, 3, 4], 2)
+    assert asyncio.run(run("drop_newest")) == ([0, 1, 2], 2)
+
+
+def test_queued_delivery_keeps_publisher_session():
+    bus = MessageBus(delivery="queued")
+    seen = []
+
+    async def handler(message):
+        seen.append(current_session())
+
+    bus.subscribe("topic", handler)
+
+    async def main():
+        with RunSession() as session:
+            await bus.publish("topic", {})
+        await bus.drain()
+        await bus.aclose()
+        return session
+
+    session = asyncio.run(main())
+    assert seen == [session]
+
+
+def test_history_is_bounded_and_indexed_by_topic():
+    bus = MessageBus(history_capacity=3)
+
+    async def main():
+        for n in range(5):
+            await bus.publish("even" if n % 2 == 0 else "odd", n, sender="test")
+
+    asyncio.run(main())
+    assert [m["content"] for m in bus.get_message_history()] == [2, 3, 4]
+    assert [m["content"] for m in bus.get_message_history("even")] == [2, 4]
+    assert bus.history.evicted == 2
+
+    middle = bus.get_message_history()[1]["timestamp"]
+    assert [m["content"] for m in bus.get_message_history(start=middle)] == [3, 4]
+    assert [m["content"] for m in bus.get_message_history("even", end=middle)] == [2]
+
+
+def test_history_query_after_many_evictions():
+    history = MessageHistory(capacity=10)
+    for n in range(1000):
+        history.append(Envelope("even" if n % 2 == 0 else "odd", n, "test", n))
+    assert [m["content"] for m in history.query()] == list(range(990, 1000))
+    assert [m["content"] for m in history.query("odd", start=994)] == [995, 997, 999]
+    assert [m["content"] for m in history.query(start=992, end=995)] == [992, 993, 994]
+    assert history.query("missing") == []
+    assert len(history) == 10
+
+
+def test_envelope_behaves_like_the_old_dict():
+    bus = MessageBus()
+    context = {}
+
+    async def handler(message):
+        context.update(message)
+
+    bus.subscribe("topic", handler)
+    asyncio.run(bus.publish("topic", {"a": 1}, sender="me"))
+    assert context["content"] == {"a": 1}
+    assert context["sender"] == "me"
+    envelope = bus.get_message_history()[0]
+    assert envelope == envelope.to_dict()
+    assert not hasattr(envelope, "__dict__")
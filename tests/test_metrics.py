@@ -0,0 +1,150 @@
+import asyncio
+from agent_system.metrics import REGISTRY, MetricsRegistry, MetricsServer
+from agent_system.bus_transport import BusBroker, RemoteMessageBus
+from tests.helpers import (
+    StreamingCompletions,
+    make_supervisor,
+    make_system,
+    socket_path,
+)
+
+
+def test_registry_renders_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests", "Requests", ["route"])
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    registry.gauge("depth", "Depth", ["topic"], collect=lambda: {("x",): 4})
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
+    assert "latency_seconds_sum 0.55" in text
+    assert 'depth{topic="x"} 4' in text
+    assert registry.counter("requests", "Requests", ["route"]) is requests
+
+
+def test_rendered_samples_match_their_type_lines():
+    registry = MetricsRegistry()
+    registry.counter("requests", "Requests", ["route"]).inc(route="/a")
+    registry.histogram("latency_seconds", "Latency").observe(0.2)
+    registry.gauge("depth", "Depth").set(3)
+
+    types, samples = {}, []
+    for line in registry.render().splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split()
+            types[name] = kind
+        elif not line.startswith("#"):
+            samples.append(line.split("{")[0].split()[0])
+    assert types == {
+        "requests_total": "counter",
+        "latency_seconds": "histogram",
+        "depth": "gauge",
+    }
+    for sample in samples:
+        family = sample
+        if types.get(sample) is None:
+            for suffix in ("_bucket", "_sum", "_count"):
+                if sample.endswith(suffix):
+                    family = sample[: -len(suffix)]
+        assert family in types, sample
+        if family != sample:
+            assert types[family] == "histogram"
+
+
+def test_agent_system_records_metrics():
+    llm_requests = REGISTRY.get("agent_llm_requests")
+    results = REGISTRY.get("agent_results")
+    latency = REGISTRY.get("agent_process_duration_seconds")
+    before = {
+        "requests": llm_requests.value(
+            role="supervisor", model="deepseek-chat", outcome="success"
+        ),
+        "results": results.value(
+            role="supervisor", source="tool_call", status="success"
+        ),
+        "latency": latency.count(role="supervisor"),
+    }
+
+    system = make_system()
+    asyncio.run(system.process_task("生成月度销售报表"))
+
+    assert (
+        llm_requests.value(role="supervisor", model="deepseek-chat", outcome="success")
+        == before["requests"] + 1
+    )
+    assert (
+        results.value(role="supervisor", source="tool_call", status="success")
+        == before["results"] + 1
+    )
+    assert latency.count(role="supervisor") == before["latency"] + 1
+    assert REGISTRY.get("agent_active_runs").value() == 0
+
+
+def test_metrics_server_serves_registry():
+    registry = MetricsRegistry()
+    registry.counter("pings", "Pings").inc()
+
+    async def fetch(path: str) -> str:
+        server = MetricsServer(registry, port=0)
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+            await writer.drain()
+            response = (await reader.read()).decode()
+            writer.close()
+            return response
+        finally:
+            await server.aclose()
+
+    response = asyncio.run(fetch("/metrics"))
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert "pings_total 1" in response
+    assert asyncio.run(fetch("/other")).startswith("HTTP/1.1 404")
+
+
+def test_streamed_request_records_metrics():
+    supervisor = make_supervisor(StreamingCompletions())
+    llm_requests = REGISTRY.get("agent_llm_requests")
+    latency = REGISTRY.get("agent_llm_request_duration_seconds")
+    tokens = REGISTRY.get("agent_llm_tokens")
+    labels = {"role": "supervisor", "model": "deepseek-chat"}
+    before = (
+        llm_requests.value(outcome="success", **labels),
+        latency.count(**labels),
+        tokens.value(direction="out", **labels),
+    )
+
+    async def run():
+        async for _ in supervisor.stream_plan("生成报表"):
+            pass
+
+    asyncio.run(run())
+    assert llm_requests.value(outcome="success", **labels) == before[0] + 1
+    assert latency.count(**labels) == before[1] + 1
+    # 流式请求的token按发起请求的Agent角色统计
+    assert tokens.value(direction="out", **labels) == before[2] + 50
+
+
+def test_remote_publish_counts_messages():
+    path = socket_path()
+    published = REGISTRY.get("agent_bus_published")
+    before = published.value(topic="remote_topic")
+
+    async def run():
+        broker = BusBroker(path)
+        await broker.start()
+        async with RemoteMessageBus(path) as bus:
+            await bus.publish("remote_topic", {}, sender="a")
+        await broker.aclose()
+
+    asyncio.run(run())
+    assert published.value(topic="remote_topic") == before + 1
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import random
+from agent_system import AgentSystem
+from agent_system.config import LLMConfig
+from agent_system.llm import DeepSeekLLM
+from agent_system.mock_server import (
+    MockLLMBackend,
+    MockLLMServer,
+    MockTransport,
+    example_from_schema,
+    parse_latency,
+)
+from tests.helpers import MESSAGES, mock_llm
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency("0.5")(rng) == 0.5
+    assert 0.2 <= parse_latency("uniform:0.2,1.0")(rng) <= 1.0
+    assert parse_latency("lognormal:1.5,0.6")(rng) > 0
+
+
+def test_example_follows_schema():
+    schema = {
+        "type": "object",
+        "properties": {
+            "plan": {"type": "array", "items": {"$ref": "#/$defs/Step"}},
+            "kind": {"enum": ["etl", "report"]},
+        },
+        "$defs": {"Step": {"type": "object", "properties": {"step": {"type": "integer"}}}},
+    }
+    assert example_from_schema(schema) == {"plan": [{"step": 1}], "kind": "etl"}
+
+
+def test_workflow_runs_against_mock_transport():
+    system = AgentSystem(llm=mock_llm())
+
+    async def run():
+        async with system:
+            return await system.execute_workflow("生成月度销售报表")
+
+    results = asyncio.run(run())
+    assert results["supervisor"]["status"] == "in_progress"
+    assert results["supervisor"]["tool_name"] == "create_supervisor_execution_plan"
+    assert results["data_developer"]["status"] == "in_progress"
+
+
+def test_mock_errors_are_retried():
+    llm = mock_llm(retry_backoff_base=0.001)
+    llm.http_client._transport.backend.error_rate = 0.5
+    llm.http_client._transport.backend.rng.seed(1)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(llm.generate("sys", MESSAGES) for _ in range(5)))
+        finally:
+            await llm.aclose()
+
+    assert all(json.loads(r) == {"reasoning": "mock response"} for r in asyncio.run(run()))
+    assert llm.governor.retries > 0
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    backend = MockLLMBackend()
+
+    async def call(mode, transport):
+        llm = DeepSeekLLM(
+            LLMConfig(
+                api_key="test",
+                api_base="http://mock.local/v1",
+                cassette_path=path,
+                cassette_mode=mode,
+                max_retries=0,
+            ),
+            transport=transport,
+        )
+        try:
+            return await llm.generate("sys", MESSAGES), llm.http_client._transport
+        finally:
+            await llm.aclose()
+
+    recorded, transport = asyncio.run(call("record", MockTransport(backend)))
+    assert transport.stats()["recorded"] == 1
+
+    # 回放不需要真实后端
+    replayed, transport = asyncio.run(call("replay", None))
+    assert replayed == recorded
+    assert transport.stats()["hits"] == 1
+    assert backend.requests == 1
+
+
+def test_replay_miss_is_not_retried(tmp_path):
+    llm = DeepSeekLLM(
+        LLMConfig(
+            api_key="test",
+            cassette_path=str(tmp_path / "empty.jsonl"),
+            cassette_mode="replay",
+        )
+    )
+    response = asyncio.run(llm.generate("sys", MESSAGES))
+    assert response.startswith("Error generating response:")
+    assert llm.governor.retries == 0
+
+
+def test_mock_server_over_http():
+    async def run():
+        server = MockLLMServer(MockLLMBackend(latency=parse_latency("0.01")))
+        await server.start()
+        llm = DeepSeekLLM(LLMConfig(api_key="test", api_base=server.base_url))
+        try:
+            events = [
+                event
+                async for event in llm.tool_calling_stream(
+                    "sys",
+                    MESSAGES,
+                    tools=[
+                        {
+                            "type": "function",
+                            "function": {
+                                "name": "plan",
+                                "parameters": {
+                                    "type": "object",
+                                    "properties": {
+                                        "steps": {"type": "array", "items": {"type": "string"}}
+                                    },
+                                },
+                            },
+                        }
+                    ],
+                    tool_choice={"type": "function", "function": {"name": "plan"}},
+                )
+            ]
+            text = await llm.generate("sys", MESSAGES)
+        finally:
+            await llm.aclose()
+            await server.aclose()
+        return events, text
+
+    events, text = asyncio.run(run())
+    assert events[-1]["type"] == "final"
+    assert events[-1]["result"]["arguments"] == {"steps": ["mock"]}
+    assert json.loads(text) == {"reasoning": "mock response"}
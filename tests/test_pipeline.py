@@ -0,0 +1,43 @@
+import asyncio
+import time
+from agent_system.pipeline import Pipeline, PipelineStage
+
+
+def make_stage(name, delay, workers=1, fail_on=None):
+    async def handler(state):
+        await asyncio.sleep(delay)
+        if state["task"] == fail_on:
+            raise RuntimeError("boom")
+        state[name] = f"{name}:{state['task']}"
+
+    return PipelineStage(name, handler, workers)
+
+
+def test_stages_overlap_across_tasks():
+    pipeline = Pipeline(
+        [make_stage("plan", 0.02), make_stage("develop", 0.02)], queue_size=2
+    )
+    start = time.monotonic()
+    results = asyncio.run(pipeline.run(["a", "b", "c", "d"]))
+    elapsed = time.monotonic() - start
+
+    assert [r["develop"] for r in results] == [f"develop:{t}" for t in "abcd"]
+    # 串行需要 8 个阶段耗时，流水线约为 5 个
+    assert elapsed < 0.15
+    stats = pipeline.stats()
+    assert stats["plan"]["processed"] == 4
+    assert 0 < stats["develop"]["utilization"] <= 1
+
+
+def test_failed_task_skips_later_stages():
+    pipeline = Pipeline([make_stage("plan", 0, fail_on="b"), make_stage("develop", 0)])
+
+    async def tasks():
+        for task in "abc":
+            yield task
+
+    results = asyncio.run(pipeline.run(tasks()))
+    assert results[1]["error"]["stage"] == "plan"
+    assert "develop" not in results[1]
+    assert results[2]["develop"] == "develop:c"
+    assert pipeline.stats()["plan"]["errors"] == 1
@@ -0,0 +1,82 @@
+import asyncio
+import sqlite3
+import time
+from agent_system.cache import ResponseCache, make_cache_key
+from agent_system.config import LLMConfig
+from agent_system.llm import DeepSeekLLM
+from tests.helpers import FakeCompletions
+
+
+def test_cache_key_is_order_independent():
+    assert make_cache_key(a=1, b=[1, 2]) == make_cache_key(b=[1, 2], a=1)
+    assert make_cache_key(a=1) != make_cache_key(a=2)
+
+
+def test_memory_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.get("a")
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl=0.01)
+    cache.set("a", {"v": 1})
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_disk_store_survives_new_instance(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path=path, max_disk_entries=1)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    cache.close()
+
+    reopened = ResponseCache(path=path)
+    assert reopened.get("a") is None
+    assert reopened.get("b") == {"v": 2}
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_disk_hits_batch_access_time_updates(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path=path, max_entries=1, touch_batch=2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    reader = sqlite3.connect(path)
+
+    def accessed_at(key):
+        query = "SELECT accessed_at FROM responses WHERE key = ?"
+        return reader.execute(query, (key,)).fetchone()[0]
+
+    written = accessed_at("a")
+    assert cache.get("a") == {"v": 1}
+    # 单次磁盘命中不写库
+    assert accessed_at("a") == written
+    cache.get("b")
+    cache.get("a")
+    assert accessed_at("a") > written
+    cache.close()
+    reader.close()
+
+
+def test_generate_uses_cache():
+    llm = DeepSeekLLM(LLMConfig(api_key="test", cache_enabled=True))
+    fake = FakeCompletions('{"answer": 42}')
+    llm.client.chat.completions = fake
+
+    async def run():
+        messages = [{"role": "user", "content": "hello"}]
+        first = await llm.generate(system_prompt="sys", messages=messages)
+        second = await llm.generate(system_prompt="sys", messages=messages)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == '{"answer": 42}'
+    assert fake.calls == 1
+    assert llm.cache.stats()["hits"] == 1
@@ -0,0 +1,59 @@
+import asyncio
+from agent_system.base_agent import BaseAgent
+from agent_system.config import AgentConfig, LLMConfig
+from agent_system.llm import DeepSeekLLM
+from agent_system.message_bus import MessageBus
+from agent_system.session import RunSession
+from tests.helpers import make_completion
+
+
+class EchoCompletions:
+    async def create(self, **params):
+        await asyncio.sleep(0.005)
+        user_turns = [m["content"] for m in params["messages"] if m["role"] == "user"]
+        return make_completion('{"seen": %d}' % len(user_turns))
+
+
+class EchoAgent(BaseAgent):
+    def get_system_prompt(self) -> str:
+        return "echo"
+
+
+def make_agent() -> EchoAgent:
+    llm = DeepSeekLLM(LLMConfig(api_key="test", singleflight_enabled=False))
+    llm.client.chat.completions = EchoCompletions()
+    config = AgentConfig(name="echo", description="", role="echo", llm_config=llm.config)
+    return EchoAgent(config=config, message_bus=MessageBus(), llm=llm)
+
+
+def test_concurrent_sessions_do_not_share_history():
+    agent = make_agent()
+
+    async def run(task):
+        with RunSession() as session:
+            await agent.process_req_with_ask(task)
+            result = await agent.process_req_with_ask(task)
+            return session, result, list(agent.messages)
+
+    async def main():
+        return await asyncio.gather(run("a"), run("b"))
+
+    (session_a, result_a, messages_a), (_, result_b, _) = asyncio.run(main())
+    assert result_a == result_b == {"seen": 2}
+    assert [m["content"] for m in messages_a if m["role"] == "user"] == ["a", "a"]
+    # 会话外的默认状态不受影响
+    assert agent.messages == []
+    assert session_a.state_for(agent).messages == messages_a
+
+
+def test_bus_messages_land_in_publishing_session():
+    agent = make_agent()
+
+    async def main():
+        with RunSession() as session:
+            await agent.message_bus.publish("echo", {"step": 1})
+            return session.state_for(agent).context
+
+    context = asyncio.run(main())
+    assert context["content"] == {"step": 1}
+    assert agent.context == {}
@@ -0,0 +1,104 @@
+import asyncio
+from agent_system.config import LLMConfig
+from agent_system.deadline import DeadlineExceeded, deadline_scope
+from agent_system.llm import DeepSeekLLM, SingleFlight
+from tests.helpers import make_completion
+
+
+class SlowCompletions:
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def create(self, **params):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return make_completion(params["messages"][-1]["content"])
+
+
+def test_identical_requests_share_one_call():
+    llm = DeepSeekLLM(LLMConfig(api_key="test"))
+    fake = SlowCompletions()
+    llm.client.chat.completions = fake
+
+    async def run():
+        same = [{"role": "user", "content": "same"}]
+        other = [{"role": "user", "content": "other"}]
+        return await asyncio.gather(
+            llm.generate("sys", same),
+            llm.generate("sys", same),
+            llm.generate("sys", same),
+            llm.generate("sys", other),
+        )
+
+    results = asyncio.run(run())
+    assert results == ["same", "same", "same", "other"]
+    assert fake.calls == 2
+    assert llm.singleflight.stats() == {"calls": 2, "coalesced": 2, "in_flight": 0}
+
+
+def test_cancelled_caller_does_not_cancel_shared_request():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flight.do("k", work))
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_deadline_applies_per_coalesced_caller():
+    llm = DeepSeekLLM(LLMConfig(api_key="test"))
+    fake = SlowCompletions(delay=0.1)
+    llm.client.chat.completions = fake
+    same = [{"role": "user", "content": "same"}]
+
+    async def bounded():
+        with deadline_scope(0.02):
+            return await llm.generate("sys", same)
+
+    async def run():
+        return await asyncio.gather(
+            bounded(), llm.generate("sys", same), return_exceptions=True
+        )
+
+    first, second = asyncio.run(run())
+    assert isinstance(first, DeadlineExceeded)
+    # 首个调用方超时不取消其他等待者共享的请求
+    assert second == "same"
+    assert fake.calls == 1
+
+
+def test_shared_request_cancelled_after_last_waiter_leaves():
+    llm = DeepSeekLLM(LLMConfig(api_key="test"))
+    fake = SlowCompletions(delay=0.1)
+    llm.client.chat.completions = fake
+    same = [{"role": "user", "content": "same"}]
+
+    async def bounded(seconds):
+        with deadline_scope(seconds):
+            return await llm.generate("sys", same)
+
+    async def run():
+        results = await asyncio.gather(
+            bounded(0.02), bounded(0.04), return_exceptions=True
+        )
+        await asyncio.sleep(0)
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, DeadlineExceeded) for r in results)
+    assert fake.cancelled == 1
+    assert llm.singleflight.stats()["in_flight"] == 0
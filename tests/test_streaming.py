@@ -0,0 +1,94 @@
+import asyncio
+import json
+from agent_system.deadline import deadline_scope
+from agent_system.streaming import IncrementalJSONParser
+from tests.helpers import PLAN, StreamingCompletions, make_supervisor
+
+
+def feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i : i + size]))
+    return events
+
+
+def test_parser_yields_plan_items_as_they_close():
+    text = json.dumps(PLAN, ensure_ascii=False)
+    for size in (1, 5, len(text)):
+        parser = IncrementalJSONParser()
+        events = feed_in_chunks(parser, text, size)
+        items = [e for e in events if e["type"] == "item" and e["key"] == "plan"]
+        assert [e["value"] for e in items] == PLAN["plan"]
+        assert parser.partial == PLAN
+
+
+def test_first_item_available_before_document_ends():
+    text = json.dumps(PLAN, ensure_ascii=False)
+    cut = text.index('{"step": 2')
+    parser = IncrementalJSONParser()
+    events = parser.feed(text[:cut])
+    assert [e["value"] for e in events if e["type"] == "item"] == PLAN["plan"][:1]
+    assert events[-1]["arguments"]["plan"] == PLAN["plan"][:1]
+
+
+def test_supervisor_stream_plan():
+    completions = StreamingCompletions()
+    supervisor = make_supervisor(completions)
+    limiter = supervisor.llm.governor.limiter
+    in_flight = []
+
+    async def run():
+        events = []
+        async for event in supervisor.stream_plan("生成报表"):
+            in_flight.append(limiter.in_flight)
+            events.append(event)
+        return events
+
+    events = asyncio.run(run())
+    steps = [e["value"]["step"] for e in events if e["type"] == "item"]
+    assert steps == [1, 2]
+    final = events[-1]
+    assert final["type"] == "final"
+    assert final["result"]["status"] == "in_progress"
+    assert final["result"]["arguments"] == PLAN
+    # 读取流的过程中一直占用并发槽位，读完后释放并关闭流
+    assert in_flight[0] == 1
+    assert limiter.in_flight == 0
+    assert completions.streams[0].closed
+
+
+def test_stream_deadline_covers_whole_read():
+    completions = StreamingCompletions(delay=0.02)
+    supervisor = make_supervisor(completions)
+    limiter = supervisor.llm.governor.limiter
+
+    async def run():
+        events = []
+        with deadline_scope(0.1):
+            async for event in supervisor.stream_plan("生成报表"):
+                events.append(event)
+        return events
+
+    events = asyncio.run(run())
+    # 流创建很快，但读完需要更久：截止时间在读取过程中生效
+    assert events[-1]["type"] == "final"
+    assert events[-1]["result"]["status"] == "timeout"
+    assert limiter.in_flight == 0
+    assert completions.streams[0].closed
+
+
+def test_stream_closed_when_consumer_stops_early():
+    completions = StreamingCompletions(delay=0.01)
+    supervisor = make_supervisor(completions)
+    limiter = supervisor.llm.governor.limiter
+
+    async def run():
+        stream = supervisor.stream_plan("生成报表")
+        async for event in stream:
+            if event["type"] == "item":
+                break
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+    assert completions.streams[0].closed
@@ -0,0 +1,46 @@
+import asyncio
+from agent_system.message_bus import MessageBus
+from agent_system.topic_trie import TopicTrie, is_pattern
+
+
+def test_wildcard_matching():
+    trie = TopicTrie()
+    for pattern in ["*_result", "agent.*.result", "agent.#", "#", "a.#.z"]:
+        trie.add(pattern)
+
+    assert sorted(trie.match("supervisor_result")) == ["#", "*_result"]
+    assert sorted(trie.match("agent.developer.result")) == [
+        "#",
+        "agent.#",
+        "agent.*.result",
+    ]
+    assert sorted(trie.match("agent")) == ["#", "agent.#"]
+    assert sorted(trie.match("a.z")) == ["#", "a.#.z"]
+    assert sorted(trie.match("a.b.c.z")) == ["#", "a.#.z"]
+
+    trie.remove("#")
+    assert trie.match("supervisor") == []
+    assert not is_pattern("supervisor_result")
+
+
+def test_bus_pattern_subscription():
+    for delivery in ("sync", "queued"):
+        bus = MessageBus(delivery=delivery)
+        seen = []
+
+        async def monitor(message):
+            seen.append(message["topic"])
+
+        async def main():
+            bus.subscribe("*_result", monitor)
+            await bus.publish("supervisor_result", {})
+            await bus.publish("supervisor", {})
+            await bus.publish("data_developer_result", {})
+            await bus.drain()
+            bus.unsubscribe("*_result", monitor)
+            await bus.publish("data_calibration_result", {})
+            await bus.drain()
+            await bus.aclose()
+
+        asyncio.run(main())
+        assert seen == ["supervisor_result", "data_developer_result"]
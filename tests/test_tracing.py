@@ -0,0 +1,141 @@
+import asyncio
+import json
+from agent_system.bus_transport import BusBroker, RemoteMessageBus
+from agent_system.message_bus import MessageBus
+from agent_system.tracing import Tracer, current_span, span
+from tests.helpers import (
+    StreamingCompletions,
+    make_supervisor,
+    make_system,
+    socket_path,
+)
+
+
+def test_spans_nest_across_tasks():
+    async def child():
+        with span("child") as s:
+            await asyncio.sleep(0)
+            return s
+
+    async def run():
+        with span("root") as root:
+            a, b = await asyncio.gather(child(), child())
+        return root, a, b
+
+    with Tracer() as tracer:
+        root, a, b = asyncio.run(run())
+    assert a.parent_id == b.parent_id == root.span_id
+    assert a.lane != b.lane
+    assert current_span() is None
+    assert len(tracer.spans) == 3
+
+
+def test_lanes_released_with_finished_tasks():
+    async def child():
+        with span("child") as s:
+            await asyncio.sleep(0)
+            return s
+
+    async def run():
+        first = await asyncio.create_task(child())
+        second = await asyncio.create_task(child())
+        return first, second
+
+    with Tracer() as tracer:
+        first, second = asyncio.run(run())
+    # 任务结束后泳道条目随之释放，新任务不会复用旧泳道号
+    assert first.lane != second.lane
+    assert len(tracer._lanes) == 0
+
+
+def test_disabled_tracing_is_noop():
+    with span("ignored") as s:
+        s.set("key", "value")
+    assert current_span() is None
+
+
+def test_workflow_trace_exports_chrome_format(tmp_path):
+    system = make_system()
+    with Tracer() as tracer:
+        asyncio.run(system.process_task("生成月度销售报表"))
+
+    by_name = {}
+    for s in tracer.spans:
+        by_name.setdefault(s.name, []).append(s)
+    (run,) = by_name["workflow.run"]
+    agents = by_name["agent.process_req"]
+    assert {s.attrs["role"] for s in agents} == {
+        "supervisor",
+        "metadata_steward",
+        "data_calibration",
+        "data_developer",
+    }
+    assert all(s.parent_id == run.span_id for s in agents)
+    agent_ids = {s.span_id for s in agents}
+    calls = by_name["llm.call"]
+    assert all(s.parent_id in agent_ids for s in calls)
+    assert all(s.attrs["cache_hit"] is False for s in calls)
+    assert {s.attrs["finish_reason"] for s in calls} == {"stop"}
+    assert by_name["bus.publish"]
+
+    path = tmp_path / "trace.json"
+    tracer.export_chrome_trace(str(path))
+    events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+    assert len(events) == len(tracer.spans)
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+
+
+def test_queued_delivery_records_queue_delay():
+    async def run():
+        bus = MessageBus(delivery="queued")
+
+        async def slow(message):
+            await asyncio.sleep(0.01)
+
+        bus.subscribe("topic", slow)
+        for _ in range(3):
+            await bus.publish("topic", {})
+        await bus.drain()
+        await bus.aclose()
+
+    with Tracer() as tracer:
+        asyncio.run(run())
+    publishes = [s for s in tracer.spans if s.name == "bus.publish"]
+    deliveries = [s for s in tracer.spans if s.name == "bus.deliver"]
+    assert len(deliveries) == 3
+    assert {s.parent_id for s in deliveries} == {s.span_id for s in publishes}
+    assert deliveries[-1].attrs["queue_delay"] >= 0.01
+
+
+def test_streamed_call_records_llm_call_span():
+    supervisor = make_supervisor(StreamingCompletions())
+
+    async def run():
+        async for _ in supervisor.stream_plan("生成报表"):
+            pass
+
+    with Tracer() as tracer:
+        asyncio.run(run())
+    (call,) = [s for s in tracer.spans if s.name == "llm.call"]
+    (request,) = [s for s in tracer.spans if s.name == "llm.request"]
+    assert call.attrs["stream"] is True
+    assert call.attrs["cache_hit"] is False
+    assert request.parent_id == call.span_id
+    # 整个流读完后区间才结束
+    assert call.end >= request.end
+
+
+def test_remote_publish_records_span():
+    path = socket_path()
+
+    async def run():
+        broker = BusBroker(path)
+        await broker.start()
+        async with RemoteMessageBus(path) as bus:
+            await bus.publish("topic", {}, sender="a")
+        await broker.aclose()
+
+    with Tracer() as tracer:
+        asyncio.run(run())
+    (publish,) = [s for s in tracer.spans if s.name == "bus.publish"]
+    assert publish.attrs["topic"] == "topic"